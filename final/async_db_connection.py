@@ -0,0 +1,215 @@
+# async_db_connection.py - Asyncio sibling của DatabaseConnection
+"""
+GIẢI THÍCH:
+- execute_query/execute_update của DatabaseConnection là blocking: mỗi round trip giữ 1 thread
+- AsyncDatabaseConnection dùng aiomysql với pool riêng để nhiều query chạy song song
+  trên cùng event loop (asyncio.gather)
+- Commit/rollback giống hệt get_cursor(): commit khi block thành công, rollback khi lỗi
+- Pool được tạo lazily ở lần await đầu tiên (cần event loop đang chạy)
+- Chỉ hỗ trợ DB_BACKEND=mysql (aiomysql); backend khác -> RuntimeError ngay ở lần await
+  đầu tiên thay vì âm thầm kết nối tới MySQL trong DB_CONFIG
+- Read replica giống sync pool: DB_REPLICA_HOST -> fetch_all/fetch_one đọc từ replica,
+  trừ khi vừa có write trong REPLICA_STICKY_SECONDS (read-your-writes). Sync pool tính
+  theo thread; pool async gắn với 1 event loop (1 thread) nên tính theo cả pool: write
+  trong 1 task con của asyncio.gather cũng đẩy reads sau đó của task cha về primary
+
+Usage:
+    from async_db_connection import async_db
+
+    async def load():
+        kpis, top = await asyncio.gather(
+            async_db.fetch_one("SELECT COUNT(*) AS n FROM students"),
+            async_db.fetch_all("SELECT * FROM students LIMIT %s", (10,)),
+        )
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import db_connection
+from db_connection import DB_CONFIG, REPLICA_CONFIG, REPLICA_STICKY_SECONDS
+
+logger = logging.getLogger(__name__)
+
+try:
+    import aiomysql
+except ImportError:  # aiomysql là optional, chỉ cần khi dùng async API
+    aiomysql = None
+
+
+class AsyncDatabaseConnection:
+    """
+    Async Database Connection với Connection Pooling (aiomysql)
+
+    API song song với DatabaseConnection:
+    - fetch_all()   ~ execute_query()
+    - fetch_one()   ~ execute_query(fetch_one=True)
+    - execute()     ~ execute_update()
+    - executemany() ~ execute_many()
+    """
+
+    def __init__(self, minsize=1, maxsize=10):
+        self.minsize = minsize
+        self.maxsize = maxsize
+        self._pool = None
+        self._replica_pool = None
+        self._pool_lock = None
+        self._last_write = None  # monotonic, write gần nhất của mọi task trên pool này
+
+    async def _initialize_pool(self):
+        """Khởi tạo async connection pool (chỉ 1 lần)"""
+        if db_connection.DB_BACKEND != 'mysql':
+            raise RuntimeError(
+                f"AsyncDatabaseConnection only supports the MySQL backend "
+                f"(DB_BACKEND={db_connection.DB_BACKEND}), use db_connection.db instead"
+            )
+        if aiomysql is None:
+            raise RuntimeError("aiomysql is required for AsyncDatabaseConnection (pip install aiomysql)")
+
+        if self._pool_lock is None:
+            self._pool_lock = asyncio.Lock()
+
+        async with self._pool_lock:
+            if self._pool is not None:
+                return
+            try:
+                self._pool = await self._create_pool(DB_CONFIG)
+                logger.info("✓ Async database pool initialized successfully")
+            except Exception as e:
+                logger.error(f"✗ Failed to create async pool: {e}")
+                raise
+            if REPLICA_CONFIG['host']:
+                try:
+                    self._replica_pool = await self._create_pool(REPLICA_CONFIG)
+                    logger.info(f"✓ Async read replica pool initialized ({REPLICA_CONFIG['host']})")
+                except Exception as e:
+                    logger.warning(f"Async read replica unavailable, using primary only: {e}")
+
+    def _create_pool(self, config):
+        return aiomysql.create_pool(
+            minsize=self.minsize,
+            maxsize=self.maxsize,
+            host=config['host'],
+            port=config['port'],
+            user=config['user'],
+            password=config['password'],
+            db=config['database'],
+            autocommit=False  # Giống sync pool: tự control transactions
+        )
+
+    def _route(self, readonly):
+        """Replica cho reads, trừ khi pool vừa ghi xong (giống DatabaseConnection._route)"""
+        if readonly and self._replica_pool is not None:
+            last_write = self._last_write
+            if last_write is None or time.monotonic() - last_write > REPLICA_STICKY_SECONDS:
+                return self._replica_pool
+        return self._pool
+
+    async def close(self):
+        """Đóng pool (gọi trước khi event loop kết thúc)"""
+        for pool in (self._pool, self._replica_pool):
+            if pool is not None:
+                pool.close()
+                await pool.wait_closed()
+        self._pool = self._replica_pool = None
+
+    @asynccontextmanager
+    async def get_cursor(self, dictionary=True, readonly=False):
+        """
+        Async context manager để lấy cursor, commit/rollback như get_cursor()
+
+        Args:
+            readonly: True -> dùng read replica (nếu có và pool không vừa ghi)
+
+        Usage:
+            async with async_db.get_cursor() as cursor:
+                await cursor.execute("SELECT * FROM students")
+                rows = await cursor.fetchall()
+        """
+        if self._pool is None:
+            await self._initialize_pool()
+
+        cursor_class = aiomysql.DictCursor if dictionary else aiomysql.Cursor
+        async with self._route(readonly).acquire() as conn:
+            cursor = await conn.cursor(cursor_class)
+            try:
+                yield cursor
+                await conn.commit()
+            except Exception as e:
+                await conn.rollback()
+                logger.error(f"Async query error: {e}")
+                raise
+            finally:
+                await cursor.close()
+
+    async def fetch_all(self, query, params=None, use_primary=False):
+        """
+        Execute SELECT query và return list of dict
+
+        Args:
+            use_primary: True -> đọc từ primary kể cả khi có replica
+
+        Returns:
+            list of dict, hoặc None nếu lỗi query (giống execute_query)
+
+        Raises:
+            RuntimeError: Backend không phải MySQL / thiếu aiomysql
+        """
+        if self._pool is None:
+            await self._initialize_pool()  # Lỗi cấu hình raise, không bị nuốt thành None
+        try:
+            async with self.get_cursor(readonly=not use_primary) as cursor:
+                await cursor.execute(query, params or ())
+                return await cursor.fetchall()
+        except Exception as e:
+            logger.error(f"Async query failed: {query[:100]}... Error: {e}")
+            return None
+
+    async def fetch_one(self, query, params=None, use_primary=False):
+        """Execute SELECT query và return 1 dict (hoặc None)"""
+        if self._pool is None:
+            await self._initialize_pool()
+        try:
+            async with self.get_cursor(readonly=not use_primary) as cursor:
+                await cursor.execute(query, params or ())
+                return await cursor.fetchone()
+        except Exception as e:
+            logger.error(f"Async query failed: {query[:100]}... Error: {e}")
+            return None
+
+    async def execute(self, query, params=None):
+        """Execute INSERT/UPDATE/DELETE và return affected rows"""
+        try:
+            async with self.get_cursor(dictionary=False) as cursor:
+                affected = await cursor.execute(query, params or ())
+        except Exception as e:
+            logger.error(f"Async update failed: {query[:100]}... Error: {e}")
+            raise
+        self._last_write = time.monotonic()
+        return affected
+
+    async def executemany(self, query, params_list):
+        """Execute batch INSERT/UPDATE và return affected rows"""
+        try:
+            async with self.get_cursor(dictionary=False) as cursor:
+                affected = await cursor.executemany(query, params_list)
+        except Exception as e:
+            logger.error(f"Async batch update failed: {e}")
+            raise
+        self._last_write = time.monotonic()
+        return affected
+
+
+# Global instance (pool chưa được tạo cho tới lần await đầu tiên)
+async_db = AsyncDatabaseConnection()
+
+
+if __name__ == "__main__":
+    async def _demo():
+        result = await async_db.fetch_one("SELECT 1 AS test")
+        print(f"Async connection test: {result}")
+        await async_db.close()
+
+    asyncio.run(_demo())
@@ -0,0 +1,208 @@
+# batch_writer.py - Packet-aware batching cho execute_many
+"""
+GIẢI THÍCH:
+- cursor.executemany(query, params_list) gửi toàn bộ params_list trong 1 lần:
+  + INSERT ... VALUES: connector gộp thành 1 statement khổng lồ -> vượt max_allowed_packet
+    khi import lớn
+  + UPDATE/DELETE/INSERT ... SELECT: mỗi row là 1 statement/round trip riêng
+- Batch writer (dùng qua db.execute_batched / db.execute_many):
+  + Tách "INSERT ... VALUES (%s, ...) [ON DUPLICATE KEY UPDATE ...]" thành head / row / tail
+  + Gom rows thành multi-row VALUES chunks theo byte budget (ước lượng kích thước
+    sau khi escape) và giới hạn số placeholders mỗi statement (SQLite: 999)
+  + Statement không rewrite được (hoặc backend SQLite: in-process, không có packet)
+    -> executemany theo từng chunk rows
+  + Commit mỗi N chunks, progress callback, cộng dồn rowcount của từng chunk
+
+Benchmark load enrollments (mặc định SQLite in-memory, DB_BACKEND=mysql để chạy trên MySQL):
+    python batch_writer.py --rows 1000000
+"""
+
+import datetime
+import decimal
+import itertools
+import os
+import re
+
+# Byte budget mỗi statement (mặc định 1 MiB; luôn bị chặn dưới max_allowed_packet)
+DEFAULT_MAX_BYTES = int(os.getenv('DB_BATCH_BYTES', str(1024 * 1024)))
+
+# Số placeholders tối đa mỗi statement theo backend
+MAX_PARAMS = {
+    'mysql': 65535,
+    'sqlite': 999,  # SQLITE_MAX_VARIABLE_NUMBER của các bản SQLite < 3.32
+}
+
+_INSERT_VALUES_RE = re.compile(
+    r"^(?P<head>\s*(?:INSERT|REPLACE)\b.*?\bVALUES)\s*"
+    r"(?P<row>\((?:[^()']|'[^']*'|\([^()]*\))*\))"
+    r"(?P<tail>.*)$",
+    re.IGNORECASE | re.DOTALL
+)
+
+
+class InsertTemplate:
+    """INSERT ... VALUES (row) [tail] tách ra để sinh multi-row statements"""
+
+    def __init__(self, head, row, tail):
+        self.head = head.strip()
+        self.row = row
+        self.tail = tail.rstrip().rstrip(';')
+        self.placeholders = row.count('%s')
+        self.base_bytes = len(self.head) + len(self.tail) + 2
+
+    def sql(self, rows):
+        """Statement cho `rows` rows"""
+        values = ", ".join([self.row] * rows)
+        tail = f" {self.tail.strip()}" if self.tail.strip() else ""
+        return f"{self.head} {values}{tail}"
+
+
+def parse_insert(query):
+    """
+    Nhận diện INSERT/REPLACE ... VALUES (1 row placeholders)
+
+    Returns:
+        InsertTemplate, hoặc None nếu query không rewrite được thành multi-row
+    """
+    match = _INSERT_VALUES_RE.match(query)
+    if not match:
+        return None
+    tail = match.group('tail').strip().rstrip(';').strip()
+    if tail and not tail.upper().startswith('ON DUPLICATE KEY UPDATE'):
+        return None  # Đã là multi-row hoặc cú pháp lạ
+    if '%s' not in match.group('row'):
+        return None
+    return InsertTemplate(match.group('head'), match.group('row'), match.group('tail'))
+
+
+def estimate_param_bytes(value):
+    """Ước lượng số bytes của 1 param sau khi được escape vào SQL text"""
+    if value is None:
+        return 4  # NULL
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return len(str(value))
+    if isinstance(value, str):
+        return len(value.encode('utf-8')) + value.count("'") + value.count('\\') + 2
+    if isinstance(value, (bytes, bytearray)):
+        return 2 * len(value) + 3  # Worst case: mọi byte đều phải escape
+    if isinstance(value, (datetime.date, datetime.datetime, datetime.timedelta)):
+        return 28
+    return len(str(value)) + 2
+
+
+def iter_chunks(params_list, max_bytes, max_rows, row_overhead=4):
+    """
+    Gom params_list thành các chunks có tổng kích thước <= max_bytes và <= max_rows rows
+
+    1 row lớn hơn max_bytes vẫn được gửi riêng (server sẽ báo lỗi nếu vượt packet).
+    max_bytes=None -> chỉ chia theo số rows (statement gửi từng row, không cần ước lượng)
+    """
+    if max_bytes is None:
+        iterator = iter(params_list)
+        while True:
+            chunk = list(itertools.islice(iterator, max_rows))
+            if not chunk:
+                return
+            yield chunk
+
+    chunk = []
+    size = 0
+    for params in params_list:
+        row_size = row_overhead + sum(estimate_param_bytes(v) for v in params)
+        if chunk and (size + row_size > max_bytes or len(chunk) >= max_rows):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(params)
+        size += row_size
+    if chunk:
+        yield chunk
+
+
+def flatten(chunk):
+    return [value for params in chunk for value in params]
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+BENCH_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS bench_enrollments (
+    StudentID INT NOT NULL,
+    ClassID INT NOT NULL,
+    Grade DECIMAL(4,2),
+    GradeLetter VARCHAR(5),
+    Note VARCHAR(255),
+    PRIMARY KEY (StudentID, ClassID)
+)
+"""
+
+BENCH_INSERT_SQL = (
+    "INSERT INTO bench_enrollments (StudentID, ClassID, Grade, GradeLetter, Note) "
+    "VALUES (%s, %s, %s, %s, %s)"
+)
+
+
+def benchmark_enrollment_load(rows=1_000_000, commit_every=10):
+    """
+    Load `rows` enrollments vào bảng tạm bench_enrollments bằng:
+    - legacy: cursor.executemany(toàn bộ list) trong 1 lần (execute_many cũ)
+    - batched: db.execute_batched (MySQL: multi-row chunks theo byte budget,
+      SQLite: executemany theo chunk)
+
+    Returns:
+        dict: thời gian, rows/s và affected rows của từng cách
+    """
+    import time
+
+    from mysql.connector import Error
+
+    from db_connection import db
+
+    letters = "FDCBA"
+    params_list = [
+        (i // 50 + 1, i % 50 + 1, round((i * 7) % 1001 / 100, 2), letters[(i * 7) % 5], None)
+        for i in range(rows)
+    ]
+
+    def reset():
+        db.execute_update("DROP TABLE IF EXISTS bench_enrollments")
+        db.execute_update(BENCH_TABLE_SQL)
+
+    def legacy():
+        with db.get_cursor(dictionary=False) as cursor:
+            cursor.executemany(BENCH_INSERT_SQL, params_list)
+            return cursor.rowcount
+
+    def batched():
+        return db.execute_batched(BENCH_INSERT_SQL, params_list, commit_every=commit_every)
+
+    results = {'rows': rows}
+    for name, run in (('legacy_executemany', legacy), ('batched', batched)):
+        reset()
+        started = time.perf_counter()
+        try:
+            affected = run()
+            elapsed = time.perf_counter() - started
+            results[name] = {
+                'seconds': round(elapsed, 2),
+                'rows_per_s': round(rows / elapsed),
+                'affected': affected,
+            }
+        except Error as e:
+            results[name] = {'error': str(e)}
+    db.execute_update("DROP TABLE IF EXISTS bench_enrollments")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark legacy executemany vs batched writer")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--commit-every", type=int, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DB_BACKEND', 'sqlite')
+    for key, value in benchmark_enrollment_load(args.rows, args.commit_every).items():
+        print(f"{key:>20}: {value}")
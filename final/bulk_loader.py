@@ -0,0 +1,462 @@
+# bulk_loader.py - Bulk load students / enrollments (đầu năm học)
+"""
+GIẢI THÍCH:
+- StudentModel.create() cho từng row: validation query + INSERT + commit mỗi row
+  -> hàng chục nghìn students / hàng trăm nghìn enrollments mất hàng giờ
+- Bulk loader:
+  1. Validate toàn bộ rows trong Python (không query từng row):
+     + Format: dùng lại Validators (DOB, Gender, Year, Email, Grade)
+     + UNIQUE / FK / composite PK: kiểm tra theo cả batch bằng vài query IN (...)
+     + Row lỗi bị loại ra (rejected) kèm lý do, không làm hỏng cả batch
+  2. Ghi rows hợp lệ ra file tạm (tab-separated, \\N = NULL)
+  3. LOAD DATA LOCAL INFILE trên 1 connection riêng (allow_local_infile=True)
+     -> fallback db.execute_batched() khi server/client tắt local_infile hoặc backend SQLite
+  4. Optional: tắt foreign_key_checks / unique_checks trong lúc load (an toàn vì
+     đã kiểm tra ở bước 1), bật lại ngay sau đó
+  5. Integrity verification sau khi load (orphan FK, trùng Email, số rows)
+  -> Report: loaded, rejected, method, rows/second
+
+Usage:
+    python bulk_loader.py students intake_students.csv
+    python bulk_loader.py enrollments intake_enrollments.csv --disable-checks
+    python bulk_loader.py --demo 20000        # dữ liệu giả, mặc định SQLite in-memory
+"""
+
+import csv
+import logging
+import os
+import tempfile
+import time
+
+import mysql.connector
+from mysql.connector import Error
+
+import db_connection
+from db_connection import db, DB_CONFIG
+from validators import Validators, ValidationError
+
+logger = logging.getLogger(__name__)
+
+STUDENT_COLUMNS = (
+    'FirstName', 'LastName', 'DOB', 'Gender', 'Address', 'Phone', 'Email', 'EnrollmentYear', 'Major'
+)
+ENROLLMENT_COLUMNS = ('StudentID', 'ClassID', 'Grade', 'GradeLetter', 'Note')
+
+# errno khi LOAD DATA LOCAL bị tắt (server local_infile=0 / client không cho phép)
+LOCAL_INFILE_DISABLED_ERRNOS = {1148, 2068, 3948}
+
+SUSPEND_CHECKS_SQL = "SET SESSION foreign_key_checks = 0, unique_checks = 0"
+RESTORE_CHECKS_SQL = "SET SESSION foreign_key_checks = 1, unique_checks = 1"
+
+IN_CHUNK_SIZE = 500  # Số giá trị mỗi query IN (...) khi kiểm tra theo batch
+
+
+# ============================================================
+# BATCH VALIDATION
+# ============================================================
+
+def _existing_values(sql_prefix, values):
+    """Tập giá trị đã tồn tại: sql_prefix + ' IN (...)' chạy theo chunks"""
+    values = list(values)
+    found = set()
+    for start in range(0, len(values), IN_CHUNK_SIZE):
+        chunk = values[start:start + IN_CHUNK_SIZE]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        rows = db.execute_query(
+            f"{sql_prefix} IN ({placeholders})", chunk, use_primary=True, row_format='tuple'
+        )
+        if rows is None:
+            raise RuntimeError(f"Integrity lookup failed: {sql_prefix}")
+        found.update(row[0] if len(row) == 1 else tuple(row) for row in rows)
+    return found
+
+
+def validate_student_rows(rows):
+    """
+    Validate rows students (dict với keys như StudentDialog: FirstName, Email, DOB...)
+
+    Returns:
+        (valid, rejected): valid = list of tuples theo STUDENT_COLUMNS,
+        rejected = list of (row_number, message)
+    """
+    valid, rejected = check_student_rows(rows)
+    return [row for _, row in valid], rejected
+
+
+def check_student_rows(rows, start=1):
+    """
+    Như validate_student_rows nhưng giữ số thứ tự row (start = số của row đầu tiên)
+
+    Email UNIQUE: trùng trong rows kiểm tra bằng set, trùng với DB bằng
+    ceil(len(rows) / IN_CHUNK_SIZE) query IN (...)
+
+    Returns:
+        (valid, rejected): valid = list of (row_number, tuple theo STUDENT_COLUMNS)
+    """
+    cleaned = []
+    rejected = []
+    seen_emails = set()
+    for number, data in enumerate(rows, start=start):
+        try:
+            clean = Validators.validate_student_data(data, check_unique=False)
+        except (ValidationError, KeyError) as e:
+            rejected.append((number, str(e)))
+            continue
+        email = clean['Email'].lower()
+        if email in seen_emails:
+            rejected.append((number, f"Email '{clean['Email']}' bị trùng trong file"))
+            continue
+        seen_emails.add(email)
+        cleaned.append((number, clean))
+
+    existing = {e.lower() for e in _existing_values(
+        "SELECT Email FROM students WHERE Email", [clean['Email'] for _, clean in cleaned]
+    )}
+    valid = []
+    for number, clean in cleaned:
+        if clean['Email'].lower() in existing:
+            rejected.append((number, f"Email '{clean['Email']}' đã tồn tại trong hệ thống"))
+            continue
+        valid.append((number, tuple(clean[col] for col in STUDENT_COLUMNS)))
+    return valid, rejected
+
+
+def validate_enrollment_rows(rows):
+    """
+    Validate rows enrollments (StudentID, ClassID, Grade, GradeLetter, Note)
+
+    Kiểm tra theo batch: StudentID/ClassID tồn tại, (StudentID, ClassID) chưa đăng ký
+
+    Returns:
+        (valid, rejected) như validate_student_rows
+    """
+    cleaned = []
+    rejected = []
+    seen = set()
+    for number, data in enumerate(rows, start=1):
+        try:
+            clean = Validators.validate_enrollment_data(data, is_new=False)
+            key = (int(clean['StudentID']), int(clean['ClassID']))
+        except (ValidationError, ValueError, TypeError) as e:
+            rejected.append((number, str(e)))
+            continue
+        if key in seen:
+            rejected.append((number, f"Enrollment {key} bị trùng trong file"))
+            continue
+        seen.add(key)
+        cleaned.append((number, key, clean))
+
+    student_ids = _existing_values(
+        "SELECT StudentID FROM students WHERE StudentID", {key[0] for _, key, _ in cleaned}
+    )
+    class_ids = _existing_values(
+        "SELECT ClassID FROM classes WHERE ClassID", {key[1] for _, key, _ in cleaned}
+    )
+    enrolled = _existing_values(
+        "SELECT StudentID, ClassID FROM enrollments WHERE ClassID", class_ids
+    )
+
+    valid = []
+    for number, key, clean in cleaned:
+        if key[0] not in student_ids:
+            rejected.append((number, f"StudentID {key[0]} không tồn tại"))
+        elif key[1] not in class_ids:
+            rejected.append((number, f"ClassID {key[1]} không tồn tại"))
+        elif key in enrolled:
+            rejected.append((number, f"Sinh viên {key[0]} đã đăng ký lớp {key[1]}"))
+        else:
+            valid.append((key[0], key[1], clean['Grade'], clean['GradeLetter'], clean['Note']))
+    return valid, rejected
+
+
+# ============================================================
+# STAGING + LOADING
+# ============================================================
+
+def _escape_field(value):
+    """Giá trị -> field cho LOAD DATA (FIELDS ESCAPED BY '\\\\')"""
+    if value is None:
+        return "\\N"
+    text = str(value)
+    return (text.replace("\\", "\\\\").replace("\t", "\\t")
+                .replace("\n", "\\n").replace("\r", "\\r").replace("\0", "\\0"))
+
+
+def stage_rows(rows):
+    """Ghi rows ra file tạm tab-separated (UTF-8), trả về path (caller tự xóa)"""
+    handle, path = tempfile.mkstemp(prefix="bulk_", suffix=".tsv")
+    with os.fdopen(handle, "w", encoding="utf-8", newline="\n") as f:
+        for row in rows:
+            f.write("\t".join(_escape_field(value) for value in row))
+            f.write("\n")
+    return path
+
+
+def _load_data_infile(path, table, columns, disable_checks):
+    """LOAD DATA LOCAL INFILE trên connection riêng, trả về số rows đã load"""
+    conn = mysql.connector.connect(**DB_CONFIG, allow_local_infile=True, autocommit=False)
+    cursor = conn.cursor()
+    try:
+        if disable_checks:
+            cursor.execute(SUSPEND_CHECKS_SQL)
+        cursor.execute(
+            f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} CHARACTER SET utf8mb4 "
+            f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+            f"({', '.join(columns)})",
+            (path,)
+        )
+        loaded = cursor.rowcount
+        conn.commit()
+        return loaded
+    except Error:
+        conn.rollback()
+        raise
+    finally:
+        if disable_checks:
+            try:
+                cursor.execute(RESTORE_CHECKS_SQL)
+            except Error:
+                pass
+        cursor.close()
+        conn.close()
+
+
+def _load_batched(table, columns, rows, disable_checks, progress):
+    """Fallback: multi-row INSERT qua db.execute_batched (1 transaction)"""
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    if not (disable_checks and db_connection.DB_BACKEND == 'mysql'):
+        return db.execute_batched(sql, rows, progress=progress)
+
+    # Session variables phải set trên chính connection dùng để insert -> pin bằng transaction()
+    with db.transaction():
+        with db.get_cursor(dictionary=False) as cursor:
+            cursor.execute(SUSPEND_CHECKS_SQL)
+        try:
+            return db.execute_batched(sql, rows, progress=progress)
+        finally:
+            with db.get_cursor(dictionary=False) as cursor:
+                cursor.execute(RESTORE_CHECKS_SQL)
+
+
+def bulk_load(table, columns, rows, use_infile=True, disable_checks=False, progress=None):
+    """
+    Load rows (đã validate) vào table
+
+    Args:
+        use_infile: Thử LOAD DATA LOCAL INFILE trước (chỉ MySQL)
+        disable_checks: Tắt foreign_key_checks/unique_checks trong lúc load
+        progress: callback(rows_done, total_rows, affected) cho đường batched
+
+    Returns:
+        (loaded, method): method = 'load_data' hoặc 'batched'
+    """
+    if use_infile and db_connection.DB_BACKEND == 'mysql':
+        path = stage_rows(rows)
+        try:
+            return _load_data_infile(path, table, columns, disable_checks), 'load_data'
+        except Error as e:
+            if e.errno not in LOCAL_INFILE_DISABLED_ERRNOS:
+                raise
+            logger.warning(f"LOAD DATA LOCAL INFILE disabled ({e}), falling back to batched inserts")
+        finally:
+            os.remove(path)
+    return _load_batched(table, columns, rows, disable_checks, progress), 'batched'
+
+
+# ============================================================
+# INTEGRITY VERIFICATION
+# ============================================================
+
+INTEGRITY_CHECKS = {
+    'students': {
+        'duplicate_emails': """
+            SELECT COUNT(*) AS value FROM (
+                SELECT Email FROM students WHERE Email IS NOT NULL
+                GROUP BY Email HAVING COUNT(*) > 1
+            ) d
+        """,
+    },
+    'enrollments': {
+        'orphan_students': """
+            SELECT COUNT(*) AS value FROM enrollments e
+            LEFT JOIN students s ON s.StudentID = e.StudentID
+            WHERE s.StudentID IS NULL
+        """,
+        'orphan_classes': """
+            SELECT COUNT(*) AS value FROM enrollments e
+            LEFT JOIN classes c ON c.ClassID = e.ClassID
+            WHERE c.ClassID IS NULL
+        """,
+        'grades_out_of_range': """
+            SELECT COUNT(*) AS value FROM enrollments
+            WHERE Grade IS NOT NULL AND (Grade < 0 OR Grade > 10)
+        """,
+    },
+}
+
+
+def _count_rows(table):
+    row = db.execute_query(f"SELECT COUNT(*) AS value FROM {table}", fetch_one=True, use_primary=True)
+    return row['value'] if row else None
+
+
+def verify_integrity(table, rows_before=None, expected=None):
+    """
+    Kiểm tra sau khi load (quan trọng khi đã tắt FK/unique checks)
+
+    Returns:
+        dict: tên check -> số vi phạm, 'row_count_ok', 'ok'
+    """
+    report = {}
+    for name, sql in INTEGRITY_CHECKS.get(table, {}).items():
+        row = db.execute_query(sql, fetch_one=True, use_primary=True)
+        report[name] = row['value'] if row else None
+    if rows_before is not None and expected is not None:
+        report['row_count_ok'] = _count_rows(table) == rows_before + expected
+    report['ok'] = all(
+        value == 0 for key, value in report.items() if key != 'row_count_ok'
+    ) and report.get('row_count_ok', True)
+    return report
+
+
+# ============================================================
+# PUBLIC API
+# ============================================================
+
+def _load(table, columns, validate, rows, use_infile, disable_checks, progress):
+    started = time.perf_counter()
+    rows = list(rows)
+    valid, rejected = validate(rows)
+    validated_at = time.perf_counter()
+
+    rows_before = _count_rows(table)
+    loaded, method = (0, None)
+    if valid:
+        loaded, method = bulk_load(table, columns, valid, use_infile, disable_checks, progress)
+    loaded_at = time.perf_counter()
+
+    integrity = verify_integrity(table, rows_before, len(valid))
+    if not integrity['ok']:
+        logger.warning(f"Integrity verification failed for {table}: {integrity}")
+
+    elapsed = loaded_at - started
+    report = {
+        'table': table,
+        'input_rows': len(rows),
+        'loaded': loaded,
+        'rejected': rejected,
+        'method': method,
+        'validate_s': round(validated_at - started, 3),
+        'load_s': round(loaded_at - validated_at, 3),
+        'rows_per_s': round(loaded / elapsed) if elapsed else None,
+        'integrity': integrity,
+    }
+    logger.info(
+        f"Bulk loaded {loaded}/{len(rows)} {table} via {method} "
+        f"({report['rows_per_s']} rows/s, {len(rejected)} rejected)"
+    )
+    return report
+
+
+def load_students(rows, use_infile=True, disable_checks=False, progress=None):
+    """
+    Bulk load students
+
+    Args:
+        rows: Iterable of dict (FirstName, LastName, DOB, Gender, Email, EnrollmentYear,
+            Address, Phone, Major)
+
+    Returns:
+        dict report (loaded, rejected, method, rows_per_s, integrity)
+    """
+    if db_connection.DB_BACKEND != 'mysql':
+        disable_checks = False
+    return _load('students', STUDENT_COLUMNS, validate_student_rows, rows,
+                 use_infile, disable_checks, progress)
+
+
+def load_enrollments(rows, use_infile=True, disable_checks=False, progress=None):
+    """Bulk load enrollments (rows: dict StudentID, ClassID, Grade, GradeLetter, Note)"""
+    if db_connection.DB_BACKEND != 'mysql':
+        disable_checks = False
+    return _load('enrollments', ENROLLMENT_COLUMNS, validate_enrollment_rows, rows,
+                 use_infile, disable_checks, progress)
+
+
+def read_csv(path):
+    """CSV có header -> iterator of dict (ô rỗng -> None)"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            yield {key: (value if value != "" else None) for key, value in row.items()}
+
+
+# ============================================================
+# DEMO
+# ============================================================
+
+def run_demo(students=20000, classes_per_student=5):
+    """Load dữ liệu giả: `students` students + students * classes_per_student enrollments"""
+    db.execute_update("INSERT INTO subjects (SubjectCode, SubjectName, Credits) VALUES (%s, %s, %s)",
+                      ("BULK101", "Bulk Intake", 3))
+    class_ids = [
+        db.execute_insert(
+            "INSERT INTO classes (SubjectCode, ClassName, Semester, Year) VALUES (%s, %s, %s, %s)",
+            ("BULK101", f"BULK101-{i:02d}", "HK1", 2024)
+        )
+        for i in range(classes_per_student * 4)
+    ]
+
+    student_rows = [
+        {
+            'FirstName': f"Intake{i}", 'LastName': "Student", 'DOB': "2005-09-01",
+            'Gender': "MFO"[i % 3], 'Email': f"intake{i}@example.com", 'EnrollmentYear': 2024,
+            'Major': "CS", 'Address': None, 'Phone': None,
+        }
+        for i in range(students)
+    ]
+    student_rows.append(dict(student_rows[0]))  # Trùng email -> rejected
+    report = load_students(student_rows)
+    print(f"students: {_summary(report)}")
+
+    ids = [row[0] for row in db.execute_query(
+        "SELECT StudentID FROM students WHERE Email LIKE %s", ("intake%",), row_format='tuple'
+    )]
+    enrollment_rows = [
+        {'StudentID': sid, 'ClassID': class_ids[(n + k) % len(class_ids)],
+         'Grade': (n * 7 + k) % 101 / 10, 'GradeLetter': None, 'Note': None}
+        for n, sid in enumerate(ids) for k in range(classes_per_student)
+    ]
+    enrollment_rows.append({'StudentID': 10**9, 'ClassID': class_ids[0]})  # FK lỗi -> rejected
+    report = load_enrollments(enrollment_rows)
+    print(f"enrollments: {_summary(report)}")
+
+
+def _summary(report):
+    return {key: (len(value) if key == 'rejected' else value) for key, value in report.items()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bulk load students/enrollments from CSV")
+    parser.add_argument("table", nargs="?", choices=("students", "enrollments"))
+    parser.add_argument("csv_path", nargs="?")
+    parser.add_argument("--no-infile", action="store_true", help="Không dùng LOAD DATA LOCAL INFILE")
+    parser.add_argument("--disable-checks", action="store_true",
+                        help="Tắt foreign_key_checks/unique_checks trong lúc load")
+    parser.add_argument("--demo", type=int, metavar="N", help="Load N students giả (SQLite nếu chưa set DB_BACKEND)")
+    args = parser.parse_args()
+
+    if args.demo:
+        if 'DB_BACKEND' not in os.environ:
+            db.use_backend('sqlite', path=':memory:')
+        run_demo(args.demo)
+    elif args.table and args.csv_path:
+        loader = load_students if args.table == 'students' else load_enrollments
+        result = loader(read_csv(args.csv_path), use_infile=not args.no_infile,
+                        disable_checks=args.disable_checks)
+        print(_summary(result))
+        for number, message in result['rejected'][:20]:
+            print(f"  row {number}: {message}")
+    else:
+        parser.print_help()
@@ -0,0 +1,226 @@
+# columnar.py - Columnar NumPy result mode cho analytic queries
+"""
+GIẢI THÍCH:
+- execute_query() trả list of dict -> dashboard phải loop Python từng row để build
+  arrays cho chart / aggregation
+- db.execute_columnar(sql, params) trả dict tên cột -> NumPy array:
+  + Đọc bằng fetchmany(batch_size) trên cursor tuple (không tạo dict mỗi row)
+  + Mỗi batch: tách cột bằng zip(*rows), convert cả cột 1 lần
+  + Dtype suy ra từ giá trị trong batch:
+      int (ID, Year, COUNT)      -> int64
+      Decimal / float (Grade)    -> float64
+      date / datetime            -> datetime64[D] / datetime64[us]
+      str và loại khác           -> object
+    batch sau có kiểu "rộng" hơn (SQLite lưu 8.0 thành 8) -> np.result_type khi ghép
+  + Cột có NULL -> numpy.ma.MaskedArray (mask = NULL), không có NULL -> ndarray thường
+  + dtypes={'Grade': 'f4'} để ép dtype cho từng cột
+- NumPy là optional (pyqtgraph đã kéo theo numpy): thiếu numpy -> RuntimeError khi gọi
+
+Benchmark list of dict vs columnar (grade histogram):
+    python columnar.py --rows 500000
+"""
+
+import datetime
+import decimal
+
+try:
+    import numpy as np
+except ImportError:  # numpy là optional, chỉ cần cho execute_columnar
+    np = None
+
+_NUMBER_TYPES = (int, float, decimal.Decimal)
+
+
+def require_numpy():
+    if np is None:
+        raise RuntimeError("numpy is required for execute_columnar (pip install numpy)")
+
+
+def infer_dtype(values):
+    """
+    Dtype cho 1 cột của batch (values: tuple giá trị, có thể có None)
+
+    Returns:
+        numpy dtype, hoặc None nếu cả batch đều NULL
+    """
+    types = set(map(type, values))
+    types.discard(type(None))
+    if not types:
+        return None
+    if types == {bool}:
+        return np.dtype(bool)
+    if all(issubclass(t, int) for t in types):
+        return np.dtype(np.int64)
+    if all(issubclass(t, _NUMBER_TYPES) for t in types):
+        return np.dtype(np.float64)
+    if types == {datetime.date}:
+        return np.dtype('datetime64[D]')
+    if all(issubclass(t, datetime.date) for t in types):
+        return np.dtype('datetime64[us]')
+    if types == {datetime.timedelta}:
+        return np.dtype('timedelta64[us]')
+    return np.dtype(object)
+
+
+class ColumnBuilder:
+    """Ghép các batch của 1 cột thành 1 array (masked nếu có NULL)"""
+
+    def __init__(self, name, dtype=None):
+        self.name = name
+        self.dtype = np.dtype(dtype) if dtype is not None else None
+        self._chunks = []  # (data, mask) hoặc (None, length) nếu cả chunk là NULL
+
+    def append(self, values):
+        dtype = self.dtype or infer_dtype(values)
+        if dtype is None:
+            self._chunks.append((None, len(values)))
+            return
+        raw = np.array(values, dtype=object)
+        mask = np.equal(raw, None)
+        if mask.any():
+            if dtype != object:
+                raw[mask] = 0
+            data = raw.astype(dtype)
+        else:
+            data = raw.astype(dtype)
+            mask = None
+        self._chunks.append((data, mask))
+
+    def build(self):
+        dtypes = [data.dtype for data, _ in self._chunks if data is not None]
+        dtype = self.dtype or (np.result_type(*dtypes) if dtypes else np.dtype(object))
+
+        datas, masks, has_null = [], [], False
+        for data, mask in self._chunks:
+            if data is None:
+                datas.append(np.zeros(mask, dtype=dtype) if dtype != object else np.full(mask, None, dtype=object))
+                masks.append(np.ones(mask, dtype=bool))
+                has_null = True
+            else:
+                datas.append(data.astype(dtype, copy=False))
+                masks.append(mask if mask is not None else np.zeros(len(data), dtype=bool))
+                has_null = has_null or mask is not None
+
+        if not datas:
+            return np.empty(0, dtype=dtype)
+        values = np.concatenate(datas) if len(datas) > 1 else datas[0]
+        if not has_null:
+            return values
+        return np.ma.MaskedArray(values, mask=np.concatenate(masks))
+
+
+def fetch_columnar(cursor, batch_size=10000, dtypes=None):
+    """
+    Đọc hết result của cursor (tuple rows) thành dict tên cột -> array
+
+    Args:
+        cursor: Cursor đã execute (dictionary=False)
+        batch_size: Số rows mỗi fetchmany()
+        dtypes: dict tên cột -> dtype để ép kiểu (cột khác tự suy ra)
+    """
+    require_numpy()
+    dtypes = dtypes or {}
+    columns = tuple(cursor.column_names)
+    builders = [ColumnBuilder(name, dtypes.get(name)) for name in columns]
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for builder, values in zip(builders, zip(*rows)):
+            builder.append(values)
+    return {builder.name: builder.build() for builder in builders}
+
+
+def rows_to_columns(rows, columns, dtypes=None):
+    """list of dict (vd: 1 result set của db.execute_batch) -> dict tên cột -> array"""
+    require_numpy()
+    dtypes = dtypes or {}
+    result = {}
+    for name in columns:
+        builder = ColumnBuilder(name, dtypes.get(name))
+        if rows:
+            builder.append(tuple(row[name] for row in rows))
+        result[name] = builder.build()
+    return result
+
+
+# ============================================================
+# GRADE HISTOGRAM (vectorized)
+# ============================================================
+
+# Khoảng điểm của dashboard chart (giống GRADE_DISTRIBUTION_SQL)
+GRADE_BINS = (0.0, 5.0, 7.0, 8.5, 10.0)
+GRADE_LABELS = ('0 - 5', '5 - 7', '7 - 8.5', '8.5 - 10')
+
+
+def grade_histogram(grades, bins=GRADE_BINS):
+    """
+    Đếm số điểm theo khoảng [bins[i], bins[i+1]) (khoảng cuối gồm cả 10)
+
+    Args:
+        grades: array điểm (MaskedArray: NULL bị bỏ qua)
+    """
+    if isinstance(grades, np.ma.MaskedArray):
+        grades = grades.compressed()
+    edges = np.asarray(bins, dtype=np.float64)
+    # < 5 -> 0, < 7 -> 1, < 8.5 -> 2, còn lại -> 3 (giống CASE trong SQL)
+    index = np.searchsorted(edges[1:-1], grades, side='right')
+    return np.bincount(index, minlength=len(edges) - 1)
+
+
+def benchmark_grade_histogram(rows=500_000):
+    """
+    Histogram điểm từ enrollments: list of dict + loop Python vs execute_columnar + numpy
+
+    Returns:
+        dict: thời gian của từng cách và kết quả (phải giống nhau)
+    """
+    import os
+    import time
+
+    os.environ.setdefault('DB_BACKEND', 'sqlite')
+    from db_connection import db
+
+    db.execute_update("DROP TABLE IF EXISTS bench_grades")
+    db.execute_update("CREATE TABLE bench_grades (StudentID INT NOT NULL, Grade DECIMAL(4,2))")
+    db.execute_many(
+        "INSERT INTO bench_grades (StudentID, Grade) VALUES (%s, %s)",
+        [(i, None if i % 17 == 0 else round((i * 7) % 1001 / 100, 2)) for i in range(rows)]
+    )
+    sql = "SELECT StudentID, Grade FROM bench_grades"
+
+    started = time.perf_counter()
+    counts = [0] * len(GRADE_LABELS)
+    for row in db.execute_query(sql):
+        grade = row['Grade']
+        if grade is None:
+            continue
+        grade = float(grade)
+        counts[0 if grade < 5 else 1 if grade < 7 else 2 if grade < 8.5 else 3] += 1
+    dict_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    columns = db.execute_columnar(sql)
+    histogram = grade_histogram(columns['Grade'])
+    columnar_seconds = time.perf_counter() - started
+
+    db.execute_update("DROP TABLE bench_grades")
+    assert list(histogram) == counts, (list(histogram), counts)
+    return {
+        'rows': rows,
+        'dict_loop_s': round(dict_seconds, 3),
+        'columnar_s': round(columnar_seconds, 3),
+        'dtypes': {name: str(array.dtype) for name, array in columns.items()},
+        'histogram': dict(zip(GRADE_LABELS, histogram.tolist())),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark list of dict vs columnar NumPy results")
+    parser.add_argument("--rows", type=int, default=500_000)
+    args = parser.parse_args()
+
+    for key, value in benchmark_grade_histogram(args.rows).items():
+        print(f"{key:>12}: {value}")
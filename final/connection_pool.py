@@ -0,0 +1,403 @@
+# connection_pool.py - Elastic Connection Pool
+"""
+GIẢI THÍCH:
+- pooling.MySQLConnectionPool có size cố định và raise PoolError ngay khi hết connection
+  -> burst ngắn biến thành lỗi cho user
+- ElasticConnectionPool:
+  + min_size connections luôn sẵn sàng, tối đa max_size connections thường trực
+  + max_overflow connections tạm thời khi burst, đóng ngay khi trả về
+  + Hết connection -> chờ (bounded wait queue) tối đa `timeout` giây
+  + Reaper thread đóng connection idle quá idle_timeout (giữ lại min_size)
+  + Connection sống quá max_lifetime được recycle khi checkout/trả về
+  + Trả về pool -> rollback + reset_session() (COM_RESET_CONNECTION): SET SESSION ...,
+    user variables, temporary tables không lọt sang lần checkout sau.
+    Reset cũng DEALLOCATE prepared statements -> conn.state (prepared statement cache)
+    bị xóa theo; tắt bằng reset_session=False nếu code luôn tự khôi phục session state
+
+Usage:
+    pool = ElasticConnectionPool(lambda: mysql.connector.connect(**cfg), max_size=10)
+    conn = pool.get_connection()
+    ...
+    conn.close()   # trả về pool, không đóng thật
+
+Stress test (không cần MySQL server):
+    python connection_pool.py --stress
+"""
+
+import logging
+import threading
+import time
+
+from mysql.connector import errors
+
+logger = logging.getLogger(__name__)
+
+
+class _PoolEntry:
+    """1 connection thật + metadata"""
+
+    __slots__ = ('cnx', 'created_at', 'last_used', 'overflow', 'state')
+
+    def __init__(self, cnx, overflow=False):
+        now = time.monotonic()
+        self.cnx = cnx
+        self.created_at = now
+        self.last_used = now
+        self.overflow = overflow
+        self.state = {}  # Per-connection state (vd: prepared statement cache)
+
+
+class PooledConnection:
+    """
+    Wrapper trả về từ get_connection()
+
+    - Mọi attribute khác được delegate sang connection thật
+    - close() trả connection về pool thay vì đóng
+    - state: dict riêng của connection thật (cache theo connection)
+    """
+
+    def __init__(self, pool, entry):
+        self._pool = pool
+        self._entry = entry
+
+    def __getattr__(self, name):
+        entry = self.__dict__.get('_entry')
+        if entry is None:
+            raise errors.InterfaceError("Connection has been returned to the pool")
+        return getattr(entry.cnx, name)
+
+    @property
+    def pool(self):
+        """Pool sở hữu connection (primary / replica)"""
+        return self._pool
+
+    @property
+    def state(self):
+        """Dict gắn với connection thật, sống cho tới khi connection bị đóng"""
+        return self._entry.state
+
+    def close(self):
+        if self._entry is not None:
+            entry, self._entry = self._entry, None
+            self._pool._release(entry)
+
+
+class ElasticConnectionPool:
+    """
+    Thread-safe connection pool với overflow, blocking checkout và recycling
+
+    Args:
+        creator: Callable trả về 1 connection mới
+        min_size: Số connection giữ sẵn (pre-create khi khởi tạo)
+        max_size: Số connection thường trực tối đa
+        max_overflow: Số connection tạm thời thêm khi burst
+        timeout: Thời gian chờ tối đa khi checkout (giây)
+        max_waiters: Số thread tối đa được phép chờ cùng lúc
+        idle_timeout: Đóng connection idle lâu hơn (giây), 0 = không reap
+        max_lifetime: Recycle connection sống lâu hơn (giây), 0 = không giới hạn
+        ping_after: Kiểm tra connection còn sống nếu idle lâu hơn (giây)
+        reap_interval: Chu kỳ chạy reaper (giây)
+        reset_session: Reset session state khi connection được trả về (bỏ qua với
+            connection không có reset_session(), vd SQLite)
+    """
+
+    def __init__(self, creator, min_size=1, max_size=5, max_overflow=5, timeout=10.0,
+                 max_waiters=50, idle_timeout=300.0, max_lifetime=1800.0,
+                 ping_after=30.0, reap_interval=30.0, name="student_pool", reset_session=True):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Require 0 <= min_size <= max_size and max_size >= 1")
+
+        self.creator = creator
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_waiters = max_waiters
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.reset_session = reset_session
+        self.pool_name = name
+
+        self._cond = threading.Condition()
+        self._idle = []        # LIFO: connection vừa dùng xong (còn "ấm") được lấy trước
+        self._total = 0        # Tổng số connection đang mở (idle + in use)
+        self._overflow = 0     # Số overflow connections đang mở
+        self._waiting = 0
+        self._closed = False
+
+        for _ in range(min_size):
+            self._idle.append(self._create_entry(overflow=False))
+            self._total += 1
+
+        self._reaper_stop = threading.Event()
+        if reap_interval and (idle_timeout or max_lifetime):
+            self._reaper = threading.Thread(
+                target=self._reap_loop, args=(reap_interval,),
+                name=f"{name}-reaper", daemon=True
+            )
+            self._reaper.start()
+
+    # Giữ tương thích với pooling.MySQLConnectionPool.pool_size
+    @property
+    def pool_size(self):
+        return self.max_size + self.max_overflow
+
+    # ------------------------------------------------------------
+    # Checkout / release
+    # ------------------------------------------------------------
+
+    def get_connection(self, timeout=None):
+        """
+        Lấy connection, chờ tối đa `timeout` giây nếu pool đang cạn
+
+        Raises:
+            errors.PoolError: Hết thời gian chờ hoặc wait queue đầy
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise errors.PoolError("Pool is closed")
+
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+
+                if self._total < self.max_size + self.max_overflow:
+                    overflow = self._total >= self.max_size
+                    self._total += 1
+                    if overflow:
+                        self._overflow += 1
+                    entry = None
+                    break
+
+                if self._waiting >= self.max_waiters:
+                    raise errors.PoolError(
+                        f"Pool '{self.pool_name}' exhausted and wait queue is full ({self.max_waiters})"
+                    )
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise errors.PoolError(
+                        f"Timed out after {timeout}s waiting for a connection from '{self.pool_name}'"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+        # I/O (connect / ping) làm ngoài lock
+        if entry is None:
+            try:
+                entry = self._create_entry(overflow=overflow)
+            except Exception:
+                self._forget(overflow)
+                raise
+        else:
+            entry = self._validate(entry)
+
+        entry.last_used = time.monotonic()
+        return PooledConnection(self, entry)
+
+    def _release(self, entry):
+        """Nhận connection về từ PooledConnection.close()"""
+        now = time.monotonic()
+        usable = not self._closed and not self._expired(entry, now)
+        if usable:
+            try:
+                if entry.cnx.in_transaction:
+                    entry.cnx.rollback()
+                if self.reset_session and hasattr(entry.cnx, 'reset_session'):
+                    entry.cnx.reset_session()
+                    entry.state.clear()  # Prepared statements đã bị server DEALLOCATE
+            except Exception:
+                usable = False
+
+        with self._cond:
+            # Overflow connection chỉ được giữ lại nếu đang có thread chờ
+            if usable and (not entry.overflow or self._waiting):
+                entry.last_used = now
+                self._idle.append(entry)
+                self._cond.notify()
+                return
+
+        self._close_entry(entry)
+
+    def _validate(self, entry):
+        """Recycle connection hết hạn / chết; trả về entry dùng được"""
+        now = time.monotonic()
+        healthy = not self._expired(entry, now)
+        if healthy and self.ping_after and now - entry.last_used > self.ping_after:
+            try:
+                healthy = entry.cnx.is_connected()
+            except Exception:
+                healthy = False
+        if healthy:
+            return entry
+
+        overflow = entry.overflow
+        self._close_cnx(entry.cnx)
+        try:
+            return self._create_entry(overflow=overflow)
+        except Exception:
+            self._forget(overflow)
+            raise
+
+    # ------------------------------------------------------------
+    # Lifecycle helpers
+    # ------------------------------------------------------------
+
+    def _create_entry(self, overflow):
+        return _PoolEntry(self.creator(), overflow=overflow)
+
+    def _expired(self, entry, now):
+        return bool(self.max_lifetime) and now - entry.created_at > self.max_lifetime
+
+    def _forget(self, overflow):
+        """Bớt 1 slot (connection đã đóng hoặc tạo thất bại) và đánh thức 1 waiter"""
+        with self._cond:
+            self._total -= 1
+            if overflow:
+                self._overflow -= 1
+            self._cond.notify()
+
+    def _close_entry(self, entry):
+        self._close_cnx(entry.cnx)
+        self._forget(entry.overflow)
+
+    @staticmethod
+    def _close_cnx(cnx):
+        try:
+            cnx.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection: {e}")
+
+    def _reap_loop(self, interval):
+        while not self._reaper_stop.wait(interval):
+            self.reap()
+
+    def reap(self):
+        """Đóng connection idle quá lâu hoặc quá tuổi (giữ lại min_size)"""
+        now = time.monotonic()
+        victims = []
+        with self._cond:
+            keep = []
+            # _idle là LIFO -> đầu list là connection idle lâu nhất
+            for entry in self._idle:
+                too_idle = bool(self.idle_timeout) and now - entry.last_used > self.idle_timeout
+                if self._expired(entry, now) or (too_idle and self._total - len(victims) > self.min_size):
+                    victims.append(entry)
+                else:
+                    keep.append(entry)
+            self._idle = keep
+
+        for entry in victims:
+            self._close_entry(entry)
+        if victims:
+            logger.info(f"Pool '{self.pool_name}' reaped {len(victims)} idle/expired connections")
+        return len(victims)
+
+    def close(self):
+        """Đóng toàn bộ idle connections; connection đang dùng sẽ đóng khi trả về"""
+        self._reaper_stop.set()
+        with self._cond:
+            self._closed = True
+            victims, self._idle = self._idle, []
+            self._cond.notify_all()
+        for entry in victims:
+            self._close_entry(entry)
+
+    def status(self):
+        """Số liệu thực tế của pool (dùng cho db.pool_stats())"""
+        with self._cond:
+            return {
+                'open': self._total,
+                'idle': len(self._idle),
+                'in_use': self._total - len(self._idle),
+                'overflow': self._overflow,
+                'waiting': self._waiting,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'max_overflow': self.max_overflow,
+            }
+
+
+# ============================================================
+# STRESS TEST
+# ============================================================
+
+def stress_test(threads=64, iterations=200, max_size=5, max_overflow=5, hold_ms=2.0):
+    """
+    Hammer pool từ nhiều threads với fake connections (không cần MySQL)
+
+    Kiểm tra:
+    - Không bao giờ vượt quá max_size + max_overflow connections
+    - Mọi checkout đều thành công (chờ thay vì fail) khi timeout đủ lớn
+    - Sau khi xong, không còn connection nào in use
+    """
+    import random
+
+    class _FakeConnection:
+        in_transaction = False
+
+        def is_connected(self):
+            return True
+
+        def rollback(self):
+            pass
+
+        def close(self):
+            pass
+
+    pool = ElasticConnectionPool(
+        _FakeConnection, min_size=1, max_size=max_size, max_overflow=max_overflow,
+        timeout=30.0, max_waiters=threads, idle_timeout=0.5, max_lifetime=2.0,
+        ping_after=0.1, reap_interval=0.2, name="stress_pool"
+    )
+    peak = {'open': 0}
+    failures = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(iterations):
+            try:
+                conn = pool.get_connection()
+            except errors.PoolError as e:
+                failures.append(e)
+                continue
+            with lock:
+                peak['open'] = max(peak['open'], pool.status()['open'])
+            time.sleep(random.uniform(0, hold_ms) / 1000)
+            conn.close()
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    status = pool.status()
+    pool.close()
+
+    assert peak['open'] <= max_size + max_overflow, f"Pool grew to {peak['open']}"
+    assert status['in_use'] == 0, f"Leaked connections: {status}"
+    assert not failures, f"{len(failures)} checkouts failed: {failures[0]}"
+
+    total = threads * iterations
+    print(f"✓ {total} checkouts from {threads} threads in {elapsed:.2f}s "
+          f"({total / elapsed:.0f}/s), peak open={peak['open']}, final={status}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if "--stress" in sys.argv:
+        stress_test()
+    else:
+        print("Usage: python connection_pool.py --stress")
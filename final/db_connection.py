@@ -8,14 +8,392 @@ GIẢI THÍCH:
 """
 
 import mysql.connector
-from mysql.connector import pooling, Error
+from mysql.connector import errors, Error
+from connection_pool import ElasticConnectionPool
+from row_formats import ResultRows, convert_row, convert_rows
+from batch_writer import DEFAULT_MAX_BYTES, MAX_PARAMS, flatten, iter_chunks, parse_insert
+from retry_policy import RETRY_CONFIG, RetryPolicy
+from query_cancel import CancelHandle, add_max_execution_time
+from slow_query_log import SLOW_QUERY_CONFIG, SlowQueryLog
+from columnar import fetch_columnar, require_numpy
+from statement_stats import StatementRegistry
 from contextlib import contextmanager
+from collections import OrderedDict
+import json
 import logging
+import os
+import re
+import threading
+import time
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Thông tin kết nối dùng chung cho sync pool và async pool (async_db_connection.py)
+# Override bằng environment variables (DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'port': int(os.getenv('DB_PORT', '3306')),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', 'lequyen5002'),
+    'database': os.getenv('DB_NAME', 'student_management'),
+}
+
+# Backend: 'mysql' (mặc định) hoặc 'sqlite' (file / :memory:, xem sqlite_backend.py)
+DB_BACKEND = os.getenv('DB_BACKEND', 'mysql')
+SQLITE_PATH = os.getenv('DB_SQLITE_PATH', ':memory:')
+
+# Read replica (optional): set DB_REPLICA_HOST để bật read/write splitting
+# Các thông tin khác mặc định giống primary
+REPLICA_CONFIG = {
+    'host': os.getenv('DB_REPLICA_HOST'),
+    'port': int(os.getenv('DB_REPLICA_PORT', DB_CONFIG['port'])),
+    'user': os.getenv('DB_REPLICA_USER', DB_CONFIG['user']),
+    'password': os.getenv('DB_REPLICA_PASSWORD', DB_CONFIG['password']),
+    'database': os.getenv('DB_REPLICA_NAME', DB_CONFIG['database']),
+}
+
+# Sau khi 1 thread ghi, reads của thread đó đi primary trong N giây (read-your-writes)
+REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', '2'))
+
+# Cấu hình ElasticConnectionPool (xem connection_pool.py)
+POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN', '1')),
+    'max_size': int(os.getenv('DB_POOL_MAX', '5')),
+    'max_overflow': int(os.getenv('DB_POOL_OVERFLOW', '5')),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    'max_waiters': int(os.getenv('DB_POOL_MAX_WAITERS', '50')),
+    'idle_timeout': float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300')),
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+    'reset_session': os.getenv('DB_POOL_RESET_SESSION', '1') == '1',
+}
+
+
+# ============================================================
+# QUERY CACHE - Table-aware result cache (opt-in)
+# ============================================================
+
+# Bảng con bị thay đổi theo khi bảng cha bị ghi (ON DELETE/UPDATE CASCADE, SET NULL)
+FK_DEPENDENTS = {
+    'students': {'enrollments'},
+    'classes': {'enrollments'},
+    'subjects': {'classes'},
+    'lecturers': {'classes'},
+}
+
+_READ_TABLES_RE = re.compile(r'\b(?:FROM|JOIN)\s+`?(\w+)`?', re.IGNORECASE)
+_WRITE_TABLE_RE = re.compile(
+    r'^\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE\s+(?:TABLE\s+)?)\s*`?(\w+)`?',
+    re.IGNORECASE
+)
+
+
+def normalize_sql(query):
+    """Gộp whitespace để các query giống nhau (khác format) có cùng key"""
+    return " ".join(query.split())
+
+
+def tables_read_by(query):
+    """Tập các bảng mà SELECT đọc (FROM/JOIN)"""
+    return {name.lower() for name in _READ_TABLES_RE.findall(query)}
+
+
+def tables_written_by(query):
+    """
+    Tập các bảng bị ảnh hưởng bởi INSERT/UPDATE/DELETE (kể cả cascade)
+
+    Returns:
+        set of table names, hoặc None nếu không nhận diện được (-> invalidate all)
+    """
+    match = _WRITE_TABLE_RE.match(query)
+    if not match:
+        return None
+    tables = {match.group(1).lower()}
+    for table in list(tables):
+        tables |= FK_DEPENDENTS.get(table, set())
+    return tables
+
+
+class QueryCache:
+    """
+    LRU + TTL cache cho kết quả SELECT
+
+    GIẢI THÍCH:
+    - Key = (normalized SQL, params, fetch_one, row_format)
+    - Mỗi entry ghi lại các bảng nó đọc -> write vào bảng đó sẽ evict entry
+    - Counters hits/misses/evictions/invalidations để tune max_entries và ttl
+    """
+
+    def __init__(self, max_entries=256, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, tables, value)
+        self._keys_by_table = {}       # table -> set of keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query, params, fetch_one, row_format='dict'):
+        return normalize_sql(query), tuple(params or ()), fetch_one, row_format
+
+    def get(self, key):
+        """Return cached value hoặc None (miss / hết hạn)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, _, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, tables, value):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, tables, value)
+            for table in tables:
+                self._keys_by_table.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_tables(self, tables):
+        """Evict mọi entry đọc từ 1 trong các bảng (None = clear toàn bộ)"""
+        with self._lock:
+            if tables is None:
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                self._keys_by_table.clear()
+                return
+            for table in tables:
+                for key in list(self._keys_by_table.get(table, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        self.invalidate_tables(None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def _remove(self, key):
+        """Xóa entry (caller giữ lock)"""
+        _, tables, _ = self._entries.pop(key)
+        for table in tables:
+            keys = self._keys_by_table.get(table)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
+
+
+# ============================================================
+# POOL STATS - Checkout latency, saturation, exhaustion
+# ============================================================
+
+class PoolStats:
+    """
+    Thống kê connection pool (thread-safe)
+
+    GIẢI THÍCH:
+    - Checkout wait time histogram (ms) -> thấy được pool có đang bị chờ không
+    - in_use / idle gauges + peak concurrency -> biết còn cách giới hạn bao xa
+      (idle/open đọc từ pool.status(): pool co giãn + overflow nên pool_size - in_use sai)
+    - checkout_failures -> số lần pool cạn (PoolError)
+    - Per-connection: tuổi, số lần checkout -> phát hiện connection bị recycle
+    """
+
+    # Upper bounds (ms) của các bucket; bucket cuối là +inf
+    WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+    def __init__(self, pool_size, pool_status=None):
+        self.pool_size = pool_size
+        self._pool_status = pool_status  # Callable -> ElasticConnectionPool.status()
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.in_use = 0
+            self.peak_in_use = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+            self.total_hold_ms = 0.0
+            self.wait_histogram = [0] * (len(self.WAIT_BUCKETS_MS) + 1)
+            self._connections = {}  # connection key -> {'first_seen', 'checkouts'}
+
+    def record_checkout(self, wait_ms, conn_key):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+            self.wait_histogram[self._bucket(wait_ms)] += 1
+            info = self._connections.setdefault(
+                conn_key, {'first_seen': time.monotonic(), 'checkouts': 0}
+            )
+            info['checkouts'] += 1
+
+    def record_release(self, hold_ms):
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+            self.total_hold_ms += hold_ms
+
+    def record_failure(self, wait_ms):
+        with self._lock:
+            self.checkout_failures += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def snapshot(self):
+        """Dict các chỉ số hiện tại"""
+        pool = self._pool_status() if self._pool_status is not None else None
+        with self._lock:
+            now = time.monotonic()
+            labels = [f"<={b}ms" for b in self.WAIT_BUCKETS_MS] + [f">{self.WAIT_BUCKETS_MS[-1]}ms"]
+            return {
+                'pool_size': self.pool_size,
+                'in_use': self.in_use,
+                'idle': pool['idle'] if pool else max(0, self.pool_size - self.in_use),
+                'open': pool['open'] if pool else None,
+                'peak_in_use': self.peak_in_use,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'avg_wait_ms': round(self.total_wait_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.max_wait_ms, 3),
+                'avg_hold_ms': round(self.total_hold_ms / self.checkouts, 3) if self.checkouts else 0.0,
+                'wait_histogram': dict(zip(labels, self.wait_histogram)),
+                'connections': {
+                    str(key): {
+                        'age_s': round(now - info['first_seen'], 1),
+                        'checkouts': info['checkouts'],
+                    }
+                    for key, info in self._connections.items()
+                },
+            }
+
+    def summary_line(self):
+        """1 dòng log ngắn gọn cho periodic logging"""
+        snap = self.snapshot()
+        return (
+            f"pool in_use={snap['in_use']}/{snap['pool_size']} idle={snap['idle']} peak={snap['peak_in_use']} "
+            f"checkouts={snap['checkouts']} failures={snap['checkout_failures']} "
+            f"avg_wait={snap['avg_wait_ms']}ms max_wait={snap['max_wait_ms']}ms"
+        )
+
+    def _bucket(self, wait_ms):
+        for idx, bound in enumerate(self.WAIT_BUCKETS_MS):
+            if wait_ms <= bound:
+                return idx
+        return len(self.WAIT_BUCKETS_MS)
+
+
+# ============================================================
+# PREPARED STATEMENT CACHE - Per-connection, LRU theo SQL text
+# ============================================================
+
+class StatementCacheStats:
+    """Counters dùng chung cho statement cache của mọi connection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def record(self, hit=False, evicted=False):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if evicted:
+                self.evictions += 1
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+            }
+
+
+class PreparedStatementCache:
+    """
+    LRU cache: SQL text -> prepared cursor, gắn với 1 connection thật
+
+    GIẢI THÍCH:
+    - Prepared cursor (binary protocol) chỉ PREPARE lần đầu, các lần sau
+      chỉ gửi params -> server không phải parse lại SQL
+    - Prepared statement thuộc về 1 connection -> cache nằm trong conn.state
+    - Evict -> cursor.close() để server DEALLOCATE statement
+    """
+
+    def __init__(self, max_statements, stats):
+        self.max_statements = max_statements
+        self.stats = stats
+        self._cursors = OrderedDict()  # (sql, dictionary) -> cursor
+
+    def get(self, conn, query, dictionary):
+        key = (query, dictionary)
+        cursor = self._cursors.get(key)
+        if cursor is not None:
+            self._cursors.move_to_end(key)
+            self.stats.record(hit=True)
+            return cursor
+
+        cursor = conn.cursor(prepared=True, dictionary=dictionary)
+        self._cursors[key] = cursor
+        evicted = len(self._cursors) > self.max_statements
+        if evicted:
+            _, old_cursor = self._cursors.popitem(last=False)
+            self._close(old_cursor)
+        self.stats.record(hit=False, evicted=evicted)
+        return cursor
+
+    def discard(self, query, dictionary):
+        """Bỏ cursor khỏi cache (vd: sau lỗi, trạng thái cursor không chắc chắn)"""
+        cursor = self._cursors.pop((query, dictionary), None)
+        if cursor is not None:
+            self._close(cursor)
+
+    @staticmethod
+    def _close(cursor):
+        try:
+            cursor.close()
+        except Error:
+            pass
+
+
 class DatabaseConnection:
     """
     Singleton Database Connection với Connection Pooling
@@ -28,59 +406,208 @@ class DatabaseConnection:
     
     _instance = None
     _pool = None
+    _cache = None  # QueryCache, None = tắt (opt-in qua enable_cache)
+    _pool_stats = None
+    _stats_logger = None
+    _stmt_cache_size = 0  # 0 = tắt prepared statement cache
+    _stmt_stats = None
+    _replica_pool = None  # None = không có replica, mọi query đi primary
+    _replica_stats = None
+    _max_packet = None  # @@max_allowed_packet (MySQL), đọc 1 lần
+    _retry_policy = RetryPolicy(**RETRY_CONFIG)  # None = tắt retry
+    _slow_log = None  # SlowQueryLog, None = tắt (enable_slow_query_log)
+    _statement_stats = StatementRegistry()  # Metrics theo fingerprint, luôn bật
+    _explain_conn = None  # Side connection cho EXPLAIN (chỉ dùng trên thread của slow log)
+    _local = threading.local()  # last_write per thread (read-your-writes)
+    _init_lock = threading.Lock()
     
     def __new__(cls):
+        # Double-checked: 2 threads gọi DatabaseConnection() lần đầu cùng lúc vẫn
+        # nhận chung 1 instance (pool được tạo 1 lần trong _ensure_pool)
         if cls._instance is None:
-            cls._instance = super().__new__(cls)
+            with cls._init_lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
         return cls._instance
     
     def __init__(self):
+        # Pool được tạo lazily ở lần query đầu tiên (_ensure_pool):
+        # import db_connection / models không mở connection nào
+        pass
+    
+    def _ensure_pool(self):
+        """Tạo pool nếu chưa có (thread-safe, chỉ 1 lần)"""
         if self._pool is None:
-            self._initialize_pool()
+            with self._init_lock:
+                if self._pool is None:
+                    self._initialize_pool()
+    
+    @property
+    def pool_initialized(self):
+        return self._pool is not None
     
     def _initialize_pool(self):
-        """Khởi tạo connection pool"""
-        try:
-            self._pool = pooling.MySQLConnectionPool(
-                pool_name="student_pool",
-                pool_size=5,  # Số connection tối đa
-                pool_reset_session=True,
-                host='localhost',
-                user='root',
-                password='lequyen5002',
-                database='student_management',
-                autocommit=False  # Tắt autocommit để control transactions
-            )
+        """Khởi tạo connection pool theo DB_BACKEND"""
+        try:
+            pool = self._create_pool(DB_BACKEND)
+            self._pool_stats = PoolStats(pool.pool_size, pool.status)
+            self._pool = pool  # Gán sau cùng: thread khác thấy _pool != None là dùng được
             logger.info("✓ Database pool initialized successfully")
         except Error as e:
             logger.error(f"✗ Failed to create pool: {e}")
             raise
+        
+        if DB_BACKEND == 'mysql' and REPLICA_CONFIG['host']:
+            self._initialize_replica_pool()
+    
+    @staticmethod
+    def _create_pool(backend, **options):
+        """
+        Tạo pool cho backend
+        
+        Args:
+            backend: 'mysql' hoặc 'sqlite'
+            options: sqlite: path, bootstrap
+        """
+        if backend == 'mysql':
+            return ElasticConnectionPool(
+                lambda: mysql.connector.connect(
+                    **DB_CONFIG,
+                    autocommit=False  # Tắt autocommit để control transactions
+                ),
+                name="student_pool",
+                **POOL_CONFIG
+            )
+        if backend == 'sqlite':
+            from sqlite_backend import create_sqlite_pool
+            options.setdefault('path', SQLITE_PATH)
+            return create_sqlite_pool(**options, **POOL_CONFIG)
+        raise ValueError(f"Unknown database backend: {backend}")
+    
+    def use_backend(self, backend, **options):
+        """
+        Chuyển sang backend khác lúc runtime (vd: test/benchmark trên SQLite)
+        
+        Usage:
+            db.use_backend('sqlite', path=':memory:')
+        """
+        global DB_BACKEND
+        new_pool = self._create_pool(backend, **options)
+        old_pools = [p for p in (self._pool, self._replica_pool) if p is not None]
+        self._pool = new_pool
+        self._pool_stats = PoolStats(new_pool.pool_size, new_pool.status)
+        self._replica_pool = None
+        self._replica_stats = None
+        DB_BACKEND = backend
+        if self._cache is not None:
+            self._cache.clear()
+        for pool in old_pools:
+            pool.close()
+        logger.info(f"✓ Switched database backend to {backend}")
+    
+    def _initialize_replica_pool(self):
+        """Khởi tạo pool cho read replica (lỗi -> chạy tiếp chỉ với primary)"""
+        try:
+            self._replica_pool = ElasticConnectionPool(
+                lambda: mysql.connector.connect(**REPLICA_CONFIG, autocommit=False),
+                name="student_replica_pool",
+                **POOL_CONFIG
+            )
+            self._replica_stats = PoolStats(self._replica_pool.pool_size, self._replica_pool.status)
+            logger.info(f"✓ Read replica pool initialized ({REPLICA_CONFIG['host']})")
+        except Error as e:
+            self._replica_pool = None
+            logger.warning(f"Read replica unavailable, using primary only: {e}")
+    
+    def _route(self, readonly):
+        """Chọn (pool, stats): replica cho reads, trừ khi thread vừa ghi xong"""
+        self._ensure_pool()
+        if readonly and self._replica_pool is not None:
+            last_write = getattr(self._local, 'last_write', None)
+            if last_write is None or time.monotonic() - last_write > REPLICA_STICKY_SECONDS:
+                return self._replica_pool, self._replica_stats
+        return self._pool, self._pool_stats
+    
+    def _mark_write(self):
+        self._local.last_write = time.monotonic()
     
     @contextmanager
-    def get_connection(self):
+    def get_connection(self, readonly=False):
         """
         Context manager để lấy connection từ pool
         
+        Args:
+            readonly: True -> dùng read replica (nếu có và thread không vừa ghi)
+        
         Usage:
             with db.get_connection() as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT * FROM students")
         """
-        connection = None
+        # Trong db.transaction(): dùng lại connection đã pin cho thread này
+        tx_conn = getattr(self._local, 'tx_conn', None)
+        if tx_conn is not None:
+            yield tx_conn
+            return
+        
+        # Trong db.thread_affinity(): checkout 1 lần, dùng lại cho các query sau
+        if getattr(self._local, 'affinity', None) is not None:
+            with self._affine_connection() as conn:
+                yield conn
+            return
+        
+        checkout = None
         try:
-            connection = self._pool.get_connection()
-            yield connection
+            checkout = self._checkout(readonly)
+            yield checkout[0]
         except Error as e:
-            if connection:
-                connection.rollback()
+            if checkout:
+                checkout[0].rollback()
             logger.error(f"Database error: {e}")
             raise
         finally:
-            if connection and connection.is_connected():
-                connection.close()
+            if checkout:
+                self._release(checkout)
+    
+    def _checkout(self, readonly):
+        """
+        Lấy connection từ pool (replica lỗi/cạn -> fallback primary), ghi pool stats
+        
+        Returns:
+            (connection, pool_stats, checked_out_at) -> trả lại bằng _release()
+        """
+        pool, pool_stats = self._route(readonly)
+        started = time.perf_counter()
+        try:
+            connection = pool.get_connection()
+        except Error as e:
+            pool_stats.record_failure((time.perf_counter() - started) * 1000)
+            if pool is self._pool:
+                raise
+            # Replica lỗi/cạn -> fallback về primary
+            logger.warning(f"Replica checkout failed, falling back to primary: {e}")
+            pool, pool_stats = self._pool, self._pool_stats
+            started = time.perf_counter()
+            try:
+                connection = pool.get_connection()
+            except errors.PoolError:
+                pool_stats.record_failure((time.perf_counter() - started) * 1000)
+                raise
+        checked_out_at = time.perf_counter()
+        pool_stats.record_checkout(
+            (checked_out_at - started) * 1000,
+            getattr(connection, 'connection_id', None) or id(connection)
+        )
+        return connection, pool_stats, checked_out_at
+    
+    @staticmethod
+    def _release(checkout):
+        connection, pool_stats, checked_out_at = checkout
+        pool_stats.record_release((time.perf_counter() - checked_out_at) * 1000)
+        connection.close()  # Trả về pool (pool tự loại connection hỏng/hết hạn)
     
     @contextmanager
-    def get_cursor(self, dictionary=True):
+    def get_cursor(self, dictionary=True, readonly=False):
         """
         Context manager để lấy cursor trực tiếp
         
@@ -89,19 +616,262 @@ class DatabaseConnection:
                 cursor.execute("SELECT * FROM students")
                 results = cursor.fetchall()
         """
-        with self.get_connection() as conn:
+        with self.get_connection(readonly=readonly) as conn:
             cursor = conn.cursor(dictionary=dictionary)
             try:
                 yield cursor
-                conn.commit()
+                self._commit(conn)
             except Error as e:
-                conn.rollback()
+                self._rollback(conn)
                 logger.error(f"Query error: {e}")
                 raise
             finally:
                 cursor.close()
     
-    def execute_query(self, query, params=None, fetch_one=False):
+    @contextmanager
+    def _statement_cursor(self, query, params, dictionary=True, readonly=False):
+        """
+        Giống get_cursor(), nhưng dùng prepared statement cache khi đã bật
+        và statement có params (point lookups, INSERT/UPDATE theo ID...)
+        """
+        if not self._stmt_cache_size or not params:
+            with self.get_cursor(dictionary=dictionary, readonly=readonly) as cursor:
+                yield cursor
+            return
+        
+        with self.get_connection(readonly=readonly) as conn:
+            cache = conn.state.get('stmt_cache')
+            if cache is None:
+                cache = PreparedStatementCache(self._stmt_cache_size, self._stmt_stats)
+                conn.state['stmt_cache'] = cache
+            cursor = cache.get(conn, query, dictionary)
+            try:
+                yield cursor
+                self._commit(conn)
+            except Error as e:
+                self._rollback(conn)
+                cache.discard(query, dictionary)
+                logger.error(f"Query error: {e}")
+                raise
+    
+    def _commit(self, conn):
+        """Commit, trừ khi đang trong db.transaction() (scope sẽ commit 1 lần ở cuối)"""
+        if not self.in_transaction():
+            conn.commit()
+    
+    def _rollback(self, conn):
+        """Rollback statement-level; trong transaction() để scope quyết định"""
+        if not self.in_transaction():
+            conn.rollback()
+    
+    # ------------------------------------------------------------
+    # Thread affinity (1 connection / worker thread)
+    # ------------------------------------------------------------
+    
+    @contextmanager
+    def thread_affinity(self):
+        """
+        Giữ 1 connection (primary) cho thread hiện tại trong suốt scope
+        
+        GIẢI THÍCH:
+        - Worker thread (QueryWorker, import, report) chạy nhiều query liên tiếp:
+          mỗi query checkout/trả connection -> churn pool, lock contention
+        - Trong scope: query đầu tiên checkout, các query sau dùng lại connection đó,
+          trả về pool khi ra khỏi scope
+        - Mỗi statement vẫn commit riêng như bình thường (không phải transaction);
+          db.transaction() bên trong dùng lại connection đã giữ
+        - Reads cũng đi primary (bỏ qua replica) vì connection được giữ là của primary
+        - Connection hỏng giữa chừng -> bỏ đi, query sau checkout connection mới
+        - Lồng nhau: scope trong không làm gì
+        
+        Usage:
+            with db.thread_affinity():
+                kpis = QueryModels.get_dashboard_kpis()
+                top = QueryModels.query_top_students()
+        """
+        if getattr(self._local, 'affinity', None) is not None:
+            yield
+            return
+        self._local.affinity = {'checkout': None}
+        try:
+            yield
+        finally:
+            state, self._local.affinity = self._local.affinity, None
+            if state['checkout'] is not None:
+                self._release(state['checkout'])
+    
+    def has_thread_affinity(self):
+        return getattr(self._local, 'affinity', None) is not None
+    
+    @contextmanager
+    def _affine_connection(self):
+        state = self._local.affinity
+        if state['checkout'] is None:
+            state['checkout'] = self._checkout(readonly=False)
+        connection = state['checkout'][0]
+        try:
+            yield connection
+        except Error as e:
+            logger.error(f"Database error: {e}")
+            try:
+                connection.rollback()
+            except Error:
+                pass
+            if not connection.is_connected():
+                # Connection hỏng -> trả về pool (pool loại bỏ), lần sau checkout mới
+                checkout, state['checkout'] = state['checkout'], None
+                self._release(checkout)
+            raise
+    
+    # ------------------------------------------------------------
+    # Unit of work
+    # ------------------------------------------------------------
+    
+    def in_transaction(self):
+        """True nếu thread hiện tại đang ở trong db.transaction()"""
+        return getattr(self._local, 'tx_conn', None) is not None
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Unit-of-work scope: pin 1 connection (primary) cho thread hiện tại
+        
+        GIẢI THÍCH:
+        - Mọi model call bên trong (execute_query/update/insert, get_cursor...)
+          dùng lại connection này thay vì checkout + commit riêng
+        - Commit 1 lần khi ra khỏi scope, rollback toàn bộ nếu có exception
+        - Lồng nhau -> SAVEPOINT: lỗi ở scope con chỉ rollback phần của nó
+        
+        Usage:
+            with db.transaction():
+                class_id = ClassModel.create(data)
+                for sid in student_ids:
+                    EnrollmentModel.create({...})
+        """
+        if self.in_transaction():
+            with self._savepoint() as conn:
+                yield conn
+            return
+        
+        with self.get_connection() as conn:
+            conn.start_transaction()
+            self._local.tx_conn = conn
+            self._local.tx_depth = 0
+            self._local.tx_tables = set()
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                written = self._local.tx_tables
+                self._local.tx_conn = None
+                self._local.tx_tables = None
+                if written:
+                    self._mark_write()
+                    # Invalidate lại sau commit/rollback: reads của thread khác trong lúc
+                    # transaction chạy có thể đã cache dữ liệu cũ
+                    if self._cache is not None:
+                        self._cache.invalidate_tables(None if None in written else written)
+    
+    @contextmanager
+    def _savepoint(self):
+        conn = self._local.tx_conn
+        self._local.tx_depth += 1
+        name = f"sp_{self._local.tx_depth}"
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"SAVEPOINT {name}")
+            try:
+                yield conn
+            except BaseException:
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {name}")
+                raise
+            cursor.execute(f"RELEASE SAVEPOINT {name}")
+        finally:
+            cursor.close()
+            self._local.tx_depth -= 1
+    
+    def run_in_transaction(self, func, *args, **kwargs):
+        """
+        Chạy func(*args, **kwargs) trong db.transaction(), retry cả block khi deadlock /
+        lock wait timeout (transaction đã bị rollback -> chạy lại từ đầu là an toàn)
+        
+        func có thể bị gọi nhiều lần -> không được có side effect ngoài database.
+        Gọi bên trong 1 transaction khác: chạy 1 lần như savepoint, outer block retry.
+        
+        Usage:
+            db.run_in_transaction(lambda: [EnrollmentModel.update(...) for ...])
+        """
+        def attempt():
+            with self.transaction():
+                return func(*args, **kwargs)
+        return self._retrying(attempt)
+    
+    def _retrying(self, func, *args):
+        """Chạy func qua retry policy, trừ khi đang ở trong transaction (outer block retry)"""
+        if self._retry_policy is None or self.in_transaction():
+            return func(*args)
+        return self._retry_policy.run(func, *args)
+    
+    @contextmanager
+    def _limited_cursor(self, handle, timeout_ms, session_limit, dictionary=True, readonly=False):
+        """
+        Cursor cho query có timeout / cancel handle (xem query_cancel.py)
+        
+        Args:
+            handle: CancelHandle được gắn với connection trong lúc query chạy
+            timeout_ms: SQLite -> watchdog interrupt sau timeout_ms
+            session_limit: MySQL, query không nhận hint -> SET SESSION max_execution_time
+        """
+        with self.get_connection(readonly=readonly) as conn:
+            cursor = conn.cursor(dictionary=dictionary)
+            watchdog = None
+            try:
+                handle.attach(self._canceller(conn))
+                if timeout_ms and DB_BACKEND == 'sqlite':
+                    watchdog = threading.Timer(timeout_ms / 1000, handle.expire)
+                    watchdog.daemon = True
+                    watchdog.start()
+                elif session_limit:
+                    cursor.execute("SET SESSION max_execution_time = %s", (int(timeout_ms),))
+                yield cursor
+                self._commit(conn)
+            except Error:
+                self._rollback(conn)  # execute_query log theo outcome (timeout/cancelled/error)
+                raise
+            finally:
+                if watchdog is not None:
+                    watchdog.cancel()
+                handle.detach()
+                if session_limit:
+                    try:
+                        cursor.execute("SET SESSION max_execution_time = DEFAULT")
+                    except Error:
+                        pass
+                cursor.close()
+    
+    def _canceller(self, conn):
+        """Hàm interrupt query đang chạy trên conn, gọi từ thread khác"""
+        if DB_BACKEND == 'sqlite':
+            return conn.interrupt
+        on_replica = self._replica_pool is not None and getattr(conn, 'pool', None) is self._replica_pool
+        config = REPLICA_CONFIG if on_replica else DB_CONFIG
+        connection_id = int(conn.connection_id)
+        
+        def kill_query():
+            side = mysql.connector.connect(**config, connection_timeout=5)
+            try:
+                cursor = side.cursor()
+                cursor.execute(f"KILL QUERY {connection_id}")
+                cursor.close()
+            finally:
+                side.close()
+        return kill_query
+    
+    def execute_query(self, query, params=None, fetch_one=False, cache=False, use_primary=False,
+                      row_format='dict', timeout_ms=None, cancel=None):
         """
         Execute SELECT query và return results
         
@@ -109,20 +879,273 @@ class DatabaseConnection:
             query: SQL query string
             params: Query parameters (tuple)
             fetch_one: True để fetchone(), False để fetchall()
+            cache: True để dùng result cache (chỉ có tác dụng khi đã enable_cache)
+            use_primary: True để bỏ qua read replica (cần dữ liệu mới nhất)
+            row_format: 'dict' (mặc định), 'tuple', 'namedtuple' hoặc 'record'
+                        (xem row_formats.py); format khác dict trả ResultRows
+                        có thuộc tính .columns
+            timeout_ms: Giới hạn thời gian chạy (MAX_EXECUTION_TIME / SQLite interrupt)
+            cancel: CancelHandle để cancel query từ thread khác (xem query_cancel.py)
         
         Returns:
-            dict hoặc list of dict
+            dict hoặc list of dict (hoặc row/ResultRows theo row_format);
+            None nếu lỗi, timeout hoặc bị cancel (xem cancel.outcome)
         """
-        try:
-            with self.get_cursor() as cursor:
-                cursor.execute(query, params or ())
+        # Trong transaction có thể đọc dữ liệu chưa commit -> không dùng cache
+        use_cache = cache and self._cache is not None and not self.in_transaction()
+        if use_cache:
+            key = QueryCache.make_key(query, params, fetch_one, row_format)
+            cached = self._cache.get(key)
+            if cached is not None:
+                return self._copy_result(cached)
+        
+        dictionary = row_format == 'dict'
+        handle = cancel if cancel is not None else (CancelHandle() if timeout_ms else None)
+        sql = query
+        session_limit = False
+        if timeout_ms and DB_BACKEND == 'mysql':
+            sql = add_max_execution_time(query, timeout_ms) or query
+            session_limit = sql is query
+        
+        def attempt():
+            if handle is not None:
+                cursor_cm = self._limited_cursor(handle, timeout_ms, session_limit, dictionary=dictionary,
+                                                 readonly=not use_primary)
+            else:
+                cursor_cm = self._statement_cursor(query, params, dictionary=dictionary,
+                                                   readonly=not use_primary)
+            with cursor_cm as cursor:
+                cursor.execute(sql, params or ())
                 if fetch_one:
-                    return cursor.fetchone()
-                return cursor.fetchall()
+                    result = cursor.fetchone()
+                    if result is not None:
+                        cursor.fetchall()  # Đọc hết để cursor (có thể được cache) sạch
+                else:
+                    result = cursor.fetchall()
+                if not dictionary:
+                    columns = cursor.column_names
+                    if fetch_one:
+                        result = convert_row(result, columns, row_format)
+                    else:
+                        result = convert_rows(result, columns, row_format)
+                return result
+        
+        started = time.perf_counter()
+        try:
+            result = self._retrying(attempt)
         except Error as e:
-            logger.error(f"Query failed: {query[:100]}... Error: {e}")
+            self._observe('query', query, params, started, error=e)
+            outcome = handle.finish(e) if handle is not None else 'error'
+            if outcome == 'timeout':
+                logger.warning(f"Query exceeded {timeout_ms} ms: {query[:100]}...")
+            elif outcome == 'cancelled':
+                logger.info(f"Query cancelled: {query[:100]}...")
+            else:
+                logger.error(f"Query failed: {query[:100]}... Error: {e}")
             return None
+        if handle is not None:
+            handle.finish()
+        self._observe('query', query, params, started,
+                      rows=(1 if result is not None else 0) if fetch_one else len(result))
+        
+        if use_cache and result is not None:
+            self._cache.put(key, tables_read_by(query), self._copy_result(result))
+        return result
+    
+    @staticmethod
+    def _copy_result(result):
+        """Copy rows để caller sửa dict/list không làm hỏng cache"""
+        if isinstance(result, dict):
+            return dict(result)
+        if isinstance(result, ResultRows):
+            return result.copy()  # tuple/namedtuple rows immutable
+        if isinstance(result, list):
+            return [dict(row) for row in result]
+        return result
     
+    def stream_query(self, query, params=None, batch_size=1000):
+        """
+        Execute SELECT query và yield từng row (dict) với memory cố định
+
+        GIẢI THÍCH:
+        - execute_query() gọi fetchall() -> toàn bộ result nằm trong RAM
+        - Ở đây dùng unbuffered cursor + fetchmany(batch_size): server stream
+          rows về, client chỉ giữ tối đa batch_size rows
+        - Connection được giữ cho tới khi iterator chạy hết hoặc bị close()
+
+        Usage:
+            for row in db.stream_query("SELECT * FROM enrollments"):
+                writer.writerow(row)
+
+        Args:
+            query: SQL query string
+            params: Query parameters (tuple)
+            batch_size: Số rows mỗi lần fetchmany()
+
+        Yields:
+            dict cho mỗi row
+        """
+        with self.get_connection(readonly=True) as conn:
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            try:
+                cursor.execute(query, params or ())
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    yield from rows
+                self._commit(conn)
+            finally:
+                # Consumer dừng sớm -> đọc bỏ phần còn lại để connection sạch khi trả về pool
+                if conn.unread_result:
+                    conn.consume_results()
+                cursor.close()
+
+    def execute_columnar(self, query, params=None, dtypes=None, batch_size=10000, use_primary=False):
+        """
+        Execute SELECT query và return dict tên cột -> NumPy array (xem columnar.py)
+        
+        Usage:
+            cols = db.execute_columnar("SELECT StudentID, Grade FROM enrollments")
+            cols['Grade'].mean()  # MaskedArray: bỏ qua NULL
+        
+        Args:
+            query: SQL query string
+            params: Query parameters (tuple)
+            dtypes: dict tên cột -> dtype để ép kiểu (vd: {'Grade': 'f4'})
+            batch_size: Số rows mỗi fetchmany()
+            use_primary: True để bỏ qua read replica
+        
+        Returns:
+            dict: tên cột -> ndarray (MaskedArray nếu cột có NULL)
+        
+        Raises:
+            RuntimeError nếu chưa cài numpy; Error nếu query lỗi
+        """
+        require_numpy()
+        
+        def attempt():
+            with self.get_connection(readonly=not use_primary) as conn:
+                cursor = conn.cursor(dictionary=False, buffered=False)
+                try:
+                    cursor.execute(query, params or ())
+                    columns = fetch_columnar(cursor, batch_size=batch_size, dtypes=dtypes)
+                    self._commit(conn)
+                    return columns
+                finally:
+                    cursor.close()
+        
+        started = time.perf_counter()
+        try:
+            columns = self._retrying(attempt)
+        except Error as e:
+            self._observe('query', query, params, started, error=e)
+            logger.error(f"Columnar query failed: {query[:100]}... Error: {e}")
+            raise
+        self._observe('query', query, params, started,
+                      rows=len(next(iter(columns.values()))) if columns else 0)
+        return columns
+
+    def execute_batch(self, statements, cache=False, use_primary=False):
+        """
+        Chạy nhiều SELECT trên 1 connection, MySQL: 1 round trip (multi-statement)
+        
+        GIẢI THÍCH:
+        - Dashboard refresh = KPIs + grade distribution + top students: chạy tuần tự
+          thì mỗi query 1 checkout + 1 round trip + 1 commit
+        - MySQL: nối các statements bằng ';' gửi 1 lần, đọc lần lượt từng result set
+          (CLIENT_MULTI_STATEMENTS, bật sẵn trong mysql-connector)
+        - SQLite (in-process, không có round trip): chạy tuần tự trên cùng connection
+        - cache=True: statement đã có trong result cache không được gửi lại
+        
+        Usage:
+            kpis, dist = db.execute_batch([(KPI_SQL, None), (DIST_SQL, (5,))])
+        
+        Args:
+            statements: list of (sql, params); chỉ SELECT / WITH
+            cache: Dùng result cache cho từng statement (khi đã enable_cache)
+            use_primary: True để bỏ qua read replica
+        
+        Returns:
+            list of result sets (list of dict), cùng thứ tự với statements
+        
+        Raises:
+            ValueError nếu có statement không phải SELECT; Error nếu batch lỗi
+        """
+        statements = [(sql.strip().rstrip(';'), tuple(params or ())) for sql, params in statements]
+        for sql, _ in statements:
+            if not sql[:6].lower().startswith(('select', 'with')):
+                raise ValueError(f"execute_batch only runs SELECT statements: {sql[:60]}...")
+        
+        results = [None] * len(statements)
+        use_cache = cache and self._cache is not None and not self.in_transaction()
+        pending = []
+        for index, (sql, params) in enumerate(statements):
+            if use_cache:
+                cached = self._cache.get(QueryCache.make_key(sql, params, False))
+                if cached is not None:
+                    results[index] = self._copy_result(cached)
+                    continue
+            pending.append(index)
+        if not pending:
+            return results
+        
+        batch_sql = ";\n".join(statements[i][0] for i in pending)
+        batch_params = tuple(value for i in pending for value in statements[i][1])
+        
+        def attempt():
+            with self.get_connection(readonly=not use_primary) as conn:
+                cursor = conn.cursor(dictionary=True)
+                try:
+                    if DB_BACKEND == 'sqlite':
+                        result_sets = []
+                        for i in pending:
+                            cursor.execute(*statements[i])
+                            result_sets.append(cursor.fetchall())
+                    else:
+                        result_sets = self._fetch_result_sets(cursor, batch_sql, batch_params)
+                    self._commit(conn)
+                    return result_sets
+                except Error:
+                    self._rollback(conn)
+                    raise
+                finally:
+                    cursor.close()
+        
+        started = time.perf_counter()
+        try:
+            result_sets = self._retrying(attempt)
+        except Error as e:
+            self._observe('batch', batch_sql, batch_params, started, error=e)
+            logger.error(f"Batch query failed: {batch_sql[:100]}... Error: {e}")
+            raise
+        self._observe('batch', batch_sql, batch_params, started, rows=sum(len(r) for r in result_sets))
+        
+        for i, rows in zip(pending, result_sets):
+            results[i] = rows
+            if use_cache:
+                sql, params = statements[i]
+                self._cache.put(QueryCache.make_key(sql, params, False), tables_read_by(sql),
+                                self._copy_result(rows))
+        return results
+    
+    @staticmethod
+    def _fetch_result_sets(cursor, sql, params):
+        """Gửi multi-statement 1 lần, đọc từng result set theo thứ tự"""
+        try:
+            results = cursor.execute(sql, params, multi=True)  # mysql-connector 8.x
+        except TypeError:
+            results = None
+        if results is not None:
+            return [result.fetchall() for result in results if result.with_rows]
+        
+        # mysql-connector >= 9.2: multi= đã bỏ, dùng map_results + nextset()
+        cursor.execute(sql, params, map_results=True)
+        result_sets = [cursor.fetchall()]
+        while cursor.nextset():
+            result_sets.append(cursor.fetchall())
+        return result_sets
+
     def execute_update(self, query, params=None):
         """
         Execute INSERT/UPDATE/DELETE và return affected rows
@@ -134,17 +1157,54 @@ class DatabaseConnection:
         Returns:
             Number of affected rows
         """
-        try:
-            with self.get_cursor(dictionary=False) as cursor:
+        def attempt():
+            with self._statement_cursor(query, params, dictionary=False) as cursor:
                 cursor.execute(query, params or ())
                 return cursor.rowcount
+        
+        started = time.perf_counter()
+        try:
+            affected = self._retrying(attempt)
         except Error as e:
+            self._observe('update', query, params, started, error=e)
             logger.error(f"Update failed: {query[:100]}... Error: {e}")
             raise
+        self._observe('update', query, params, started, rows=affected)
+        self._mark_write()
+        self._invalidate_cache_for(query)
+        return affected
+    
+    def execute_insert(self, query, params=None):
+        """
+        Execute INSERT và return lastrowid (AUTO_INCREMENT ID)
+        
+        Args:
+            query: SQL INSERT string
+            params: Query parameters (tuple)
+        
+        Returns:
+            ID của row vừa insert
+        """
+        def attempt():
+            with self._statement_cursor(query, params, dictionary=False) as cursor:
+                cursor.execute(query, params or ())
+                return cursor.lastrowid
+        
+        started = time.perf_counter()
+        try:
+            new_id = self._retrying(attempt)
+        except Error as e:
+            self._observe('insert', query, params, started, error=e)
+            logger.error(f"Insert failed: {query[:100]}... Error: {e}")
+            raise
+        self._observe('insert', query, params, started, rows=1)
+        self._mark_write()
+        self._invalidate_cache_for(query)
+        return new_id
     
     def execute_many(self, query, params_list):
         """
-        Execute batch INSERT/UPDATE
+        Execute batch INSERT/UPDATE (1 transaction, chia chunks theo byte budget)
         
         Args:
             query: SQL query string
@@ -153,15 +1213,310 @@ class DatabaseConnection:
         Returns:
             Number of affected rows
         """
+        return self.execute_batched(query, params_list)
+    
+    def execute_batched(self, query, params_list, max_bytes=None, commit_every=0, progress=None):
+        """
+        Ghi params_list theo chunks (xem batch_writer.py)
+        
+        - INSERT ... VALUES -> multi-row VALUES, mỗi statement <= max_bytes
+        - Statement khác -> executemany theo từng chunk
+        
+        Args:
+            max_bytes: Byte budget mỗi statement (mặc định DB_BATCH_BYTES, luôn < max_allowed_packet)
+            commit_every: Commit sau mỗi N chunks (0 = commit 1 lần ở cuối, all-or-nothing).
+                Trong db.transaction() chỉ commit khi scope kết thúc.
+            progress: callback(rows_done, total_rows, affected); total_rows = None nếu
+                params_list là iterator
+        
+        Returns:
+            Tổng affected rows (cộng rowcount của từng chunk)
+        
+        Raises:
+            Error: Chunk lỗi -> rollback các chunks chưa commit rồi raise
+        """
+        # SQLite chạy in-process (không có packet/round trip) -> executemany theo chunk nhanh hơn
+        template = parse_insert(query) if DB_BACKEND == 'mysql' else None
+        max_bytes = min(max_bytes or DEFAULT_MAX_BYTES, self._batch_byte_limit())
+        max_params = MAX_PARAMS.get(DB_BACKEND, 65535)
+        max_rows = max(1, max_params // template.placeholders) if template else 10000
+        total = len(params_list) if hasattr(params_list, '__len__') else None
+        
+        written = committed_rows = 0
+        
+        def attempt():
+            nonlocal written, committed_rows
+            affected = rows_done = chunks = 0
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    # Không rewrite được -> mỗi row là 1 statement, chỉ cần chia theo số rows
+                    budget = max_bytes - template.base_bytes if template else None
+                    for chunk in iter_chunks(params_list, budget, max_rows):
+                        # Mỗi chunk = 1 lần ghi trong statement_stats / slow log, ghi theo query gốc
+                        # (SQL multi-row có thể vài MB, cùng fingerprint với query gốc)
+                        started = time.perf_counter()
+                        try:
+                            if template:
+                                cursor.execute(template.sql(len(chunk)), flatten(chunk))
+                            else:
+                                cursor.executemany(query, chunk)
+                        except Error as e:
+                            self._observe('many', query, chunk, started, error=e)
+                            raise
+                        self._observe('many', query, chunk, started, rows=max(cursor.rowcount, 0))
+                        affected += max(cursor.rowcount, 0)
+                        rows_done += len(chunk)
+                        written = max(written, rows_done)
+                        chunks += 1
+                        if commit_every and chunks % commit_every == 0:
+                            self._commit(conn)
+                            committed_rows = rows_done
+                        if progress:
+                            progress(rows_done, total, affected)
+                    self._commit(conn)
+                    committed_rows = rows_done
+                    return affected
+                except Error:
+                    self._rollback(conn)
+                    raise
+                finally:
+                    cursor.close()
+        
         try:
-            with self.get_cursor(dictionary=False) as cursor:
-                cursor.executemany(query, params_list)
-                return cursor.rowcount
+            # Chỉ retry khi all-or-nothing và params_list đọc lại được (list/tuple)
+            if commit_every or total is None:
+                return attempt()
+            return self._retrying(attempt)
         except Error as e:
-            logger.error(f"Batch update failed: {e}")
+            logger.error(f"Batch update failed after {committed_rows} committed rows: {e}")
             raise
+        finally:
+            if written:
+                self._mark_write()
+                self._invalidate_cache_for(query)
+    
+    def _batch_byte_limit(self):
+        """Byte budget trần: max_allowed_packet trừ chỗ cho header (MySQL)"""
+        if DB_BACKEND != 'mysql':
+            return DEFAULT_MAX_BYTES
+        if self._max_packet is None:
+            row = self.execute_query("SELECT @@max_allowed_packet AS packet", fetch_one=True, use_primary=True)
+            self._max_packet = int(row['packet']) if row else 4 * 1024 * 1024
+        return self._max_packet - 16 * 1024
+    
+    # ------------------------------------------------------------
+    # Pool stats
+    # ------------------------------------------------------------
+    
+    def pool_stats(self):
+        """
+        Thống kê pool: wait histogram, in_use/idle, peak, failures, per-connection
+        
+        Returns:
+            dict (xem PoolStats.snapshot)
+        """
+        if self._pool is None:
+            return {'initialized': False}
+        stats = self._pool_stats.snapshot()
+        stats['pool'] = self._pool.status()
+        if self._replica_pool is not None:
+            stats['replica'] = self._replica_stats.snapshot()
+            stats['replica']['pool'] = self._replica_pool.status()
+        return stats
+    
+    def start_pool_stats_logging(self, interval=60.0):
+        """
+        Log 1 dòng pool stats mỗi `interval` giây (daemon thread)
+        
+        Gọi lại sẽ thay interval; stop_pool_stats_logging() để dừng
+        """
+        self.stop_pool_stats_logging()
+        stop_event = threading.Event()
+        
+        def _run():
+            while not stop_event.wait(interval):
+                if self._pool_stats is not None:
+                    logger.info(self._pool_stats.summary_line())
+        
+        thread = threading.Thread(target=_run, name="pool-stats-logger", daemon=True)
+        thread.start()
+        self._stats_logger = stop_event
+    
+    def stop_pool_stats_logging(self):
+        if self._stats_logger is not None:
+            self._stats_logger.set()
+            self._stats_logger = None
+    
+    # ------------------------------------------------------------
+    # Retry policy (deadlock / lock wait timeout)
+    # ------------------------------------------------------------
+    
+    def set_retry_policy(self, policy):
+        """Thay retry policy (RetryPolicy) hoặc None để tắt retry"""
+        self._retry_policy = policy
+    
+    def retry_stats(self):
+        """Counters của retry policy: calls, retries theo loại lỗi, recovered, exhausted"""
+        if self._retry_policy is None:
+            return {'enabled': False}
+        return self._retry_policy.snapshot()
+    
+    # ------------------------------------------------------------
+    # Statement stats (fingerprint -> calls, rows, errors, p50/p95/p99)
+    # ------------------------------------------------------------
+    
+    def statement_stats(self, top=None):
+        """
+        Metrics theo statement fingerprint (xem statement_stats.py)
+        
+        Returns:
+            list of dict xếp theo total_ms giảm dần
+        """
+        return self._statement_stats.snapshot(top=top)
+    
+    def reset_statement_stats(self):
+        self._statement_stats.reset()
+    
+    def dump_statement_stats(self, path, label=None):
+        """Ghi statement stats ra JSON (so sánh: python statement_stats.py compare a.json b.json)"""
+        return self._statement_stats.dump(path, label=label)
+    
+    # ------------------------------------------------------------
+    # Slow query log
+    # ------------------------------------------------------------
+    
+    def enable_slow_query_log(self, threshold_ms=None, path=None, explain=True):
+        """
+        Ghi statements chạy lâu hơn threshold_ms ra JSONL xoay vòng (xem slow_query_log.py)
+        
+        Args:
+            threshold_ms: Ngưỡng (mặc định DB_SLOW_QUERY_MS, hoặc 500 nếu env chưa set)
+            path: File log (mặc định DB_SLOW_QUERY_LOG)
+            explain: Capture plan của SELECT chậm trên side connection
+        """
+        self.disable_slow_query_log()
+        self._slow_log = SlowQueryLog(
+            explain=self._explain if explain else None,
+            threshold_ms=threshold_ms if threshold_ms is not None else (SLOW_QUERY_CONFIG['threshold_ms'] or 500.0),
+            path=path or SLOW_QUERY_CONFIG['path'],
+            max_bytes=SLOW_QUERY_CONFIG['max_bytes'],
+            backup_count=SLOW_QUERY_CONFIG['backup_count'],
+        )
+        logger.info(f"Slow query log enabled (>= {self._slow_log.threshold_ms} ms -> {self._slow_log.path})")
+    
+    def disable_slow_query_log(self):
+        """Ghi nốt records đang chờ rồi tắt slow query log"""
+        slow_log, self._slow_log = self._slow_log, None
+        if slow_log is not None:
+            slow_log.close()
+        if self._explain_conn is not None:
+            try:
+                self._explain_conn.close()
+            except Error:
+                pass
+            self._explain_conn = None
+    
+    def slow_query_log_stats(self):
+        """recorded/dropped/pending của slow query log (None nếu chưa bật)"""
+        return self._slow_log.stats() if self._slow_log is not None else None
+    
+    def _observe(self, kind, query, params, started, rows=None, error=None):
+        """Ghi nhận 1 statement đã chạy xong (thành công hoặc lỗi)"""
+        duration_ms = (time.perf_counter() - started) * 1000
+        self._statement_stats.record(query, duration_ms, rows=rows, error=error)
+        if self._slow_log is not None:
+            self._slow_log.observe(kind, query, params, duration_ms, rows=rows, error=error)
+    
+    def _explain(self, query, params):
+        """
+        Plan của SELECT chậm (gọi trên thread của slow log)
+        
+        MySQL: EXPLAIN FORMAT=JSON trên 1 side connection riêng (không chiếm pool);
+        SQLite: EXPLAIN QUERY PLAN trên 1 pooled connection (in-memory DB chỉ có trong pool)
+        """
+        if not query.lstrip()[:6].lower().startswith(('select', 'with')):
+            return None
+        if DB_BACKEND == 'sqlite':
+            with self.get_cursor(dictionary=False) as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {query}", params or ())
+                return [row[-1] for row in cursor.fetchall()]
+        
+        if self._explain_conn is None or not self._explain_conn.is_connected():
+            self._explain_conn = mysql.connector.connect(**DB_CONFIG, connection_timeout=5)
+        cursor = self._explain_conn.cursor()
+        try:
+            cursor.execute(f"EXPLAIN FORMAT=JSON {query}", params or ())
+            row = cursor.fetchone()
+            cursor.fetchall()
+        finally:
+            cursor.close()
+        return json.loads(row[0]) if row else None
+    
+    # ------------------------------------------------------------
+    # Prepared statement cache
+    # ------------------------------------------------------------
+    
+    def enable_statement_cache(self, max_statements=64):
+        """
+        Bật prepared statement cache (LRU per connection, theo SQL text)
+        
+        Chỉ áp dụng cho execute_query/execute_update/execute_insert có params.
+        Pool reset session khi connection được trả về (DB_POOL_RESET_SESSION=1) -> cache chỉ
+        sống trong 1 checkout (vd db.thread_affinity()); DB_POOL_RESET_SESSION=0 để giữ lâu hơn.
+        """
+        self._stmt_cache_size = max_statements
+        if self._stmt_stats is None:
+            self._stmt_stats = StatementCacheStats()
+        logger.info(f"Prepared statement cache enabled (max_statements={max_statements})")
+    
+    def disable_statement_cache(self):
+        """Tắt cache (cursor đã prepare sẽ được giải phóng khi connection đóng)"""
+        self._stmt_cache_size = 0
+    
+    def statement_cache_stats(self):
+        """Hit/miss/eviction của prepared statement cache (None nếu chưa bật)"""
+        return self._stmt_stats.snapshot() if self._stmt_stats is not None else None
+    
+    # ------------------------------------------------------------
+    # Result cache
+    # ------------------------------------------------------------
+    
+    def enable_cache(self, max_entries=256, ttl=60.0):
+        """
+        Bật result cache cho các execute_query(..., cache=True)
+        
+        Args:
+            max_entries: Số entries tối đa (LRU eviction)
+            ttl: Thời gian sống của mỗi entry (giây)
+        """
+        self._cache = QueryCache(max_entries=max_entries, ttl=ttl)
+        logger.info(f"Query cache enabled (max_entries={max_entries}, ttl={ttl}s)")
+    
+    def disable_cache(self):
+        """Tắt và xóa result cache"""
+        self._cache = None
+    
+    def cache_stats(self):
+        """Hit/miss/eviction counters của result cache (None nếu chưa bật)"""
+        return self._cache.stats() if self._cache is not None else None
+    
+    def invalidate_cache(self, *tables):
+        """
+        Evict cache theo bảng (dùng khi ghi trực tiếp qua get_cursor)
+        Không truyền bảng nào -> clear toàn bộ
+        """
+        if self._cache is not None:
+            self._cache.invalidate_tables(set(t.lower() for t in tables) if tables else None)
+    
+    def _invalidate_cache_for(self, query):
+        if self._cache is not None:
+            tables = tables_written_by(query)
+            self._cache.invalidate_tables(tables)
+            if self.in_transaction():
+                self._local.tx_tables |= tables if tables is not None else {None}
 
-# Global instance
+# Global instance (pool chưa được tạo cho tới query đầu tiên)
 db = DatabaseConnection()
 
 
@@ -182,17 +1537,22 @@ def test_connection():
 
 def get_table_info(table_name):
     """Get column information for a table"""
+    if DB_BACKEND == 'sqlite':
+        return db.execute_query(f"PRAGMA table_info({table_name})")
     query = f"DESCRIBE {table_name}"
     return db.execute_query(query)
 
 def check_table_exists(table_name):
     """Check if table exists in database"""
-    query = """
-        SELECT COUNT(*) as count 
-        FROM information_schema.tables 
-        WHERE table_schema = 'student_management' 
-        AND table_name = %s
-    """
+    if DB_BACKEND == 'sqlite':
+        query = "SELECT COUNT(*) as count FROM sqlite_master WHERE type = 'table' AND name = %s"
+    else:
+        query = """
+            SELECT COUNT(*) as count 
+            FROM information_schema.tables 
+            WHERE table_schema = 'student_management' 
+            AND table_name = %s
+        """
     result = db.execute_query(query, (table_name,), fetch_one=True)
     return result and result.get('count', 0) > 0
 
@@ -0,0 +1,234 @@
+# db_harness.py - Benchmark / soak test cho data layer (KHÔNG chạy trên database thật)
+"""
+GIẢI THÍCH:
+- benchmark_point_lookups(): point lookups có / không có prepared statement cache
+- soak_test(): nhiều threads cùng khởi tạo singleton + lazy pool, rồi soak
+  thread_affinity vs checkout mỗi query (DROP/CREATE bảng soak_counters)
+- Tách khỏi db_connection.py: harness không nằm trong module production, và chỉ chạy khi
+  + DB_BACKEND=sqlite, hoặc
+  + --scratch-schema NAME: MySQL, chạy trên schema NAME (không được là schema của app)
+
+Chạy:
+    DB_BACKEND=sqlite python db_harness.py soak
+    python db_harness.py bench-prepared --scratch-schema student_scratch
+"""
+
+import logging
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+import db_connection
+from db_connection import DatabaseConnection, db
+from retry_policy import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+# Schema của app (schema.sql) - không bao giờ dùng làm scratch schema
+APP_SCHEMA = 'student_management'
+
+
+def use_scratch_database(scratch_schema=None):
+    """
+    Chỉ cho phép harness chạy trên SQLite hoặc 1 MySQL schema được chọn rõ ràng
+
+    Phải gọi trước query đầu tiên (pool tạo lazy từ DB_CONFIG)
+
+    Raises:
+        RuntimeError: MySQL mà không chọn scratch schema / scratch schema là schema của app
+    """
+    if db_connection.DB_BACKEND == 'sqlite':
+        return
+    if not scratch_schema:
+        raise RuntimeError("Refusing to run against MySQL without --scratch-schema (or use DB_BACKEND=sqlite)")
+    if scratch_schema in (APP_SCHEMA, db_connection.DB_CONFIG['database']):
+        raise RuntimeError(f"'{scratch_schema}' is the application schema, pick a scratch schema")
+    if db._pool is not None:
+        raise RuntimeError("Pool already initialized, select the scratch schema before the first query")
+    db_connection.DB_CONFIG['database'] = scratch_schema
+    logger.warning(f"Harness running on scratch schema '{scratch_schema}'")
+
+
+def benchmark_point_lookups(iterations=5000):
+    """
+    So sánh point lookups (kiểu StudentModel.get_by_id / EnrollmentModel.exists /
+    Validators.check_unique) với và không có prepared statement cache
+
+    Returns:
+        dict: thời gian mỗi chế độ, speedup và hit rate
+    """
+    ids = [row['StudentID'] for row in db.execute_query("SELECT StudentID FROM students") or []]
+    if not ids:
+        raise RuntimeError("students table is empty")
+    statements = [
+        ("SELECT * FROM students WHERE StudentID = %s", lambda: (random.choice(ids),)),
+        ("SELECT 1 FROM enrollments WHERE StudentID=%s AND ClassID=%s", lambda: (random.choice(ids), 1)),
+        ("SELECT 1 FROM students WHERE Email = %s", lambda: (f"user{random.randint(1, 10**6)}@example.com",)),
+    ]
+
+    def run():
+        started = time.perf_counter()
+        for _ in range(iterations):
+            sql, make_params = random.choice(statements)
+            db.execute_query(sql, make_params(), fetch_one=True)
+        return time.perf_counter() - started
+
+    was_enabled = db._stmt_cache_size
+    db.disable_statement_cache()
+    text_time = run()
+    db.enable_statement_cache(max_statements=was_enabled or 64)
+    prepared_time = run()
+    if not was_enabled:
+        db.disable_statement_cache()
+
+    return {
+        'iterations': iterations,
+        'text_protocol_s': round(text_time, 3),
+        'prepared_s': round(prepared_time, 3),
+        'speedup': round(text_time / prepared_time, 2) if prepared_time else None,
+        'statement_cache': db.statement_cache_stats(),
+    }
+
+
+def soak_test(threads=16, seconds=10.0, queries_per_scope=5):
+    """
+    Multi-threaded soak test cho singleton / lazy pool / thread affinity
+
+    Kiểm tra:
+    1. `threads` threads cùng gọi DatabaseConnection() lần đầu -> đúng 1 instance
+    2. Các threads cùng chạy query đầu tiên trên instance mới -> pool được tạo đúng 1 lần
+    3. Trong `seconds` giây: nửa số threads dùng thread_affinity (mỗi scope 1 UPDATE
+       counter của row riêng + `queries_per_scope - 1` SELECT), nửa còn lại checkout mỗi
+       query -> không lỗi, counter đúng, affinity chỉ checkout 1 lần/scope,
+       hết test không còn connection nào bị giữ
+
+    Returns:
+        dict: số scope/query, checkouts của mỗi nhóm, pool stats cuối
+    """
+    # 1 + 2: chạy trên instance mới, trả lại instance global sau khi xong
+    original = DatabaseConnection._instance
+    DatabaseConnection._instance = None
+    instances, pools_created = [], []
+    barrier = threading.Barrier(threads)
+
+    initialize = DatabaseConnection._initialize_pool
+
+    def counting_initialize(instance):
+        pools_created.append(threading.get_ident())
+        time.sleep(0.05)  # Mở rộng cửa sổ race
+        initialize(instance)
+
+    def first_use():
+        barrier.wait()
+        instance = DatabaseConnection()
+        instances.append(instance)
+        barrier.wait()
+        instance.execute_query("SELECT 1 AS ok", fetch_one=True)
+
+    DatabaseConnection._initialize_pool = counting_initialize
+    try:
+        workers = [threading.Thread(target=first_use) for _ in range(threads)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+    finally:
+        DatabaseConnection._initialize_pool = initialize
+        racing = DatabaseConnection._instance
+        DatabaseConnection._instance = original
+    if racing is not None and racing._pool is not None:
+        racing._pool.close()
+    assert len({id(i) for i in instances}) == 1, "DatabaseConnection() returned several instances"
+    assert len(pools_created) == 1, f"Pool initialized {len(pools_created)} times"
+
+    # 3: soak trên db global
+    db.execute_update("DROP TABLE IF EXISTS soak_counters")
+    db.execute_update("CREATE TABLE soak_counters (id INT PRIMARY KEY, value INT NOT NULL)")
+    db.execute_many("INSERT INTO soak_counters (id, value) VALUES (%s, 0)", [(i,) for i in range(threads)])
+
+    stop_at = time.monotonic() + seconds
+    lock = threading.Lock()
+    totals = {'affinity': {'scopes': 0, 'queries': 0}, 'plain': {'scopes': 0, 'queries': 0}}
+    expected = [0] * threads
+    failures = []
+    # SQLite shared cache: 1 writer tại 1 thời điểm, lock conflict trả về ngay
+    # -> cho phép retry nhiều hơn (test connection layer, không phải lock contention)
+    policy = db._retry_policy
+    db.set_retry_policy(RetryPolicy(max_attempts=50, base_delay=0.005, max_delay=0.1))
+    before = db.pool_stats()['checkouts']
+
+    def soak(worker_id):
+        group = 'affinity' if worker_id % 2 == 0 else 'plain'
+        scopes = queries = increments = 0
+        try:
+            while time.monotonic() < stop_at:
+                scope = db.thread_affinity() if group == 'affinity' else nullcontext()
+                with scope:
+                    # Giống background loader: 1 write rồi nhiều reads
+                    db.execute_update("UPDATE soak_counters SET value = value + 1 WHERE id = %s", (worker_id,))
+                    increments += 1
+                    for _ in range(queries_per_scope - 1):
+                        row = db.execute_query("SELECT value FROM soak_counters WHERE id = %s",
+                                               (worker_id,), fetch_one=True, use_primary=True)
+                        if row is None or row['value'] != increments:
+                            raise AssertionError(f"worker {worker_id}: expected {increments}, got {row}")
+                scopes += 1
+                queries += queries_per_scope
+        except Exception as e:
+            failures.append(e)
+        with lock:
+            totals[group]['scopes'] += scopes
+            totals[group]['queries'] += queries
+            expected[worker_id] = increments
+
+    workers = [threading.Thread(target=soak, args=(i,)) for i in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    retried = sum(db.retry_stats()['retries'].values())
+    db.set_retry_policy(policy)
+
+    values = [row['value'] for row in db.execute_query(
+        "SELECT value FROM soak_counters ORDER BY id", use_primary=True
+    )]
+    stats = db.pool_stats()
+    db.execute_update("DROP TABLE soak_counters")
+
+    checkouts = stats['checkouts'] - before
+    assert not failures, f"{len(failures)} workers failed: {failures[0]}"
+    assert values == expected, "Lost updates"
+    assert stats['in_use'] == 0, f"{stats['in_use']} connections still checked out"
+    # Retry/query cache có thể thêm vài checkout, nhưng affinity phải ~1 checkout/scope
+    # Affinity: 1 checkout/scope; plain: 1/query; mỗi lần retry (plain) checkout thêm 1
+    assert checkouts <= totals['affinity']['scopes'] + totals['plain']['queries'] + retried, checkouts
+
+    return {
+        'threads': threads,
+        'seconds': seconds,
+        'affinity': totals['affinity'],
+        'plain': totals['plain'],
+        'checkouts': checkouts,
+        'checkouts_without_affinity': totals['affinity']['queries'] + totals['plain']['queries'],
+        'pool': stats['pool'],
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Data layer benchmark / soak test (SQLite or scratch schema only)")
+    parser.add_argument("command", choices=("soak", "bench-prepared"))
+    parser.add_argument("--scratch-schema", help="MySQL schema to run on (must not be the application schema)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        use_scratch_database(args.scratch_schema)
+    except RuntimeError as e:
+        parser.error(str(e))
+    if args.command == "soak":
+        print(f"Soak test: {soak_test()}")
+    else:
+        print(f"Point lookup benchmark: {benchmark_point_lookups()}")
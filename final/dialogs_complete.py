@@ -1,7 +1,7 @@
 # dialogs_complete.py - Complete CRUD Dialogs cho tất cả entities
 """
 GIẢI THÍCH:
-- Dialogs cho: Subject, Lecturer, Class, Enrollment
+- Dialogs cho: Subject, Lecturer, Class, Enrollment, Bulk Enroll
 - Support cả Add và Edit mode
 - Full validation using validators module
 - Load related data từ database (dropdown options)
@@ -9,7 +9,7 @@ GIẢI THÍCH:
 """
 
 from PyQt6.QtWidgets import *
-from PyQt6.QtCore import Qt, QDate
+from PyQt6.QtCore import Qt, QDate, QStringListModel
 from models import SubjectModel, LecturerModel, ClassModel, EnrollmentModel, StudentModel
 from validators import ValidationError, Validators
 import logging
@@ -501,7 +501,7 @@ class EnrollmentDialog(QDialog):
     Dialog for adding/editing enrollments
     
     Fields:
-    - Student (searchable dropdown, required)
+    - Student (type-ahead theo tên / email / ID qua StudentModel.lookup, required)
     - Class (dropdown, required)
     - Grade (0-10, optional)
     - Grade Letter (A-F, optional)
@@ -542,6 +542,8 @@ class EnrollmentDialog(QDialog):
         self.combo_student.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
         if self.edit_mode:
             self.combo_student.setEnabled(False)
+        else:
+            self.setup_student_lookup()
         form_layout.addRow("Student *:", self.combo_student)
         
         # Class (ComboBox)
@@ -615,14 +617,52 @@ class EnrollmentDialog(QDialog):
         
         self.setLayout(layout)
     
+    @staticmethod
+    def student_label(student):
+        return f"{student['StudentID']} - {student['FirstName']} {student['LastName']}"
+    
+    def setup_student_lookup(self):
+        """Gõ tên (có dấu hoặc không) / email / StudentID -> gợi ý từ index trong RAM"""
+        self.student_matches = {}
+        self.combo_student.lineEdit().setPlaceholderText("Type name, email or student ID...")
+        self.student_completer = QCompleter(self)
+        self.student_completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.student_completer.setModel(QStringListModel(self.student_completer))
+        self.student_completer.activated.connect(self.on_student_picked)
+        self.combo_student.setCompleter(self.student_completer)
+        self.combo_student.lineEdit().textEdited.connect(self.on_student_typed)
+        StudentModel.warm_lookup_index()  # Load ở background, chưa xong -> chưa có gợi ý
+    
+    def on_student_typed(self, text):
+        """Mỗi phím gõ: top 20 từ StudentModel.lookup (không round trip tới DB)"""
+        try:
+            students = StudentModel.lookup(text, limit=20, wait=False)
+        except Exception as e:
+            logger.warning(f"Student lookup failed: {e}")
+            return
+        self.student_matches = {self.student_label(s): s['StudentID'] for s in students}
+        self.student_completer.model().setStringList(list(self.student_matches))
+        if students:
+            self.student_completer.complete()
+    
+    def on_student_picked(self, label):
+        """Chọn 1 gợi ý -> thêm vào dropdown nếu chưa có và select"""
+        student_id = self.student_matches.get(label)
+        if student_id is None:
+            return
+        index = self.combo_student.findData(student_id)
+        if index < 0:
+            self.combo_student.addItem(label, student_id)
+            index = self.combo_student.count() - 1
+        self.combo_student.setCurrentIndex(index)
+    
     def load_dropdowns(self):
         """Load students and classes"""
         try:
             # Load students
             students = StudentModel.list(limit=500)
             for student in students:
-                name = f"{student['StudentID']} - {student['FirstName']} {student['LastName']}"
-                self.combo_student.addItem(name, student['StudentID'])
+                self.combo_student.addItem(self.student_label(student), student['StudentID'])
             
             # Load classes
             classes = ClassModel.list()
@@ -693,6 +733,197 @@ class EnrollmentDialog(QDialog):
             QMessageBox.critical(self, "Error", f"Failed to save: {e}")
 
 
+# ============================================================
+# BULK ENROLL DIALOG
+# ============================================================
+
+class BulkEnrollDialog(QDialog):
+    """
+    Dialog enroll cả 1 khóa vào 1 class (EnrollmentModel.enroll_many)
+    
+    Fields:
+    - Class (dropdown, required)
+    - Enrollment Year + Major (optional) -> Load roster
+    - Roster (checkable list, mặc định chọn hết)
+    """
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        
+        self.setWindowTitle("Bulk Enroll")
+        self.setModal(True)
+        self.setMinimumWidth(550)
+        self.setMinimumHeight(500)
+        
+        self.setup_ui()
+        self.load_dropdowns()
+    
+    def setup_ui(self):
+        """Setup UI components"""
+        layout = QVBoxLayout()
+        
+        # Title
+        title = QLabel("Bulk Enroll Students")
+        title.setStyleSheet("font-size: 18px; font-weight: bold; margin-bottom: 10px;")
+        layout.addWidget(title)
+        
+        # Form
+        form_layout = QFormLayout()
+        
+        self.combo_class = QComboBox()
+        form_layout.addRow("Class *:", self.combo_class)
+        
+        self.spin_year = QSpinBox()
+        self.spin_year.setRange(2000, 2035)
+        self.spin_year.setValue(QDate.currentDate().year())
+        form_layout.addRow("Enrollment Year *:", self.spin_year)
+        
+        self.txt_major = QLineEdit()
+        self.txt_major.setPlaceholderText("Optional, e.g. Computer Science")
+        form_layout.addRow("Major:", self.txt_major)
+        
+        layout.addLayout(form_layout)
+        
+        btn_load = QPushButton("Load Roster")
+        btn_load.clicked.connect(self.load_roster)
+        layout.addWidget(btn_load)
+        
+        # Roster
+        self.list_students = QListWidget()
+        self.list_students.itemChanged.connect(self.update_summary)
+        layout.addWidget(self.list_students)
+        
+        select_layout = QHBoxLayout()
+        btn_all = QPushButton("Select All")
+        btn_all.clicked.connect(lambda: self.set_all_checked(True))
+        btn_none = QPushButton("Select None")
+        btn_none.clicked.connect(lambda: self.set_all_checked(False))
+        select_layout.addWidget(btn_all)
+        select_layout.addWidget(btn_none)
+        select_layout.addStretch()
+        self.lbl_summary = QLabel("No roster loaded")
+        self.lbl_summary.setStyleSheet("color: #666; font-style: italic;")
+        select_layout.addWidget(self.lbl_summary)
+        layout.addLayout(select_layout)
+        
+        # Buttons
+        btn_layout = QHBoxLayout()
+        btn_layout.addStretch()
+        
+        btn_enroll = QPushButton("Enroll Selected")
+        btn_enroll.setStyleSheet("""
+            QPushButton {
+                background-color: #9C27B0;
+                color: white;
+                padding: 8px 16px;
+                border-radius: 4px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #7B1FA2;
+            }
+        """)
+        btn_enroll.clicked.connect(self.enroll)
+        
+        btn_cancel = QPushButton("Cancel")
+        btn_cancel.setStyleSheet("""
+            QPushButton {
+                background-color: #f44336;
+                color: white;
+                padding: 8px 16px;
+                border-radius: 4px;
+            }
+            QPushButton:hover {
+                background-color: #da190b;
+            }
+        """)
+        btn_cancel.clicked.connect(self.reject)
+        
+        btn_layout.addWidget(btn_enroll)
+        btn_layout.addWidget(btn_cancel)
+        layout.addLayout(btn_layout)
+        
+        self.setLayout(layout)
+    
+    def load_dropdowns(self):
+        """Load classes"""
+        try:
+            for cls in ClassModel.list():
+                label = f"{cls['ClassID']} - {cls.get('SubjectName', '')} ({cls['Semester']} {cls['Year']})"
+                self.combo_class.addItem(label, cls['ClassID'])
+        except Exception as e:
+            QMessageBox.warning(self, "Warning", f"Failed to load classes: {e}")
+    
+    def load_roster(self):
+        """Load students của khóa đã chọn, mặc định chọn hết"""
+        try:
+            students = StudentModel.list_cohort(self.spin_year.value(), self.txt_major.text().strip() or None)
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load roster: {e}")
+            return
+        
+        self.list_students.blockSignals(True)
+        self.list_students.clear()
+        for student in students:
+            item = QListWidgetItem(
+                f"{student['StudentID']} - {student['FirstName']} {student['LastName']}"
+                + (f" ({student['Major']})" if student.get('Major') else "")
+            )
+            item.setData(Qt.ItemDataRole.UserRole, student['StudentID'])
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked)
+            self.list_students.addItem(item)
+        self.list_students.blockSignals(False)
+        self.update_summary()
+    
+    def set_all_checked(self, checked):
+        state = Qt.CheckState.Checked if checked else Qt.CheckState.Unchecked
+        self.list_students.blockSignals(True)
+        for row in range(self.list_students.count()):
+            self.list_students.item(row).setCheckState(state)
+        self.list_students.blockSignals(False)
+        self.update_summary()
+    
+    def selected_student_ids(self):
+        return [
+            item.data(Qt.ItemDataRole.UserRole)
+            for item in (self.list_students.item(row) for row in range(self.list_students.count()))
+            if item.checkState() == Qt.CheckState.Checked
+        ]
+    
+    def update_summary(self, *_):
+        self.lbl_summary.setText(
+            f"{len(self.selected_student_ids())} of {self.list_students.count()} students selected"
+        )
+    
+    def enroll(self):
+        """Enroll các students đã chọn (1 set-based check + 1 multi-row INSERT)"""
+        class_id = self.combo_class.currentData()
+        student_ids = self.selected_student_ids()
+        if class_id is None or not student_ids:
+            QMessageBox.warning(self, "Warning", "Please select a class and at least one student!")
+            return
+        
+        try:
+            result = EnrollmentModel.enroll_many(class_id, student_ids)
+        except ValidationError as e:
+            QMessageBox.warning(self, "Validation Error", str(e))
+            return
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Bulk enroll failed: {e}")
+            return
+        
+        message = f"Enrolled {len(result['added'])} students."
+        if result['skipped']:
+            details = "\n".join(f"{student_id}: {reason}" for student_id, reason in list(result['skipped'].items())[:20])
+            more = len(result['skipped']) - 20
+            message += f"\n\nSkipped {len(result['skipped'])}:\n{details}"
+            if more > 0:
+                message += f"\n... and {more} more"
+        QMessageBox.information(self, "Bulk Enroll", message)
+        self.accept()
+
+
 # ============================================================
 # TESTING
 # ============================================================
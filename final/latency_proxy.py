@@ -0,0 +1,152 @@
+# latency_proxy.py - TCP proxy thêm độ trễ, đo round trips của dashboard refresh
+"""
+GIẢI THÍCH:
+- Trên localhost round trip ~0.1 ms nên tuần tự hay batch gần như bằng nhau;
+  qua VPN / cloud DB mỗi round trip có thể 20-50 ms
+- LatencyProxy: listen trên localhost, forward tới MySQL, mỗi chunk dữ liệu
+  client -> server bị giữ lại `latency_ms` (mô phỏng RTT), đếm số lần client gửi
+- benchmark_dashboard_refresh(): pool mới đi qua proxy, so sánh
+  + sequential: get_dashboard_kpis + get_grade_distribution + query_top_students
+    (3 checkouts, 3 query round trips, 3 commits)
+  + batched: get_dashboard_data (db.execute_batch, 1 round trip + 1 commit)
+  Result cache tắt trong lúc đo
+
+Chạy (cần MySQL, xem DB_CONFIG):
+    python latency_proxy.py --latency-ms 20 --iterations 20
+"""
+
+import logging
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyProxy:
+    """
+    Proxy TCP 1 chiều trễ: client -> server chờ latency_ms mỗi chunk
+
+    Args:
+        target: (host, port) của MySQL
+        latency_ms: Độ trễ thêm vào mỗi lần client gửi (≈ 1 RTT mỗi request)
+    """
+
+    def __init__(self, target, latency_ms=20.0, listen_host='127.0.0.1'):
+        self.target = target
+        self.latency = latency_ms / 1000
+        self._server = socket.create_server((listen_host, 0))
+        self.address = self._server.getsockname()
+        self.client_sends = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        threading.Thread(target=self._accept_loop, name="latency-proxy", daemon=True).start()
+
+    def _accept_loop(self):
+        while not self._closed:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self.target)
+            for sock in (client, upstream):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._pipe, args=(client, upstream, True), daemon=True).start()
+            threading.Thread(target=self._pipe, args=(upstream, client, False), daemon=True).start()
+
+    def _pipe(self, source, destination, delayed):
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                if delayed:
+                    with self._lock:
+                        self.client_sends += 1
+                    time.sleep(self.latency)
+                destination.sendall(data)
+        except OSError:
+            pass
+        finally:
+            for sock in (source, destination):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
+
+    def reset_counter(self):
+        with self._lock:
+            self.client_sends = 0
+
+    def close(self):
+        self._closed = True
+        self._server.close()
+
+
+def benchmark_dashboard_refresh(latency_ms=20.0, iterations=20):
+    """
+    Dashboard refresh tuần tự vs db.execute_batch qua LatencyProxy
+
+    Returns:
+        dict: ms / refresh và số lần client gửi qua proxy / refresh của mỗi cách
+    """
+    import db_connection
+    from db_connection import DB_CONFIG, db
+    from query_models import QueryModels
+
+    if db_connection.DB_BACKEND != 'mysql':
+        raise RuntimeError("benchmark_dashboard_refresh needs the MySQL backend (round trips)")
+
+    proxy = LatencyProxy((DB_CONFIG['host'], DB_CONFIG['port']), latency_ms=latency_ms)
+    original = dict(DB_CONFIG)
+    cache_was_enabled = db._cache is not None
+    DB_CONFIG.update(host=proxy.address[0], port=proxy.address[1])
+    try:
+        db.use_backend('mysql')  # Pool mới, connections đi qua proxy
+        db.disable_cache()
+
+        def sequential():
+            QueryModels.get_dashboard_kpis()
+            QueryModels.get_grade_distribution()
+            QueryModels.query_top_students(limit=10)
+
+        def batched():
+            QueryModels.get_dashboard_data(top_limit=10, cache=False)
+
+        results = {'latency_ms': latency_ms, 'iterations': iterations}
+        for name, refresh in (('sequential', sequential), ('batched', batched)):
+            refresh()  # Warm up: mở connection, handshake không tính
+            proxy.reset_counter()
+            started = time.perf_counter()
+            for _ in range(iterations):
+                refresh()
+            elapsed = time.perf_counter() - started
+            results[name] = {
+                'ms_per_refresh': round(elapsed / iterations * 1000, 1),
+                'client_sends_per_refresh': round(proxy.client_sends / iterations, 1),
+            }
+        results['speedup'] = round(
+            results['sequential']['ms_per_refresh'] / results['batched']['ms_per_refresh'], 2
+        )
+        return results
+    finally:
+        DB_CONFIG.clear()
+        DB_CONFIG.update(original)
+        db.use_backend('mysql')
+        if cache_was_enabled:
+            db.enable_cache()
+        proxy.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Dashboard refresh: sequential vs batched over a slow link")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    for key, value in benchmark_dashboard_refresh(args.latency_ms, args.iterations).items():
+        print(f"{key:>12}: {value}")
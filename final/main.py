@@ -5,12 +5,21 @@ HƯỚNG DẪN CHẠY:
 2. Đảm bảo database đã được tạo (chạy schema.sql và seed.sql)
 3. Cập nhật password MySQL trong db_connection.py
 4. Chạy: python main.py
+
+Đo thời gian khởi động (imports, tạo window, first paint, connection đầu tiên):
+    python main.py --profile-startup
 """
 
+import time
+STARTUP_T0 = time.perf_counter()  # Trước mọi import nặng (PyQt6, mysql)
+
+import atexit
+import os
+import subprocess
 import sys
 from PyQt6.QtWidgets import QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout
 from PyQt6.QtWidgets import QPushButton, QStackedWidget, QLabel, QScrollArea
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QFont
 
 # Import pages
@@ -173,8 +182,90 @@ class MainWindow(QMainWindow):
             logger.info(f"Showing page: {page_name}")
 
 
+# ============================================================
+# STARTUP PROFILING
+# ============================================================
+
+class StartupProfiler:
+    """Ghi lại thời điểm các phase khởi động (ms tính từ STARTUP_T0)"""
+    
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.phases = []
+        self._last = STARTUP_T0
+    
+    def mark(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((name, (now - self._last) * 1000, (now - STARTUP_T0) * 1000))
+        self._last = now
+    
+    def report(self, top=15):
+        print("\n=== Startup profile ===")
+        print(f"{'phase':<32}{'delta ms':>10}{'total ms':>10}")
+        for name, delta, total in self.phases:
+            print(f"{name:<32}{delta:>10.1f}{total:>10.1f}")
+        
+        print(f"\n=== Slowest imports (python -X importtime, top {top}) ===")
+        print(f"{'module':<40}{'self ms':>10}{'cumul ms':>10}")
+        for module, self_us, cumulative_us in profile_imports(top=top):
+            print(f"{module:<40}{self_us / 1000:>10.1f}{cumulative_us / 1000:>10.1f}")
+
+
+def profile_imports(modules=("main_win",), top=15):
+    """
+    Chạy `python -X importtime` trong subprocess (cache import của process
+    hiện tại không ảnh hưởng) và trả về các module import chậm nhất
+    
+    Returns:
+        list of (module, self_us, cumulative_us), sort theo cumulative giảm dần
+    """
+    code = "; ".join(f"import {m}" for m in modules)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, module = line[len("import time:"):].split("|")
+            rows.append((module.strip(), int(self_us), int(cumulative_us)))
+        except ValueError:
+            continue
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return rows[:top]
+
+
+def check_database(parent=None):
+    """Test connection (lần đầu tạo pool); lỗi -> báo user và thoát"""
+    from db_connection import test_connection
+    try:
+        ok = test_connection()
+    except Exception as e:
+        logger.error(f"Database connection error: {e}")
+        ok = False
+    if not ok:
+        from PyQt6.QtWidgets import QMessageBox
+        msg = QMessageBox(parent)
+        msg.setIcon(QMessageBox.Icon.Critical)
+        msg.setWindowTitle("Database Error")
+        msg.setText("Cannot connect to database!")
+        msg.setInformativeText("Please check:\n1. MySQL is running\n2. Database exists\n3. Password is correct in db_connection.py")
+        msg.exec()
+        QApplication.instance().exit(1)
+    return ok
+
+
 def main():
     """Main entry point"""
+    profiler = StartupProfiler("--profile-startup" in sys.argv)
+    profiler.mark("imports (PyQt6 + app modules)")
+    
     app = QApplication(sys.argv)
     
     # Set application style
@@ -183,27 +274,48 @@ def main():
     # Set application font
     font = QFont("Segoe UI", 10)
     app.setFont(font)
+    profiler.mark("QApplication")
     
-    # Test database connection first
-    try:
-        from db_connection import test_connection
-        if not test_connection():
-            from PyQt6.QtWidgets import QMessageBox
-            msg = QMessageBox()
-            msg.setIcon(QMessageBox.Icon.Critical)
-            msg.setWindowTitle("Database Error")
-            msg.setText("Cannot connect to database!")
-            msg.setInformativeText("Please check:\n1. MySQL is running\n2. Database exists\n3. Password is correct in db_connection.py")
-            msg.exec()
-            sys.exit(1)
-    except Exception as e:
-        print(f"Database connection error: {e}")
-        sys.exit(1)
+    # Bật result cache cho các GUI reads lặp lại (subjects, lecturers, classes, KPIs)
+    from db_connection import db
+    db.enable_cache(max_entries=256, ttl=60)
+    db.enable_statement_cache(max_statements=64)
+    
+    # Optional: log pool stats định kỳ (vd: DB_POOL_STATS_INTERVAL=60)
+    stats_interval = os.environ.get("DB_POOL_STATS_INTERVAL")
+    if stats_interval:
+        db.start_pool_stats_logging(float(stats_interval))
+    
+    # Optional: slow query log (vd: DB_SLOW_QUERY_MS=500) -> python slow_query_log.py report
+    if float(os.environ.get("DB_SLOW_QUERY_MS", "0")) > 0:
+        db.enable_slow_query_log()
+    
+    # Optional: ghi statement stats khi thoát (vd: DB_STATEMENT_STATS_FILE=stats-v1.2.json)
+    stats_file = os.environ.get("DB_STATEMENT_STATS_FILE")
+    if stats_file:
+        atexit.register(db.dump_statement_stats, stats_file, os.environ.get("DB_STATEMENT_STATS_LABEL"))
     
     # Create and show main window
+    # Pool được tạo lazily -> window paint trước khi có connection nào,
+    # pages chỉ load data khi được hiển thị
     window = MainWindow()
+    profiler.mark("MainWindow()")
     window.show()
     
+    profiler.mark("window.show()")
+    
+    if profiler.enabled:
+        # Lượt event loop đầu: paint window + Dashboard load (tạo pool + connection đầu tiên)
+        app.processEvents()
+        profiler.mark("first paint + dashboard load")
+        check_database(window)
+        profiler.mark("test_connection")
+        profiler.report()
+        sys.exit(0)
+    
+    # Test database connection sau khi window đã hiển thị
+    QTimer.singleShot(0, lambda: check_database(window))
+    
     logger.info("Application started successfully!")
     
     sys.exit(app.exec())
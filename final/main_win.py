@@ -36,7 +36,7 @@ KEY IMPROVEMENTS so với code gốc:
 """
 
 from PyQt6.QtWidgets import *
-from PyQt6.QtCore import Qt, QDate
+from PyQt6.QtCore import Qt, QDate, QTimer, QThread, pyqtSignal
 from PyQt6.QtGui import QFont
 import sys
 import csv
@@ -45,7 +45,9 @@ from datetime import datetime
 # Import models và dialogs
 from models import StudentModel, SubjectModel, LecturerModel, ClassModel, EnrollmentModel
 from query_models import QueryModels
-from dialogs_complete import SubjectDialog, LecturerDialog, ClassDialog, EnrollmentDialog
+from query_cancel import CancelHandle
+from db_connection import db
+from dialogs_complete import SubjectDialog, LecturerDialog, ClassDialog, EnrollmentDialog, BulkEnrollDialog
 from studentdialog_logic import StudentDialog
 from validators import ValidationError
 
@@ -54,11 +56,105 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# ============================================================
+# LAZY LOADING - Load data khi page được hiển thị lần đầu
+# ============================================================
+
+class QueryWorker(QThread):
+    """
+    Chạy 1 query function ngoài GUI thread, trả kết quả qua signal
+    
+    affinity=True: func chạy nhiều query liên tiếp -> giữ 1 connection cho cả worker
+    (db.thread_affinity) thay vì checkout/trả pool mỗi query
+    """
+    
+    result_ready = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    
+    def __init__(self, func, parent=None, affinity=False):
+        super().__init__(parent)
+        self.func = func
+        self.affinity = affinity
+    
+    def run(self):
+        try:
+            if self.affinity:
+                with db.thread_affinity():
+                    result = self.func()
+            else:
+                result = self.func()
+            self.result_ready.emit(result)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+class LazyLoadMixin:
+    """
+    Gọi load_data() ở lần đầu page được show thay vì trong __init__
+    
+    - Main window paint xong trước khi có query/connection nào
+    - Page ẩn trong QStackedWidget không query cho tới khi user mở
+    - QTimer.singleShot(0) -> page vẽ xong rồi mới load
+    - run_query_async(): query nặng chạy trong QueryWorker, bị cancel khi user
+      chuyển page (hideEvent) hoặc khi load lại với filter mới
+    """
+    
+    _data_loaded = False
+    _cancel_handle = None
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self._data_loaded:
+            self._data_loaded = True
+            QTimer.singleShot(0, self.load_data)
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        if self._cancel_handle is not None:
+            # Worker còn chạy (có thể chưa attach query -> cancel() trả False) -> result sẽ bị
+            # bỏ, nên luôn load lại khi mở page
+            self._cancel_handle.cancel()
+            self._cancel_handle = None
+            self._data_loaded = False
+    
+    def run_query_async(self, func, on_result, affinity=False):
+        """
+        Chạy func(cancel=handle) trong QueryWorker, gọi on_result(result, handle) trên GUI thread
+        
+        Query trước đó của page (nếu còn chạy) bị cancel; result của query đã cancel bị bỏ.
+        affinity=True: func chạy nhiều query -> dùng chung 1 connection (xem QueryWorker)
+        """
+        if self._cancel_handle is not None:
+            self._cancel_handle.cancel()
+        handle = self._cancel_handle = CancelHandle()
+        
+        worker = QueryWorker(lambda: func(cancel=handle), self, affinity=affinity)
+        worker.result_ready.connect(lambda result: None if handle.cancelled else on_result(result, handle))
+        worker.failed.connect(lambda message: QMessageBox.critical(self, "Error", f"Query failed: {message}"))
+        worker.finished.connect(lambda: self._query_finished(handle))
+        worker.finished.connect(worker.deleteLater)
+        worker.start()
+    
+    def _query_finished(self, handle):
+        """Worker xong -> handle không còn pending (hideEvent không cần load lại)"""
+        if self._cancel_handle is handle:
+            self._cancel_handle = None
+    
+    @staticmethod
+    def describe_outcome(handle):
+        """Status text cho query không trả kết quả"""
+        if handle.outcome == 'timeout':
+            return "Query timed out - try narrower filters"
+        if handle.outcome == 'cancelled':
+            return "Query cancelled"
+        return "Query failed - see log for details"
+
+
 # ============================================================
 # BASE TABLE PAGE - Reusable component
 # ============================================================
 
-class BaseTablePage(QWidget):
+class BaseTablePage(LazyLoadMixin, QWidget):
     """
     Base class cho tất cả table pages
     
@@ -78,7 +174,7 @@ class BaseTablePage(QWidget):
         layout = QVBoxLayout()
         
         # Top bar: Search + Actions
-        top_bar = QHBoxLayout()
+        top_bar = self.top_bar = QHBoxLayout()
         
         # Search
         self.txt_search = QLineEdit()
@@ -244,12 +340,29 @@ class BaseTablePage(QWidget):
 # ============================================================
 
 class StudentsPage(BaseTablePage):
-    """Students management page"""
+    """
+    Students management page
+    
+    Browse theo trang bằng keyset pagination (StudentModel.page): Previous/Next
+    dùng cursor của trang hiện tại -> chi phí mỗi trang như nhau dù có 200k students
+    """
+    
+    PAGE_SIZE = 100
+    SORT_OPTIONS = [
+        ("ID", "StudentID"),
+        ("Last Name", "LastName"),
+        ("First Name", "FirstName"),
+        ("DOB", "DOB"),
+        ("Enrollment Year", "EnrollmentYear"),
+    ]
     
     def __init__(self):
+        self.page_data = None
+        self.page_number = 1
+        self.total_students = 0
         super().__init__()
         self.setup_table_columns()
-        self.load_data()
+        self.setup_pagination()
     
     def setup_table_columns(self):
         """Setup table columns"""
@@ -258,14 +371,91 @@ class StudentsPage(BaseTablePage):
         self.table.setColumnCount(len(columns))
         self.table.setHorizontalHeaderLabels(columns)
     
+    def setup_pagination(self):
+        """Sort + Previous/Next controls dưới bảng"""
+        bar = QHBoxLayout()
+        
+        bar.addWidget(QLabel("Sort by:"))
+        self.cmb_sort = QComboBox()
+        for label, column in self.SORT_OPTIONS:
+            self.cmb_sort.addItem(label, column)
+        self.cmb_sort.currentIndexChanged.connect(self.on_search)
+        bar.addWidget(self.cmb_sort)
+        
+        self.chk_desc = QCheckBox("Descending")
+        self.chk_desc.toggled.connect(self.on_search)
+        bar.addWidget(self.chk_desc)
+        
+        bar.addStretch()
+        
+        self.btn_prev = QPushButton("◀ Previous")
+        self.btn_prev.clicked.connect(self.on_prev_page)
+        bar.addWidget(self.btn_prev)
+        
+        self.lbl_page = QLabel()
+        bar.addWidget(self.lbl_page)
+        
+        self.btn_next = QPushButton("Next ▶")
+        self.btn_next.clicked.connect(self.on_next_page)
+        bar.addWidget(self.btn_next)
+        
+        # Trước status label
+        self.layout().insertLayout(self.layout().count() - 1, bar)
+        self.update_page_controls()
+    
     def load_data(self, search_term=""):
-        """Load students data"""
+        """Load students data (search: toàn bộ kết quả; browse: trang đầu theo sort hiện tại)"""
+        if search_term:
+            self.page_data = None
+            self.show_students(StudentModel.search(search_term))
+            self.update_page_controls()
+            return
+        
+        self.page_number = 1
+        self.load_page(count=True)
+    
+    def load_page(self, after=None, before=None, count=False):
+        """Load 1 trang: sau cursor `after`, trước cursor `before`, hoặc trang đầu"""
+        try:
+            if count:  # COUNT(*) 1 lần mỗi reload, không phải mỗi trang
+                self.total_students = StudentModel.count()
+            self.page_data = StudentModel.page(
+                after=after,
+                before=before,
+                limit=self.PAGE_SIZE,
+                order_by=self.cmb_sort.currentData(),
+                descending=self.chk_desc.isChecked(),
+            )
+        except Exception as e:
+            QMessageBox.critical(self, "Error", f"Failed to load students: {e}")
+            return
+        self.show_students(self.page_data["rows"])
+        self.update_page_controls()
+    
+    def on_next_page(self):
+        if self.page_data and self.page_data["next_cursor"]:
+            self.page_number += 1
+            self.load_page(after=self.page_data["next_cursor"])
+    
+    def on_prev_page(self):
+        if self.page_data and self.page_data["prev_cursor"]:
+            self.page_number -= 1
+            self.load_page(before=self.page_data["prev_cursor"])
+    
+    def update_page_controls(self):
+        paging = self.page_data is not None
+        self.btn_prev.setEnabled(paging and self.page_data["prev_cursor"] is not None)
+        self.btn_next.setEnabled(paging and self.page_data["next_cursor"] is not None)
+        if paging and self.page_data["rows"]:
+            first = (self.page_number - 1) * self.PAGE_SIZE + 1
+            last = first + len(self.page_data["rows"]) - 1
+            self.lbl_page.setText(f"Page {self.page_number} ({first}-{last} of {self.total_students})")
+        else:
+            self.lbl_page.setText("")
+    
+    def show_students(self, students):
+        """Đổ rows vào bảng"""
         try:
-            if search_term:
-                students = StudentModel.search(search_term)
-            else:
-                students = StudentModel.list(limit=500)
-            
             self.table.setRowCount(len(students))
             
             for row_idx, student in enumerate(students):
@@ -279,7 +469,10 @@ class StudentsPage(BaseTablePage):
                 self.table.setItem(row_idx, 7, QTableWidgetItem(str(student['EnrollmentYear'])))
                 self.table.setItem(row_idx, 8, QTableWidgetItem(student.get('Major', '')))
             
-            self.lbl_status.setText(f"Total students: {len(students)}")
+            if self.page_data is None:
+                self.lbl_status.setText(f"Found {len(students)} students")
+            else:
+                self.lbl_status.setText(f"Total students: {self.total_students}")
             
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load students: {e}")
@@ -292,6 +485,10 @@ class StudentsPage(BaseTablePage):
         """Add new student"""
         dialog = StudentDialog(edit_mode=False)
         if dialog.exec():
+            # StudentDialog ghi SQL trực tiếp (không qua db/StudentModel) -> tự evict
+            # result cache (dashboard KPIs) và cập nhật prefix index
+            db.invalidate_cache('students')
+            StudentModel.sync_index(dialog.student_id)
             self.refresh_table()
     
     def on_edit(self):
@@ -303,6 +500,8 @@ class StudentsPage(BaseTablePage):
         
         dialog = StudentDialog(edit_mode=True, student_id=int(student_id))
         if dialog.exec():
+            db.invalidate_cache('students')
+            StudentModel.sync_index(int(student_id))
             self.refresh_table()
     
     def on_delete(self):
@@ -340,7 +539,6 @@ class SubjectsPage(BaseTablePage):
     def __init__(self):
         super().__init__()
         self.setup_table_columns()
-        self.load_data()
     
     def setup_table_columns(self):
         """Setup table columns"""
@@ -420,7 +618,6 @@ class LecturersPage(BaseTablePage):
     def __init__(self):
         super().__init__()
         self.setup_table_columns()
-        self.load_data()
     
     def setup_table_columns(self):
         """Setup table columns"""
@@ -501,7 +698,6 @@ class ClassesPage(BaseTablePage):
     def __init__(self):
         super().__init__()
         self.setup_table_columns()
-        self.load_data()
     
     def setup_table_columns(self):
         """Setup table columns"""
@@ -588,7 +784,9 @@ Phần 2 của Main Window:
 
 from PyQt6.QtWidgets import *
 from PyQt6.QtCore import Qt
+import numpy as np
 import pyqtgraph as pg
+from columnar import rows_to_columns
 from PyQt6.QtWidgets import QWidget, QVBoxLayout
 from main_win import BaseTablePage
 from models import EnrollmentModel
@@ -606,7 +804,12 @@ class EnrollmentsPage(BaseTablePage):
     def __init__(self):
         super().__init__()
         self.setup_table_columns()
-        self.load_data()
+        
+        # Bulk enroll: cả khóa vào 1 class (EnrollmentModel.enroll_many)
+        self.btn_bulk = QPushButton("Bulk Enroll")
+        self.btn_bulk.setStyleSheet(self.get_button_style("#9C27B0"))
+        self.btn_bulk.clicked.connect(self.on_bulk_enroll)
+        self.top_bar.insertWidget(self.top_bar.indexOf(self.btn_edit), self.btn_bulk)
     
     def setup_table_columns(self):
         """Setup table columns"""
@@ -619,21 +822,22 @@ class EnrollmentsPage(BaseTablePage):
         """Load all enrollments"""
         try:
             # Get comprehensive enrollment data using query
-            enrollments = QueryModels.query_complete_enrollment_info()
+            # 'record' rows (__slots__) thay vì dict -> ít RAM hơn ~2x với full join
+            enrollments = QueryModels.query_complete_enrollment_info(row_format='record')
             
             self.table.setRowCount(len(enrollments))
             
             for row_idx, enr in enumerate(enrollments):
-                student_name = f"{enr['StudentFirstName']} {enr['StudentLastName']}"
+                student_name = f"{enr.StudentFirstName} {enr.StudentLastName}"
                 
-                self.table.setItem(row_idx, 0, QTableWidgetItem(str(enr['StudentID'])))
+                self.table.setItem(row_idx, 0, QTableWidgetItem(str(enr.StudentID)))
                 self.table.setItem(row_idx, 1, QTableWidgetItem(student_name))
-                self.table.setItem(row_idx, 2, QTableWidgetItem(str(enr['ClassID'])))
-                self.table.setItem(row_idx, 3, QTableWidgetItem(enr['SubjectName']))
-                self.table.setItem(row_idx, 4, QTableWidgetItem(enr['Semester']))
-                self.table.setItem(row_idx, 5, QTableWidgetItem(str(enr['Year'])))
-                self.table.setItem(row_idx, 6, QTableWidgetItem(str(enr.get('Grade', ''))))
-                self.table.setItem(row_idx, 7, QTableWidgetItem(enr.get('GradeLetter', '')))
+                self.table.setItem(row_idx, 2, QTableWidgetItem(str(enr.ClassID)))
+                self.table.setItem(row_idx, 3, QTableWidgetItem(enr.SubjectName))
+                self.table.setItem(row_idx, 4, QTableWidgetItem(enr.Semester))
+                self.table.setItem(row_idx, 5, QTableWidgetItem(str(enr.Year)))
+                self.table.setItem(row_idx, 6, QTableWidgetItem(str(enr.Grade if enr.Grade is not None else '')))
+                self.table.setItem(row_idx, 7, QTableWidgetItem(enr.GradeLetter or ''))
             
             self.lbl_status.setText(f"Total enrollments: {len(enrollments)}")
             
@@ -649,6 +853,12 @@ class EnrollmentsPage(BaseTablePage):
         if dialog.exec():
             self.refresh_table()
     
+    def on_bulk_enroll(self):
+        """Enroll cả roster vào 1 class"""
+        dialog = BulkEnrollDialog(self)
+        if dialog.exec():
+            self.refresh_table()
+    
     def on_edit(self):
         """Edit selected enrollment"""
         student_id = self.get_selected_row_data(0)
@@ -696,7 +906,7 @@ class EnrollmentsPage(BaseTablePage):
 # QUERY PAGES - 4 required queries
 # ============================================================
 
-class Query1Page(QWidget):
+class Query1Page(LazyLoadMixin, QWidget):
     """
     Query 1: INNER JOIN - Student name and grade per subject
     
@@ -709,7 +919,6 @@ class Query1Page(QWidget):
     def __init__(self):
         super().__init__()
         self.setup_ui()
-        self.load_data()
     
     def setup_ui(self):
         """Setup UI"""
@@ -833,7 +1042,7 @@ class Query1Page(QWidget):
                 QMessageBox.information(self, "Success", f"Exported to {filename}")
 
 
-class Query2Page(QWidget):
+class Query2Page(LazyLoadMixin, QWidget):
     """
     Query 2: LEFT JOIN - All students with/without grades
     
@@ -846,7 +1055,6 @@ class Query2Page(QWidget):
     def __init__(self):
         super().__init__()
         self.setup_ui()
-        self.load_data()
     
     def setup_ui(self):
         """Setup UI"""
@@ -903,24 +1111,27 @@ class Query2Page(QWidget):
         self.setLayout(layout)
     
     def load_data(self):
-        """Load query results"""
-        try:
-            results = QueryModels.query_all_students_with_grades()
-            
-            if results:
-                columns = list(results[0].keys())
-                self.table.setColumnCount(len(columns))
-                self.table.setHorizontalHeaderLabels(columns)
-                self.table.setRowCount(len(results))
-                
-                for row_idx, row_data in enumerate(results):
-                    for col_idx, (key, value) in enumerate(row_data.items()):
-                        self.table.setItem(row_idx, col_idx, QTableWidgetItem(str(value) if value else ''))
-            
-            self.lbl_status.setText(f"Found {len(results)} records")
+        """Load query results (background thread, cancel khi rời page)"""
+        self.lbl_status.setText("Loading...")
+        self.run_query_async(QueryModels.query_all_students_with_grades, self.show_results)
+    
+    def show_results(self, results, handle):
+        """Hiển thị kết quả (GUI thread)"""
+        if results is None:
+            self.lbl_status.setText(self.describe_outcome(handle))
+            return
+        
+        if results:
+            columns = list(results[0].keys())
+            self.table.setColumnCount(len(columns))
+            self.table.setHorizontalHeaderLabels(columns)
+            self.table.setRowCount(len(results))
             
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Query failed: {e}")
+            for row_idx, row_data in enumerate(results):
+                for col_idx, (key, value) in enumerate(row_data.items()):
+                    self.table.setItem(row_idx, col_idx, QTableWidgetItem(str(value) if value else ''))
+        
+        self.lbl_status.setText(f"Found {len(results)} records")
     
     def export_csv(self):
         """Export to CSV"""
@@ -940,7 +1151,7 @@ class Query2Page(QWidget):
                 QMessageBox.information(self, "Success", f"Exported to {filename}")
 
 
-class Query3Page(QWidget):
+class Query3Page(LazyLoadMixin, QWidget):
     """
     Query 3: Multi-table JOIN - Student-Subject-Grade-Lecturer
     
@@ -954,7 +1165,6 @@ class Query3Page(QWidget):
     def __init__(self):
         super().__init__()
         self.setup_ui()
-        self.load_data()
     
     def setup_ui(self):
         """Setup UI"""
@@ -1026,31 +1236,40 @@ class Query3Page(QWidget):
         self.setLayout(layout)
     
     def load_data(self):
-        """Load query results"""
-        try:
-            semester = None if self.combo_semester.currentText() == "All" else self.combo_semester.currentText()
-            year = None if self.spin_year.value() == 2020 else self.spin_year.value()
-            
-            results = QueryModels.query_complete_enrollment_info(semester=semester, year=year)
-            
-            if results:
-                columns = list(results[0].keys())
-                self.table.setColumnCount(len(columns))
-                self.table.setHorizontalHeaderLabels(columns)
-                self.table.setRowCount(len(results))
-                
-                for row_idx, row_data in enumerate(results):
-                    for col_idx, (key, value) in enumerate(row_data.items()):
-                        self.table.setItem(row_idx, col_idx, QTableWidgetItem(str(value) if value else ''))
-            
-            self.lbl_status.setText(f"Found {len(results)} records")
+        """Load query results (background thread; đổi filter / rời page -> cancel query cũ)"""
+        semester = None if self.combo_semester.currentText() == "All" else self.combo_semester.currentText()
+        year = None if self.spin_year.value() == 2020 else self.spin_year.value()
+        
+        self.lbl_status.setText("Loading...")
+        # Bảng chỉ dùng vị trí cột -> tuple rows + header
+        self.run_query_async(
+            lambda cancel: QueryModels.query_complete_enrollment_info(
+                semester=semester, year=year, row_format='tuple', cancel=cancel
+            ),
+            self.show_results
+        )
+    
+    def show_results(self, results, handle):
+        """Hiển thị kết quả (GUI thread)"""
+        if results is None:
+            self.lbl_status.setText(self.describe_outcome(handle))
+            return
+        
+        if results:
+            columns = list(results.columns)
+            self.table.setColumnCount(len(columns))
+            self.table.setHorizontalHeaderLabels(columns)
+            self.table.setRowCount(len(results))
             
-        except Exception as e:
-            QMessageBox.critical(self, "Error", f"Query failed: {e}")
+            for row_idx, row_data in enumerate(results):
+                for col_idx, value in enumerate(row_data):
+                    self.table.setItem(row_idx, col_idx, QTableWidgetItem(str(value) if value else ''))
+        
+        self.lbl_status.setText(f"Found {len(results)} records")
     
     def export_csv(self):
         """Export to CSV"""
-        from query_models import export_query_to_csv
+        from query_models import export_stream_to_csv
         from PyQt6.QtWidgets import QFileDialog
         
         filename, _ = QFileDialog.getSaveFileName(
@@ -1063,12 +1282,13 @@ class Query3Page(QWidget):
         if filename:
             semester = None if self.combo_semester.currentText() == "All" else self.combo_semester.currentText()
             year = None if self.spin_year.value() == 2020 else self.spin_year.value()
-            results = QueryModels.query_complete_enrollment_info(semester=semester, year=year)
-            if export_query_to_csv(results, filename):
+            # Stream thẳng ra file, không load toàn bộ enrollments vào RAM
+            rows = QueryModels.stream_complete_enrollment_info(semester=semester, year=year)
+            if export_stream_to_csv(rows, filename):
                 QMessageBox.information(self, "Success", f"Exported to {filename}")
 
 
-class Query4Page(QWidget):
+class Query4Page(LazyLoadMixin, QWidget):
     """
     Query 4: Students Above Global Average
     
@@ -1082,7 +1302,6 @@ class Query4Page(QWidget):
     def __init__(self):
         super().__init__()
         self.setup_ui()
-        self.load_data()
     
     def setup_ui(self):
         """Setup UI"""
@@ -1197,7 +1416,7 @@ class Query4Page(QWidget):
 # DASHBOARD PAGE
 # ============================================================
 
-class DashboardPage(QWidget):
+class DashboardPage(LazyLoadMixin, QWidget):
     """
     Dashboard với KPIs và Charts
     """
@@ -1205,7 +1424,6 @@ class DashboardPage(QWidget):
     def __init__(self):
         super().__init__()
         self.setup_ui()
-        self.load_data()
 
     def setup_ui(self):
         main_layout = QVBoxLayout()
@@ -1286,9 +1504,10 @@ class DashboardPage(QWidget):
         return card
 
     def load_data(self):
-        """Load dashboard data"""
+        """Load dashboard data (KPIs, chart, top students: 1 batched round trip)"""
         try:
-            kpis = QueryModels.get_dashboard_kpis()
+            data = QueryModels.get_dashboard_data(top_limit=10)
+            kpis = data["kpis"]
 
             self.update_kpi(self.kpi_students, str(kpis.get("total_students", 0)))
             self.update_kpi(self.kpi_subjects, str(kpis.get("total_subjects", 0)))
@@ -1297,11 +1516,11 @@ class DashboardPage(QWidget):
             self.update_kpi(self.kpi_pass_rate, f"{kpis.get('pass_rate', 0)}%")
 
             # Grade chart
-            grade_data = QueryModels.get_grade_distribution()
+            grade_data = rows_to_columns(data["grade_distribution"], ("GradeRange", "Count"))
             self.load_grade_distribution_chart(grade_data)
 
             # Top students
-            self.load_top_students()
+            self.load_top_students(data["top_students"])
 
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load dashboard: {e}")
@@ -1321,10 +1540,10 @@ class DashboardPage(QWidget):
                 if widget:
                     widget.deleteLater()
 
-            # Chart data
-            counts = [row["Count"] for row in data]
-            categories = [row["GradeRange"] for row in data]
-            x_positions = list(range(len(categories)))
+            # Chart data (columnar: arrays đưa thẳng vào pyqtgraph)
+            counts = data["Count"]
+            categories = data["GradeRange"]
+            x_positions = np.arange(len(counts))
 
             # PyQtGraph plot
             plot = pg.PlotWidget()
@@ -1343,16 +1562,17 @@ class DashboardPage(QWidget):
 
             # X-axis labels
             axis_x = plot.getAxis("bottom")
-            axis_x.setTicks([list(zip(x_positions, categories))])
+            axis_x.setTicks([list(zip(x_positions.tolist(), categories.tolist()))])
 
             layout.addWidget(plot)
 
         except Exception as e:
             print(f"Chart error: {e}")
 
-    def load_top_students(self):
+    def load_top_students(self, top_students=None):
         try:
-            top_students = QueryModels.query_top_students(limit=10)
+            if top_students is None:
+                top_students = QueryModels.query_top_students(limit=10)
             self.table_top_students.setRowCount(len(top_students))
 
             for row_idx, student in enumerate(top_students):
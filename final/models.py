@@ -7,14 +7,22 @@ GIẢI THÍCH:
 - Transaction support cho data integrity
 """
 
+import db_connection
 from db_connection import db
+import search_index
+import bulk_loader
+from prefix_index import student_index
+from mysql.connector import errors
 from typing import List, Dict, Optional, Tuple
 from validators import Validators, ValidationError
+import base64
+import datetime
+import json
 import logging
 
 logger = logging.getLogger(__name__)
-def validate_student_data(data):
-    return Validators.validate_student_data(data)
+def validate_student_data(data, student_id=None):
+    return Validators.validate_student_data(data, student_id)
 
 def validate_subject_data(data):
     return Validators.validate_subject_data(data)
@@ -58,6 +66,77 @@ class BaseModel:
         return where_clause, params
 
 
+# ============================================================
+# KEYSET PAGINATION - cursor cho StudentModel.page()
+# ============================================================
+
+# Cột sort được hỗ trợ (NOT NULL, có index: InnoDB index phụ (col) đã chứa sẵn StudentID)
+STUDENT_SORT_COLUMNS = ('StudentID', 'LastName', 'FirstName', 'DOB', 'EnrollmentYear')
+
+# Index của các cột sort thêm cùng keyset pagination (schema.sql chỉ tạo cho database mới)
+STUDENT_SORT_INDEXES = {
+    'idx_students_lastname': 'LastName',
+    'idx_students_firstname': 'FirstName',
+    'idx_students_dob': 'DOB',
+}
+
+
+def migrate_sort_indexes() -> List[str]:
+    """
+    Tạo index còn thiếu cho các cột sort trên database đã có (idempotent)
+    
+    Usage: python models.py --migrate-sort-indexes
+    
+    Returns:
+        Tên các index vừa tạo ([] nếu đã đủ)
+    """
+    if db_connection.DB_BACKEND == 'sqlite':
+        rows = db.execute_query(
+            "SELECT name AS IndexName FROM sqlite_master WHERE type = 'index' AND tbl_name = 'students'"
+        )
+    else:
+        rows = db.execute_query(
+            "SELECT DISTINCT INDEX_NAME AS IndexName FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'students'",
+            use_primary=True
+        )
+    if rows is None:
+        raise RuntimeError("Cannot read existing indexes on students")
+    existing = {row['IndexName'] for row in rows}
+    
+    created = []
+    for name, column in STUDENT_SORT_INDEXES.items():
+        if name not in existing:
+            db.execute_update(f"CREATE INDEX {name} ON students ({column})")
+            created.append(name)
+            logger.info(f"✓ Created index {name} on students ({column})")
+    return created
+
+
+def encode_page_cursor(order_by: str, descending: bool, key: tuple) -> str:
+    """(order_by, hướng, (sort_value, StudentID)) -> chuỗi opaque cho GUI/API"""
+    value, student_id = key
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        value = value.isoformat()
+    raw = json.dumps([order_by, descending, value, student_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_page_cursor(cursor: str) -> Tuple[str, bool, tuple]:
+    """
+    Ngược lại của encode_page_cursor
+    
+    Raises:
+        ValueError: Cursor hỏng / không phải của StudentModel.page()
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        order_by, descending, value, student_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from e
+    return order_by, bool(descending), (value, int(student_id))
+
+
 # ============================================================
 # STUDENT MODEL
 # ============================================================
@@ -68,11 +147,15 @@ class StudentModel(BaseModel):
     
     CRUD:
     - create(): Add new student
+    - bulk_create(): Add nhiều students (validate + INSERT theo chunks)
     - get_by_id(): Get student by ID
     - update(): Update student info
     - delete(): Delete student
-    - list(): Get paginated list
-    - search(): Search students
+    - list(): Get paginated list (OFFSET, chậm dần khi trang sâu)
+    - page(): Keyset pagination (chi phí mỗi trang không đổi)
+    - list_cohort(): Students của 1 khóa (EnrollmentYear / Major)
+    - search(): Search students (full-text index, fallback LIKE)
+    - lookup(): Type-ahead trong RAM (prefix_index, không round trip)
     """
     
     @staticmethod
@@ -81,7 +164,7 @@ class StudentModel(BaseModel):
         Create new student
         
         Args:
-            data: Dict với keys: full_name, email, dob, gender, etc.
+            data: Dict với keys như StudentDialog: FirstName, LastName, Email, DOB, Gender, EnrollmentYear...
         
         Returns:
             StudentID của student mới
@@ -99,27 +182,111 @@ class StudentModel(BaseModel):
         """
         
         params = (
-            clean_data['first_name'],
-            clean_data['last_name'],
-            clean_data['dob'],
-            clean_data['gender'],
-            clean_data['address'],
-            clean_data['phone'],
-            clean_data['email'],
-            clean_data['enrollment_year'],
-            clean_data['major']
+            clean_data['FirstName'],
+            clean_data['LastName'],
+            clean_data['DOB'],
+            clean_data['Gender'],
+            clean_data['Address'],
+            clean_data['Phone'],
+            clean_data['Email'],
+            clean_data['EnrollmentYear'],
+            clean_data['Major']
         )
         
         try:
-            with db.get_cursor(dictionary=False) as cursor:
-                cursor.execute(sql, params)
-                student_id = cursor.lastrowid
-                logger.info(f"Created student ID: {student_id}")
-                return student_id
+            student_id = db.execute_insert(sql, params)
+            logger.info(f"Created student ID: {student_id}")
+            student_index.on_saved(student_id, clean_data['FirstName'], clean_data['LastName'],
+                                   clean_data['Email'])
+            return student_id
         except Exception as e:
             logger.error(f"Failed to create student: {e}")
             raise
     
+    @staticmethod
+    def bulk_create(rows: List[dict], chunk_size: int = 500) -> Dict:
+        """
+        Create nhiều students: mỗi chunk validate theo batch rồi INSERT trong 1 transaction
+        
+        GIẢI THÍCH:
+        - create() từng row: 1 SELECT kiểm tra Email + 1 INSERT + 1 commit mỗi student
+        - Mỗi chunk:
+          + Format (tên, Email, DOB, Gender, Year) kiểm tra trong Python
+          + Email trùng trong rows: set; trùng với DB: 1 query IN (...)
+            (chunk_size <= bulk_loader.IN_CHUNK_SIZE)
+          + Rows hợp lệ: multi-row INSERT (db.execute_batched) + 1 SELECT lấy
+            StudentID theo Email, cùng 1 transaction (deadlock -> chạy lại chunk)
+          + Client khác vừa thêm cùng Email (IntegrityError) -> chunk insert lại
+            từng row, chỉ row trùng bị báo lỗi
+        
+        Args:
+            rows: list of dict (keys như validate_student_data: FirstName, LastName, Email, DOB...)
+            chunk_size: Số rows mỗi chunk / transaction
+        
+        Returns:
+            dict:
+                ids: StudentID theo thứ tự rows (None nếu row bị loại)
+                errors: {index trong rows: lý do}
+                created: Số students đã tạo
+        """
+        ids = [None] * len(rows)
+        failures = {}
+        for start in range(0, len(rows), chunk_size):
+            valid, rejected = bulk_loader.check_student_rows(rows[start:start + chunk_size], start=start)
+            failures.update(rejected)
+            if not valid:
+                continue
+            try:
+                created = db.run_in_transaction(StudentModel._insert_chunk, valid)
+            except errors.IntegrityError as e:
+                logger.warning(f"Bulk create chunk at row {start} conflicted ({e}), retrying row by row")
+                created = StudentModel._insert_rows(valid, failures)
+            
+            columns = bulk_loader.STUDENT_COLUMNS
+            for index, row in valid:
+                student_id = created.get(index)
+                if student_id is not None:
+                    ids[index] = student_id
+                    student_index.on_saved(student_id, row[columns.index('FirstName')],
+                                           row[columns.index('LastName')], row[columns.index('Email')])
+        
+        created_count = sum(student_id is not None for student_id in ids)
+        logger.info(f"Bulk created {created_count} students, rejected {len(failures)}")
+        return {'ids': ids, 'errors': dict(sorted(failures.items())), 'created': created_count}
+    
+    @staticmethod
+    def _insert_chunk(valid):
+        """Multi-row INSERT rows đã validate, trả về {index: StudentID} (gọi trong transaction)"""
+        columns = bulk_loader.STUDENT_COLUMNS
+        email_at = columns.index('Email')
+        db.execute_batched(
+            f"INSERT INTO students ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})",
+            [row for _, row in valid]
+        )
+        # LAST_INSERT_ID() của multi-row INSERT không đảm bảo IDs liên tiếp -> lấy theo Email (UNIQUE)
+        emails = [row[email_at] for _, row in valid]
+        found = db.execute_query(
+            f"SELECT StudentID, Email FROM students WHERE Email IN ({', '.join(['%s'] * len(emails))})",
+            emails, row_format='tuple'
+        )
+        if found is None:
+            raise RuntimeError("StudentID lookup failed after bulk insert")  # -> rollback chunk
+        by_email = {email.lower(): student_id for student_id, email in found}
+        return {index: by_email[row[email_at].lower()] for index, row in valid}
+    
+    @staticmethod
+    def _insert_rows(valid, failures):
+        """Fallback: INSERT từng row (mỗi row 1 transaction), row lỗi ghi vào failures"""
+        columns = bulk_loader.STUDENT_COLUMNS
+        sql = f"INSERT INTO students ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+        created = {}
+        for index, row in valid:
+            try:
+                created[index] = db.execute_insert(sql, row)
+            except errors.IntegrityError as e:
+                failures[index] = f"Email '{row[columns.index('Email')]}' đã tồn tại trong hệ thống ({e})"
+        return created
+    
     @staticmethod
     def get_by_id(student_id: int) -> Optional[Dict]:
         """Get student by ID"""
@@ -134,7 +301,7 @@ class StudentModel(BaseModel):
         Returns:
             Number of affected rows
         """
-        clean_data = validate_student_data(data)
+        clean_data = validate_student_data(data, student_id)
         
         sql = """
             UPDATE students 
@@ -144,20 +311,22 @@ class StudentModel(BaseModel):
         """
         
         params = (
-            clean_data['first_name'],
-            clean_data['last_name'],
-            clean_data['dob'],
-            clean_data['gender'],
-            clean_data['address'],
-            clean_data['phone'],
-            clean_data['email'],
-            clean_data['enrollment_year'],
-            clean_data['major'],
+            clean_data['FirstName'],
+            clean_data['LastName'],
+            clean_data['DOB'],
+            clean_data['Gender'],
+            clean_data['Address'],
+            clean_data['Phone'],
+            clean_data['Email'],
+            clean_data['EnrollmentYear'],
+            clean_data['Major'],
             student_id
         )
         
         affected = db.execute_update(sql, params)
         logger.info(f"Updated student {student_id}, affected rows: {affected}")
+        student_index.on_saved(student_id, clean_data['FirstName'], clean_data['LastName'],
+                               clean_data['Email'])
         return affected
     
     @staticmethod
@@ -166,6 +335,7 @@ class StudentModel(BaseModel):
         sql = "DELETE FROM students WHERE StudentID = %s"
         affected = db.execute_update(sql, (student_id,))
         logger.info(f"Deleted student {student_id}")
+        student_index.on_deleted(student_id)
         return affected
     
     @staticmethod
@@ -185,17 +355,164 @@ class StudentModel(BaseModel):
         """
         return db.execute_query(sql, (limit, offset))
     
+    @staticmethod
+    def list_cohort(enrollment_year: int, major: str = None) -> List[Dict]:
+        """Students của 1 khóa (EnrollmentYear, optional Major) cho bulk enroll"""
+        sql = "SELECT StudentID, FirstName, LastName, Major FROM students WHERE EnrollmentYear = %s"
+        params = [enrollment_year]
+        if major:
+            sql += " AND Major = %s"
+            params.append(major)
+        return db.execute_query(sql + " ORDER BY LastName, FirstName, StudentID", params)
+    
+    @staticmethod
+    def page(after=None, before=None, limit: int = 50, order_by: str = "StudentID",
+             descending: bool = False) -> Dict:
+        """
+        Keyset (seek) pagination
+        
+        GIẢI THÍCH:
+        - LIMIT/OFFSET: server vẫn phải đọc rồi bỏ `offset` rows -> trang càng sâu càng chậm
+        - Keyset: nhớ key (sort_value, StudentID) của row cuối trang trước, trang sau bắt
+          đầu bằng index seek: WHERE col > v OR (col = v AND StudentID > id)
+          -> mỗi trang chỉ đọc limit + 1 rows, dù ở trang 1 hay trang 4000
+        - StudentID làm tie-breaker: key luôn unique kể cả khi LastName trùng
+          (index (col) của InnoDB / SQLite đã chứa sẵn StudentID -> seek trên (col, StudentID))
+        - MySQL: dạng OR mở rộng (range optimizer tách thành 2 ranges);
+          SQLite: row value (col, StudentID) > (v, id) (dạng OR làm SQLite scan + sort)
+        
+        Usage:
+            first = StudentModel.page(limit=100, order_by='LastName')
+            second = StudentModel.page(after=first['next_cursor'], limit=100)
+            back = StudentModel.page(before=second['prev_cursor'], limit=100)
+        
+        Args:
+            after: Cursor (từ next_cursor) hoặc tuple (sort_value, StudentID): trang sau key này
+            before: Như after, nhưng lấy trang ngay trước key (nút Previous)
+            limit: Số rows mỗi trang
+            order_by: 1 trong STUDENT_SORT_COLUMNS (bị bỏ qua nếu cursor là chuỗi:
+                      cursor mang theo order_by / descending của nó)
+            descending: Sort giảm dần
+        
+        Returns:
+            Dict: rows (list of dicts), next_cursor / prev_cursor (None nếu hết trang)
+        
+        Raises:
+            ValueError: order_by không hỗ trợ, cursor hỏng, hoặc truyền cả after và before
+        """
+        if after is not None and before is not None:
+            raise ValueError("Pass either after or before, not both")
+        key = after if after is not None else before
+        if isinstance(key, str):
+            order_by, descending, key = decode_page_cursor(key)
+        if order_by not in STUDENT_SORT_COLUMNS:
+            raise ValueError(f"Unsupported sort column '{order_by}', expected one of {STUDENT_SORT_COLUMNS}")
+        
+        # Đi lùi (before) = đi tiến theo chiều sort ngược lại rồi đảo kết quả
+        backwards = before is not None
+        scan_desc = descending != backwards
+        op = '<' if scan_desc else '>'
+        direction = 'DESC' if scan_desc else 'ASC'
+        
+        where, params = "", []
+        if key is not None:
+            value, student_id = key
+            if order_by == 'StudentID':
+                where = f"WHERE StudentID {op} %s"
+                params = [student_id]
+            elif db_connection.DB_BACKEND == 'sqlite':
+                # SQLite: row value -> seek thẳng trên index (col, rowid)
+                where = f"WHERE ({order_by}, StudentID) {op} (%s, %s)"
+                params = [value, student_id]
+            else:
+                # MySQL: 2 ranges trên index (col) + PK (index extensions)
+                where = f"WHERE {order_by} {op} %s OR ({order_by} = %s AND StudentID {op} %s)"
+                params = [value, value, student_id]
+        order = f"StudentID {direction}" if order_by == 'StudentID' else f"{order_by} {direction}, StudentID {direction}"
+        
+        sql = f"""
+            SELECT * FROM students
+            {where}
+            ORDER BY {order}
+            LIMIT %s
+        """
+        rows = db.execute_query(sql, tuple(params) + (limit + 1,)) or []
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backwards:
+            rows.reverse()
+        
+        def cursor_of(row):
+            return encode_page_cursor(order_by, descending, (row[order_by], row['StudentID']))
+        
+        # Tiến: còn trang sau nếu đọc được limit + 1; có trang trước nếu bắt đầu từ 1 key
+        # Lùi: ngược lại (trang sau chắc chắn có: chính là trang vừa rời đi)
+        has_next = has_more if not backwards else True
+        has_prev = (key is not None) if not backwards else has_more
+        return {
+            'rows': rows,
+            'next_cursor': cursor_of(rows[-1]) if rows and has_next else None,
+            'prev_cursor': cursor_of(rows[0]) if rows and has_prev else None,
+        }
+    
     @staticmethod
     def search(keyword: str, fields: List[str] = None) -> List[Dict]:
         """
         Search students by keyword
         
+        Dùng full-text index (search_index.py) nếu có, kết quả xếp theo Relevance;
+        không có index / keyword quá ngắn / fields khác mặc định -> search_like()
+        
         Args:
             keyword: Search term
             fields: Fields to search in (default: FirstName, LastName, Email)
         """
+        if fields is None or tuple(fields) == search_index.SEARCH_FIELDS:
+            indexed = search_index.search_query(keyword)
+            if indexed is not None:
+                return db.execute_query(*indexed)
+        return StudentModel.search_like(keyword, fields)
+    
+    @staticmethod
+    def lookup(text: str, limit: int = 10, wait: bool = True) -> List[Dict]:
+        """
+        Type-ahead: top `limit` students có tên / email / StudentID bắt đầu bằng các từ trong text
+        (không phân biệt dấu, index load 1 lần rồi giữ trong RAM)
+        
+        Args:
+            wait: False (GUI thread) -> index chưa load thì bắt đầu load ở background
+                và trả về [] thay vì block
+        
+        Returns:
+            list of dict: StudentID, FirstName, LastName, Email
+        """
+        if wait:
+            student_index.ensure_loaded()
+        elif not student_index.load_in_background():
+            return []
+        return student_index.search(text, limit)
+    
+    @staticmethod
+    def warm_lookup_index() -> None:
+        """Load prefix index ở background (gọi khi mở màn hình có type-ahead)"""
+        student_index.load_in_background()
+    
+    @staticmethod
+    def sync_index(student_id: int) -> None:
+        """Đọc lại 1 student vào prefix index (sau khi ghi ngoài StudentModel, vd StudentDialog)"""
+        if not student_index.loaded or student_id is None:
+            return
+        student = StudentModel.get_by_id(student_id)
+        if student is None:
+            student_index.on_deleted(student_id)
+        else:
+            student_index.on_saved(student_id, student['FirstName'], student['LastName'], student['Email'])
+    
+    @staticmethod
+    def search_like(keyword: str, fields: List[str] = None) -> List[Dict]:
+        """Search bằng LIKE '%keyword%' (full scan, không cần index)"""
         if fields is None:
-            fields = ['FirstName', 'LastName', 'Email']
+            fields = list(search_index.SEARCH_FIELDS)
         
         # Build LIKE conditions
         like_conditions = [f"{field} LIKE %s" for field in fields]
@@ -285,7 +602,7 @@ class SubjectModel(BaseModel):
     @staticmethod
     def list() -> List[Dict]:
         """Get all subjects"""
-        return db.execute_query("SELECT * FROM subjects ORDER BY SubjectCode")
+        return db.execute_query("SELECT * FROM subjects ORDER BY SubjectCode", cache=True)
     
     @staticmethod
     def count() -> int:
@@ -319,11 +636,9 @@ class LecturerModel(BaseModel):
         """
         params = (first_name, last_name, email, office)
         
-        with db.get_cursor(dictionary=False) as cursor:
-            cursor.execute(sql, params)
-            lecturer_id = cursor.lastrowid
-            logger.info(f"Created lecturer ID: {lecturer_id}")
-            return lecturer_id
+        lecturer_id = db.execute_insert(sql, params)
+        logger.info(f"Created lecturer ID: {lecturer_id}")
+        return lecturer_id
     
     @staticmethod
     def get_by_id(lecturer_id: int) -> Optional[Dict]:
@@ -357,7 +672,7 @@ class LecturerModel(BaseModel):
     @staticmethod
     def list() -> List[Dict]:
         """Get all lecturers"""
-        return db.execute_query("SELECT * FROM lecturers ORDER BY LecturerID")
+        return db.execute_query("SELECT * FROM lecturers ORDER BY LecturerID", cache=True)
     
     @staticmethod
     def get_with_classes(lecturer_id: int) -> List[Dict]:
@@ -397,11 +712,9 @@ class ClassModel(BaseModel):
         """
         params = (subject_code, lecturer_id, class_name, semester, year, max_capacity)
         
-        with db.get_cursor(dictionary=False) as cursor:
-            cursor.execute(sql, params)
-            class_id = cursor.lastrowid
-            logger.info(f"Created class ID: {class_id}")
-            return class_id
+        class_id = db.execute_insert(sql, params)
+        logger.info(f"Created class ID: {class_id}")
+        return class_id
     
     @staticmethod
     def get_by_id(class_id: int) -> Optional[Dict]:
@@ -470,7 +783,7 @@ class ClassModel(BaseModel):
         
         sql += " GROUP BY c.ClassID ORDER BY c.Year DESC, c.Semester"
         
-        return db.execute_query(sql, tuple(params))
+        return db.execute_query(sql, tuple(params), cache=True)
     
     @staticmethod
     def get_enrollment_count(class_id: int) -> int:
@@ -517,11 +830,81 @@ class EnrollmentModel(BaseModel):
         logger.info(f"Created enrollment: Student {clean_data['student_id']} -> Class {clean_data['class_id']}")
         return True
     
+    @staticmethod
+    def enroll_many(class_id: int, student_ids: List[int]) -> Dict:
+        """
+        Enroll cả roster vào 1 class
+        
+        GIẢI THÍCH:
+        - create() từng student: SELECT kiểm tra tồn tại + exists() + INSERT/commit
+          -> 3 round trips mỗi student
+        - Ở đây (1 transaction, deadlock -> chạy lại):
+          + 1 query LEFT JOIN students/enrollments cho cả roster: student nào tồn tại,
+            student nào đã đăng ký class
+          + Phần còn lại: 1 multi-row INSERT (db.execute_batched)
+        - Client khác vừa enroll cùng student (IntegrityError) -> chạy lại, lần sau
+          student đó nằm trong skipped
+        
+        Returns:
+            dict:
+                added: StudentIDs vừa được enroll (theo thứ tự student_ids)
+                skipped: {StudentID: lý do} (đã đăng ký / không tồn tại)
+        
+        Raises:
+            ValidationError: class_id không tồn tại
+        """
+        student_ids = list(dict.fromkeys(int(student_id) for student_id in student_ids))
+        for attempt in range(3):
+            try:
+                return db.run_in_transaction(EnrollmentModel._enroll_many, int(class_id), student_ids)
+            except errors.IntegrityError as e:
+                if attempt == 2:
+                    raise
+                logger.warning(f"Concurrent enrollment into class {class_id} ({e}), retrying")
+    
+    @staticmethod
+    def _enroll_many(class_id, student_ids):
+        if not db.execute_query("SELECT 1 FROM classes WHERE ClassID = %s", (class_id,), fetch_one=True):
+            raise ValidationError(f"Class {class_id} không tồn tại")
+        
+        enrolled = {}  # StudentID -> đã đăng ký class chưa
+        for start in range(0, len(student_ids), bulk_loader.IN_CHUNK_SIZE):
+            chunk = student_ids[start:start + bulk_loader.IN_CHUNK_SIZE]
+            rows = db.execute_query(
+                f"""
+                SELECT s.StudentID, e.ClassID IS NOT NULL AS Enrolled
+                FROM students s
+                LEFT JOIN enrollments e ON e.StudentID = s.StudentID AND e.ClassID = %s
+                WHERE s.StudentID IN ({', '.join(['%s'] * len(chunk))})
+                """,
+                [class_id, *chunk], row_format='tuple'
+            )
+            if rows is None:
+                raise RuntimeError("Enrollment lookup failed")  # -> rollback
+            enrolled.update((student_id, bool(flag)) for student_id, flag in rows)
+        
+        added, skipped = [], {}
+        for student_id in student_ids:
+            if student_id not in enrolled:
+                skipped[student_id] = "Student không tồn tại"
+            elif enrolled[student_id]:
+                skipped[student_id] = "Đã đăng ký class này"
+            else:
+                added.append(student_id)
+        
+        if added:
+            db.execute_batched(
+                "INSERT INTO enrollments (StudentID, ClassID) VALUES (%s, %s)",
+                [(student_id, class_id) for student_id in added]
+            )
+        logger.info(f"Enrolled {len(added)} students into class {class_id}, skipped {len(skipped)}")
+        return {'added': added, 'skipped': skipped}
+    
     @staticmethod
     def exists(student_id: int, class_id: int) -> bool:
         """Check if enrollment exists"""
         sql = "SELECT 1 FROM enrollments WHERE StudentID=%s AND ClassID=%s"
-        result = db.execute_query(sql, (student_id, class_id), fetch_one=True)
+        result = db.execute_query(sql, (student_id, class_id), fetch_one=True, use_primary=True)
         return result is not None
     
     @staticmethod
@@ -578,7 +961,105 @@ class EnrollmentModel(BaseModel):
 # TESTING
 # ============================================================
 
+def benchmark_pagination(students=200_000, page_size=100, depths=(0, 100, 1000, 1999)):
+    """
+    Thời gian lấy 1 trang ở các độ sâu: StudentModel.list (OFFSET) vs StudentModel.page (keyset)
+    
+    Bảng students phải trống (chạy trên SQLite: DB_BACKEND=sqlite python models.py --bench-pagination)
+    
+    Returns:
+        dict: depth -> {'offset_ms', 'keyset_ms'} cho mỗi cột sort
+    """
+    import random
+    import time
+    
+    if StudentModel.count() == 0:
+        last_names = ['Nguyen', 'Tran', 'Le', 'Pham', 'Hoang', 'Vu', 'Dang', 'Bui', 'Do', 'Ngo']
+        db.execute_many(
+            "INSERT INTO students (FirstName, LastName, DOB, Gender, Email, EnrollmentYear) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            [(f"First{i}", random.choice(last_names), f"{1995 + i % 10}-01-{1 + i % 28:02d}",
+              'MFO'[i % 3], f"student{i}@example.com", 2015 + i % 10) for i in range(students)]
+        )
+    
+    def timed(func):
+        started = time.perf_counter()
+        func()
+        return round((time.perf_counter() - started) * 1000, 2)
+    
+    results = {}
+    for order_by in ('StudentID', 'LastName'):
+        for depth in depths:
+            offset = depth * page_size
+            anchor = StudentModel.list(limit=1, offset=offset - 1, order_by=f"{order_by}, StudentID") if offset else []
+            key = (anchor[0][order_by], anchor[0]['StudentID']) if anchor else None
+            results[f"{order_by} page {depth}"] = {
+                'offset_ms': timed(lambda: StudentModel.list(limit=page_size, offset=offset,
+                                                             order_by=f"{order_by}, StudentID")),
+                'keyset_ms': timed(lambda: StudentModel.page(after=key, limit=page_size, order_by=order_by)),
+            }
+    return results
+
+
+def benchmark_bulk_create(students=50_000, per_row_sample=2_000, chunk_size=500):
+    """
+    Students / phút: từng row (các query của create(): SELECT Email + INSERT + commit)
+    vs StudentModel.bulk_create
+    
+    Returns:
+        dict: rows/minute của mỗi cách (từng row đo trên per_row_sample rows)
+    """
+    import time
+    
+    run = int(time.time())
+    
+    def make_rows(prefix, count):
+        return [{
+            'FirstName': f"First{i}", 'LastName': 'Nguyễn', 'Email': f"{prefix}{run}_{i}@example.com",
+            'DOB': f"{1995 + i % 10}-01-{1 + i % 28:02d}", 'Gender': 'MFO'[i % 3],
+            'EnrollmentYear': 2015 + i % 10, 'Major': 'CS',
+        } for i in range(count)]
+    
+    columns = bulk_loader.STUDENT_COLUMNS
+    sql = f"INSERT INTO students ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))})"
+    rows = make_rows('row', per_row_sample)
+    started = time.perf_counter()
+    for data in rows:
+        clean = Validators.validate_student_data(data)
+        db.execute_insert(sql, tuple(clean[col] for col in columns))
+    per_row_seconds = time.perf_counter() - started
+    
+    rows = make_rows('bulk', students)
+    started = time.perf_counter()
+    result = StudentModel.bulk_create(rows, chunk_size=chunk_size)
+    bulk_seconds = time.perf_counter() - started
+    assert result['created'] == students, result['errors']
+    
+    return {
+        'per_row_per_min': round(per_row_sample / per_row_seconds * 60),
+        'bulk_create_per_min': round(students / bulk_seconds * 60),
+        'bulk_create_s': round(bulk_seconds, 2),
+    }
+
+
 if __name__ == "__main__":
+    import sys
+    
+    if "--migrate-sort-indexes" in sys.argv:
+        created = migrate_sort_indexes()
+        print(f"Created indexes: {', '.join(created)}" if created else "Sort indexes already exist")
+        sys.exit(0)
+    
+    if "--bench-pagination" in sys.argv:
+        for name, timings in benchmark_pagination().items():
+            print(f"{name:>22}: {timings}")
+        sys.exit(0)
+    
+    if "--bench-bulk-create" in sys.argv:
+        for name, value in benchmark_bulk_create().items():
+            print(f"{name:>20}: {value}")
+        sys.exit(0)
+    
     print("Testing models...")
     
     # Test student count
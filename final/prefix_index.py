@@ -0,0 +1,327 @@
+# prefix_index.py - In-memory prefix index cho type-ahead tìm student
+"""
+GIẢI THÍCH:
+- Nhập điểm cần tìm student theo từng phím gõ; qua VPN mỗi round trip 20-50 ms
+  -> kể cả full-text index (search_index.py) vẫn chậm
+- StudentPrefixIndex: index nằm trong process, load 1 lần từ bảng students
+  + Tokens của mỗi student (đã bỏ dấu + lowercase, "Nguyễn Đức" -> "nguyen", "duc"):
+    tokens của FirstName, LastName, local part của Email (cả các phần tách bởi . _ -)
+  + Sorted array: _tokens (list str, intern -> tên trùng nhau dùng chung 1 object)
+    song song với _token_ids (array 'q'), xếp theo (token, StudentID)
+    -> prefix "ngu" = 1 đoạn liên tục tìm bằng bisect, O(log n)
+  + StudentID prefix không lưu string: "12" = IDs 12, 120-129, 1200-1299, ...
+    -> các đoạn trên array _ids đã sort
+  + Query nhiều từ ("nguyen kh"): duyệt đoạn nhỏ nhất, kiểm tra các từ còn lại
+    trên tokens của từng candidate, dừng khi đủ limit
+  + Thứ tự kết quả: token khớp nguyên từ trước (sort theo token), rồi StudentID
+- GUI: load_in_background() khi mở dialog, chưa load xong -> không có gợi ý
+  (không block GUI thread vài giây ở phím gõ đầu tiên)
+- Giữ đồng bộ: StudentModel.create/update/delete gọi on_saved/on_deleted
+  (chỉ khi index đã load). Index là cache: ghi ngoài StudentModel (bulk load,
+  transaction bị rollback) -> gọi student_index.reload()
+
+Benchmark (không cần database):
+    python prefix_index.py --students 500000
+"""
+
+import bisect
+import logging
+import re
+import sys
+import threading
+import unicodedata
+from array import array
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+_EMAIL_PARTS_RE = re.compile(r"[._\-+]+")
+
+
+@lru_cache(maxsize=65536)
+def fold(text):
+    """Bỏ dấu tiếng Việt + lowercase: "Nguyễn Đức" -> "nguyen duc" """
+    text = text.replace('đ', 'd').replace('Đ', 'D')
+    decomposed = unicodedata.normalize('NFD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def student_tokens(first_name, last_name, email):
+    """Tập tokens của 1 student (đã fold, intern)"""
+    tokens = set(fold(first_name or '').split()) | set(fold(last_name or '').split())
+    if email:
+        local = fold(email.split('@', 1)[0])
+        tokens.add(local)
+        tokens.update(part for part in _EMAIL_PARTS_RE.split(local) if part)
+    return {sys.intern(token) for token in tokens}
+
+
+def _record(first_name, last_name, email):
+    # Tên đã fold dùng chung 1 object cho các students trùng họ tên (intern)
+    names = sys.intern(f" {fold(first_name or '')} {fold(last_name or '')} ")
+    return first_name, last_name, email, names
+
+
+class StudentPrefixIndex:
+    """Prefix index trên tokens tên / email + StudentID (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._tokens = []
+        self._token_ids = array('q')
+        self._ids = array('q')
+        self._records = {}  # StudentID -> (FirstName, LastName, Email, " first last " đã fold)
+        self._loaded_for = None
+        self._load_lock = threading.Lock()
+        self._loader_lock = threading.Lock()  # Khác _load_lock: GUI thread không chờ load xong
+        self._loader = None
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def loaded(self):
+        return self._loaded_for is not None
+
+    # ------------------------------------------------------------
+    # Build / load
+    # ------------------------------------------------------------
+
+    def build(self, rows):
+        """Build lại toàn bộ index từ (StudentID, FirstName, LastName, Email)"""
+        records = {}
+        pairs = []
+        for student_id, first_name, last_name, email in rows:
+            records[student_id] = _record(first_name, last_name, email)
+            pairs.extend((token, student_id) for token in student_tokens(first_name, last_name, email))
+        pairs.sort()
+        tokens = [token for token, _ in pairs]
+        token_ids = array('q', [student_id for _, student_id in pairs])
+        ids = array('q', sorted(records))
+        with self._lock:
+            self._tokens, self._token_ids, self._ids, self._records = tokens, token_ids, ids, records
+        return self
+
+    def ensure_loaded(self):
+        """Load từ bảng students ở lần dùng đầu (và sau db.use_backend)"""
+        from db_connection import db
+
+        db._ensure_pool()
+        with self._load_lock:  # Đang load ở background -> chờ, không load 2 lần
+            if self._loaded_for != id(db._pool):
+                self.reload()
+
+    def load_in_background(self):
+        """
+        Bắt đầu load ở thread riêng nếu chưa load (GUI: 500k students mất vài giây)
+
+        Returns:
+            bool: True nếu index đã sẵn sàng
+        """
+        if self.loaded:
+            return True
+        with self._loader_lock:
+            if self._loader is None or not self._loader.is_alive():
+                self._loader = threading.Thread(target=self._load_quietly, name="student-prefix-index",
+                                                daemon=True)
+                self._loader.start()
+        return False
+
+    def _load_quietly(self):
+        try:
+            self.ensure_loaded()
+        except Exception as e:
+            logger.warning(f"Student prefix index load failed: {e}")
+
+    def reload(self):
+        from db_connection import db
+
+        db._ensure_pool()
+        pool_key = id(db._pool)
+        rows = db.stream_query("SELECT StudentID, FirstName, LastName, Email FROM students", batch_size=10000)
+        self.build((row['StudentID'], row['FirstName'], row['LastName'], row['Email']) for row in rows)
+        self._loaded_for = pool_key
+        logger.info(f"✓ Student prefix index loaded ({len(self)} students)")
+
+    # ------------------------------------------------------------
+    # Write paths (StudentModel)
+    # ------------------------------------------------------------
+
+    def on_saved(self, student_id, first_name, last_name, email):
+        """Student vừa được tạo / sửa"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._remove(student_id)
+            self._records[student_id] = _record(first_name, last_name, email)
+            for token in student_tokens(first_name, last_name, email):
+                lo = bisect.bisect_left(self._tokens, token)
+                hi = bisect.bisect_right(self._tokens, token, lo)
+                position = bisect.bisect_left(self._token_ids, student_id, lo, hi)
+                self._tokens.insert(position, token)
+                self._token_ids.insert(position, student_id)
+            self._ids.insert(bisect.bisect_left(self._ids, student_id), student_id)
+
+    def on_deleted(self, student_id):
+        """Student vừa bị xóa"""
+        if not self.loaded:
+            return
+        with self._lock:
+            self._remove(student_id)
+
+    def _remove(self, student_id):
+        record = self._records.pop(student_id, None)
+        if record is None:
+            return
+        for token in student_tokens(*record[:3]):
+            lo = bisect.bisect_left(self._tokens, token)
+            hi = bisect.bisect_right(self._tokens, token, lo)
+            position = bisect.bisect_left(self._token_ids, student_id, lo, hi)
+            if position < hi and self._token_ids[position] == student_id:
+                del self._tokens[position]
+                del self._token_ids[position]
+        position = bisect.bisect_left(self._ids, student_id)
+        if position < len(self._ids) and self._ids[position] == student_id:
+            del self._ids[position]
+
+    # ------------------------------------------------------------
+    # Query
+    # ------------------------------------------------------------
+
+    def search(self, query, limit=10):
+        """
+        Top-k students khớp mọi từ trong query (mỗi từ là prefix của 1 token hoặc StudentID)
+
+        Returns:
+            list of dict: StudentID, FirstName, LastName, Email
+        """
+        terms = fold(query).split()
+        if not terms or limit <= 0:
+            return []
+        with self._lock:
+            # Từ có đoạn nhỏ nhất dẫn đường; số: thêm IDs nên ước lượng lớn hơn
+            ranges = [self._token_range(term) for term in terms]
+            driver = min(range(len(terms)), key=lambda i: ranges[i][1] - ranges[i][0]
+                         + (len(self._ids) if terms[i].isdigit() else 0))
+            others = [(' ' + term, term) for term in terms[:driver] + terms[driver + 1:]]
+            lo, hi = ranges[driver]
+            if terms[driver].isdigit():
+                candidates = self._id_candidates(terms[driver], lo, hi)
+            else:
+                candidates = self._slices(self._token_ids, lo, hi)
+
+            records = self._records
+            results, seen = [], set()
+            for student_id in candidates:
+                if student_id in seen:
+                    continue
+                seen.add(student_id)
+                record = records[student_id]
+                for word_prefix, term in others:
+                    # Nhanh: prefix của 1 token tên = " term" có trong " first last "
+                    if word_prefix not in record[3] and not self._matches_other(student_id, record, term):
+                        break
+                else:
+                    results.append({
+                        'StudentID': student_id,
+                        'FirstName': record[0],
+                        'LastName': record[1],
+                        'Email': record[2],
+                    })
+                    if len(results) >= limit:
+                        break
+            return results
+
+    @staticmethod
+    def _slices(values, lo, hi, chunk=256):
+        # Copy từng đoạn nhỏ của array: nhanh hơn index từng phần tử, không copy cả đoạn lớn
+        for start in range(lo, hi, chunk):
+            yield from values[start:min(start + chunk, hi)]
+
+    def _token_range(self, term):
+        lo = bisect.bisect_left(self._tokens, term)
+        hi = bisect.bisect_left(self._tokens, term + '\uffff', lo)
+        return lo, hi
+
+    def _id_candidates(self, digits, lo, hi):
+        """IDs có prefix digits (ngắn trước), rồi tokens (vd email sv123...)"""
+        if not digits.startswith('0'):
+            prefix = int(digits)
+            width = 1
+            max_id = self._ids[-1] if self._ids else 0
+            while prefix * width <= max_id:
+                start = bisect.bisect_left(self._ids, prefix * width)
+                end = bisect.bisect_left(self._ids, (prefix + 1) * width, start)
+                yield from self._slices(self._ids, start, end)
+                width *= 10
+        yield from self._slices(self._token_ids, lo, hi)
+
+    @staticmethod
+    def _matches_other(student_id, record, term):
+        """term khớp StudentID hoặc token của email (tên đã kiểm tra ở search)"""
+        if term.isdigit() and str(student_id).startswith(term):
+            return True
+        email = record[2]
+        # Loại nhanh bằng substring trước khi tách tokens
+        if not email or (email.isascii() and term not in email.lower()):
+            return False
+        return any(token.startswith(term) for token in student_tokens(None, None, email))
+
+
+student_index = StudentPrefixIndex()
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+def benchmark_prefix_search(students=500_000, repeat=200):
+    """
+    Build index từ students giả lập rồi đo latency / query (top 10)
+
+    Returns:
+        dict: build_s, entries, và p50/p99 (µs) của từng query
+    """
+    import random
+    import time
+
+    last_names = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng',
+                  'Bùi', 'Đỗ', 'Hồ', 'Ngô', 'Dương', 'Lý']
+    middle_names = ['Văn', 'Thị', 'Đức', 'Minh', 'Ngọc', 'Thanh', 'Quốc', 'Hữu']
+    first_names = ['An', 'Bình', 'Châu', 'Dũng', 'Giang', 'Hà', 'Hải', 'Hạnh', 'Hiếu', 'Hoa', 'Hùng',
+                   'Khánh', 'Linh', 'Long', 'Minh', 'Nam', 'Ngọc', 'Phúc', 'Quân', 'Sơn', 'Thảo',
+                   'Trang', 'Tú', 'Tuấn', 'Vy', 'Yến']
+    rng = random.Random(42)
+    rows = [(i, f"{rng.choice(middle_names)} {rng.choice(first_names)}", rng.choice(last_names),
+             f"sv{i}@student.edu.vn") for i in range(1, students + 1)]
+
+    index = StudentPrefixIndex()
+    started = time.perf_counter()
+    index.build(rows)
+    results = {'students': students, 'entries': len(index._tokens),
+               'build_s': round(time.perf_counter() - started, 2)}
+
+    for query in ('ng', 'nguyen', 'Nguyễn Khánh', 'tran thi h', 'sv4242', '4242', 'duc yen', 'zzz'):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            matches = index.search(query, limit=10)
+            timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+        results[repr(query)] = {
+            'matches': len(matches),
+            'p50_us': round(timings[len(timings) // 2], 1),
+            'p99_us': round(timings[int(len(timings) * 0.99) - 1], 1),
+        }
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the in-memory student prefix index")
+    parser.add_argument("--students", type=int, default=500_000)
+    args = parser.parse_args()
+
+    for key, value in benchmark_prefix_search(args.students).items():
+        print(f"{key:>14}: {value}")
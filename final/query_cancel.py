@@ -0,0 +1,137 @@
+# query_cancel.py - Timeout và cancellation cho query nặng
+"""
+GIẢI THÍCH:
+- Query 2/3 lọc kém có thể chạy nhiều phút và giữ 1 pooled connection
+- Timeout (execute_query(..., timeout_ms=...)):
+  + MySQL: SELECT -> hint /*+ MAX_EXECUTION_TIME(n) */ (không tốn thêm round trip)
+           query khác (WITH ... SELECT) -> SET SESSION max_execution_time, reset sau query
+           quá hạn -> server trả errno 3024
+  + SQLite: watchdog timer gọi connection.interrupt()
+- Cancel (execute_query(..., cancel=handle)):
+  + handle.cancel() gọi được từ thread khác (GUI khi user chuyển page)
+  + MySQL: KILL QUERY <connection_id> trên 1 side connection (cùng server với query:
+           primary hoặc replica) -> query trả errno 1317, connection vẫn dùng tiếp được
+  + SQLite: connection.interrupt()
+- cancel() chỉ đánh dấu handle rồi gửi interrupt ở background thread (KILL QUERY mở
+  side connection, có thể mất tới 5s -> không block GUI thread trong hideEvent)
+- Interrupt chạy dưới lock của handle và chỉ khi query đó vẫn còn attach; query kết thúc
+  cũng phải lấy lock này để detach -> không bao giờ KILL nhầm query khác sau khi
+  connection đã trả về pool
+
+Usage:
+    handle = CancelHandle()
+    worker: rows = QueryModels.query_complete_enrollment_info(cancel=handle)
+    GUI:    handle.cancel()
+    sau đó: handle.outcome in ('ok', 'cancelled', 'timeout', 'error')
+"""
+
+import logging
+import re
+import threading
+
+from mysql.connector import errors
+
+logger = logging.getLogger(__name__)
+
+ER_QUERY_INTERRUPTED = 1317  # KILL QUERY
+ER_QUERY_TIMEOUT = 3024      # MAX_EXECUTION_TIME exceeded
+
+_SELECT_RE = re.compile(r'^\s*SELECT\b', re.IGNORECASE)
+
+
+def add_max_execution_time(query, timeout_ms):
+    """
+    SELECT ... -> SELECT /*+ MAX_EXECUTION_TIME(n) */ ...
+
+    Returns:
+        Query có hint, hoặc None nếu query không bắt đầu bằng SELECT (dùng session limit)
+    """
+    match = _SELECT_RE.match(query)
+    if not match:
+        return None
+    return f"SELECT /*+ MAX_EXECUTION_TIME({int(timeout_ms)}) */{query[match.end():]}"
+
+
+class CancelHandle:
+    """
+    Handle để cancel query đang chạy từ thread khác
+
+    Attributes:
+        cancelled: cancel() đã được gọi (query sau đó dùng handle này fail ngay)
+        timed_out: watchdog timeout (SQLite) đã interrupt query
+        outcome: None (chưa chạy / đang chạy), 'ok', 'cancelled', 'timeout', 'error'
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._canceller = None
+        self.cancelled = False
+        self.timed_out = False
+        self.outcome = None
+
+    @property
+    def running(self):
+        return self._canceller is not None
+
+    def attach(self, canceller):
+        """Gắn query đang chạy (canceller: hàm interrupt query đó)"""
+        with self._lock:
+            if self.cancelled:
+                raise errors.OperationalError(msg="Query cancelled", errno=ER_QUERY_INTERRUPTED)
+            self._canceller = canceller
+            self.outcome = None
+
+    def detach(self):
+        """Query kết thúc (chờ nếu cancel đang chạy)"""
+        with self._lock:
+            self._canceller = None
+
+    def finish(self, error=None):
+        """Ghi outcome từ lỗi (hoặc None = thành công); trả về outcome"""
+        if error is None:
+            self.outcome = 'ok'
+        elif self.timed_out or getattr(error, 'errno', None) == ER_QUERY_TIMEOUT:
+            self.outcome = 'timeout'
+        elif self.cancelled or getattr(error, 'errno', None) == ER_QUERY_INTERRUPTED:
+            self.outcome = 'cancelled'
+        else:
+            self.outcome = 'error'
+        return self.outcome
+
+    def cancel(self):
+        """
+        Cancel query đang chạy (nếu có) và mọi query sau đó dùng handle này
+
+        Không block: interrupt được gửi ở background thread
+
+        Returns:
+            True nếu có query đang chạy (interrupt đã được gửi đi)
+        """
+        return self._interrupt('cancelled')
+
+    def expire(self):
+        """Watchdog timeout (SQLite backend)"""
+        return self._interrupt('timed_out')
+
+    def _interrupt(self, flag):
+        with self._lock:
+            if flag == 'cancelled':
+                self.cancelled = True
+            canceller = self._canceller
+            if canceller is None:
+                return False
+            if flag == 'timed_out':
+                self.timed_out = True
+        threading.Thread(target=self._run_canceller, args=(canceller,),
+                         name="query-cancel", daemon=True).start()
+        return True
+
+    def _run_canceller(self, canceller):
+        with self._lock:
+            if self._canceller is not canceller:
+                return  # Query đã detach -> connection có thể đang chạy query khác
+            try:
+                canceller()
+            except Exception as e:
+                logger.warning(f"Failed to interrupt query: {e}")
+            self._canceller = None
@@ -11,12 +11,99 @@ Pattern: Static methods trả về list of dicts
 """
 
 from db_connection import db
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Iterable, Iterator
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 
+# ============================================================
+# TIME BUDGETS - timeout mặc định (ms) cho các query nặng
+# ============================================================
+
+# Override: DB_QUERY_BUDGETS="query_complete_enrollment_info=60000,query_all_students_with_grades=0"
+# (0 = không giới hạn). Truyền timeout_ms=... khi gọi để override cho 1 lần.
+QUERY_BUDGETS_MS = {
+    'query_student_grades_by_subject': 10000,
+    'query_all_students_with_grades': 15000,
+    'query_complete_enrollment_info': 30000,
+    'query_students_above_average': 15000,
+    'query_subject_performance': 10000,
+    'query_lecturer_performance': 10000,
+}
+
+for _item in filter(None, os.getenv('DB_QUERY_BUDGETS', '').split(',')):
+    _name, _, _value = _item.partition('=')
+    try:
+        QUERY_BUDGETS_MS[_name.strip()] = int(_value)
+    except ValueError:
+        logger.warning(f"Ignoring invalid DB_QUERY_BUDGETS entry: {_item!r}")
+
+
+def budget_ms(method_name, timeout_ms=None):
+    """timeout_ms truyền vào (nếu có) hoặc budget mặc định của method; 0 -> None (không giới hạn)"""
+    value = QUERY_BUDGETS_MS.get(method_name) if timeout_ms is None else timeout_ms
+    return value or None
+
+
+# ============================================================
+# SHARED SQL - dùng chung cho sync và async dashboard
+# ============================================================
+
+GRADE_DISTRIBUTION_SQL = """
+    SELECT 
+        CASE
+            WHEN Grade < 5 THEN '0 - 5'
+            WHEN Grade < 7 THEN '5 - 7'
+            WHEN Grade < 8.5 THEN '7 - 8.5'
+            ELSE '8.5 - 10'
+        END AS GradeRange,
+        COUNT(*) AS Count
+    FROM enrollments
+    WHERE Grade IS NOT NULL
+    GROUP BY GradeRange
+    ORDER BY GradeRange
+"""
+
+TOP_STUDENTS_SQL = """
+    SELECT 
+        s.StudentID,
+        s.FirstName,
+        s.LastName,
+        ROUND(AVG(e.Grade), 2) AS AvgGrade,
+        COUNT(*) AS TotalClasses,
+        MIN(e.Grade) AS MinGrade,
+        MAX(e.Grade) AS MaxGrade
+    FROM students s
+    JOIN enrollments e ON s.StudentID = e.StudentID
+    WHERE e.Grade IS NOT NULL
+    GROUP BY s.StudentID
+    HAVING COUNT(*) >= %s
+    ORDER BY AvgGrade DESC
+    LIMIT %s
+"""
+
+# Mỗi KPI là 1 query độc lập -> có thể chạy song song bằng asyncio.gather (async dashboard)
+KPI_QUERIES = {
+    'total_students': "SELECT COUNT(*) AS value FROM students",
+    'total_subjects': "SELECT COUNT(*) AS value FROM subjects",
+    'total_classes': "SELECT COUNT(*) AS value FROM classes",
+    'total_enrollments': "SELECT COUNT(*) AS value FROM enrollments",
+    'avg_grade': "SELECT ROUND(AVG(Grade), 2) AS value FROM enrollments WHERE Grade IS NOT NULL",
+    'pass_rate': """
+        SELECT ROUND(100.0 * COUNT(CASE WHEN Grade >= 5 THEN 1 END) / COUNT(*), 2) AS value
+        FROM enrollments WHERE Grade IS NOT NULL
+    """,
+}
+
+# Tất cả KPIs trong 1 row (sync dashboard: get_dashboard_kpis / get_dashboard_data),
+# ghép từ KPI_QUERIES -> sync và async luôn tính cùng 1 công thức
+DASHBOARD_KPIS_SQL = "SELECT\n" + ",\n".join(
+    f"    ({' '.join(sql.split())}) AS {name}" for name, sql in KPI_QUERIES.items()
+)
+
+
 class QueryModels:
     """
     Class chứa các query phức tạp theo yêu cầu
@@ -32,7 +119,8 @@ class QueryModels:
     # ============================================================
     
     @staticmethod
-    def query_student_grades_by_subject(subject_code: Optional[str] = None) -> List[Dict]:
+    def query_student_grades_by_subject(subject_code: Optional[str] = None,
+                                        timeout_ms: Optional[int] = None, cancel=None) -> List[Dict]:
         """
         INNER JOIN query: Student name, subject, and grade
         
@@ -43,6 +131,8 @@ class QueryModels:
         
         Args:
             subject_code: Optional subject code để filter
+            timeout_ms: Override QUERY_BUDGETS_MS (0 = không giới hạn)
+            cancel: CancelHandle (query_cancel.py) để cancel từ GUI
         
         Returns:
             List of dicts với columns:
@@ -79,8 +169,9 @@ class QueryModels:
         
         sql += " ORDER BY sub.SubjectName, s.LastName, s.FirstName"
         
-        results = db.execute_query(sql, params)
-        logger.info(f"Query 1 (INNER JOIN) returned {len(results)} rows")
+        results = db.execute_query(sql, params, cancel=cancel,
+                                   timeout_ms=budget_ms('query_student_grades_by_subject', timeout_ms))
+        logger.info(f"Query 1 (INNER JOIN) returned {len(results or [])} rows")
         return results
     
     @staticmethod
@@ -93,28 +184,46 @@ class QueryModels:
         - 8.5–10
         """
 
+        return db.execute_query(GRADE_DISTRIBUTION_SQL)
+    
+    @staticmethod
+    def get_grade_distribution_columnar():
+        """
+        get_grade_distribution() dạng columnar (cho chart, không loop Python)
+        
+        Returns:
+            dict: GradeRange (object array), Count (int64 array)
+        """
+        return db.execute_columnar(GRADE_DISTRIBUTION_SQL)
+    
+    @staticmethod
+    def get_grade_columns(subject_code: Optional[str] = None):
+        """
+        Điểm của từng enrollment dạng columnar, cho aggregation vectorized
+        (vd: columnar.grade_histogram(cols['Grade']), cols['Grade'].mean())
+        
+        Args:
+            subject_code: Lọc theo môn (None = tất cả)
+        
+        Returns:
+            dict: StudentID, ClassID (int64), Year (int64), Grade (MaskedArray float64, NULL bị mask)
+        """
         sql = """
-            SELECT 
-                CASE
-                    WHEN Grade < 5 THEN '0 - 5'
-                    WHEN Grade < 7 THEN '5 - 7'
-                    WHEN Grade < 8.5 THEN '7 - 8.5'
-                    ELSE '8.5 - 10'
-                END AS GradeRange,
-                COUNT(*) AS Count
-            FROM enrollments
-            WHERE Grade IS NOT NULL
-            GROUP BY GradeRange
-            ORDER BY GradeRange
+            SELECT e.StudentID, e.ClassID, c.Year, e.Grade
+            FROM enrollments e
+            INNER JOIN classes c ON e.ClassID = c.ClassID
         """
-
-        return db.execute_query(sql)
+        params = ()
+        if subject_code:
+            sql += " WHERE c.SubjectCode = %s"
+            params = (subject_code,)
+        return db.execute_columnar(sql, params, dtypes={'Grade': 'f8'})
     # ============================================================
     # QUERY 2: LEFT JOIN - All students with/without grades
     # ============================================================
     
     @staticmethod
-    def query_all_students_with_grades() -> List[Dict]:
+    def query_all_students_with_grades(timeout_ms: Optional[int] = None, cancel=None) -> List[Dict]:
         """
         LEFT JOIN query: List all students including those without grades
         
@@ -123,6 +232,10 @@ class QueryModels:
         - Students chưa enroll sẽ có NULL cho class/grade fields
         - Useful để identify students chưa đăng ký môn nào
         
+        Args:
+            timeout_ms: Override QUERY_BUDGETS_MS (0 = không giới hạn)
+            cancel: CancelHandle (query_cancel.py) để cancel từ GUI
+        
         Returns:
             List of dicts với columns:
             - StudentID, FirstName, LastName
@@ -154,8 +267,9 @@ class QueryModels:
             ORDER BY s.StudentID, c.Year DESC, c.Semester
         """
         
-        results = db.execute_query(sql)
-        logger.info(f"Query 2 (LEFT JOIN) returned {len(results)} rows")
+        results = db.execute_query(sql, cancel=cancel,
+                                   timeout_ms=budget_ms('query_all_students_with_grades', timeout_ms))
+        logger.info(f"Query 2 (LEFT JOIN) returned {len(results or [])} rows")
         return results
     
     # ============================================================
@@ -168,7 +282,10 @@ class QueryModels:
         subject_code: Optional[str] = None,
         lecturer_id: Optional[int] = None,
         semester: Optional[str] = None,
-        year: Optional[int] = None
+        year: Optional[int] = None,
+        row_format: str = 'dict',
+        timeout_ms: Optional[int] = None,
+        cancel=None
     ) -> List[Dict]:
         """
         Multi-table JOIN: Complete enrollment information
@@ -184,6 +301,10 @@ class QueryModels:
             lecturer_id: Filter by lecturer
             semester: Filter by semester
             year: Filter by year
+            row_format: 'dict' hoặc format gọn hơn ('tuple', 'namedtuple', 'record')
+                        cho bảng lớn (xem row_formats.py)
+            timeout_ms: Override QUERY_BUDGETS_MS (0 = không giới hạn)
+            cancel: CancelHandle (query_cancel.py) để cancel từ GUI
         
         Returns:
             List of dicts với columns:
@@ -198,6 +319,40 @@ class QueryModels:
         - Filter by multiple criteria
         - Academic records
         """
+        sql, params = QueryModels._build_complete_enrollment_query(
+            student_id, subject_code, lecturer_id, semester, year
+        )
+        results = db.execute_query(sql, params, row_format=row_format, cancel=cancel,
+                                   timeout_ms=budget_ms('query_complete_enrollment_info', timeout_ms))
+        logger.info(f"Query 3 (Multi-table JOIN) returned {len(results or [])} rows")
+        return results
+    
+    @staticmethod
+    def stream_complete_enrollment_info(
+        student_id: Optional[int] = None,
+        subject_code: Optional[str] = None,
+        lecturer_id: Optional[int] = None,
+        semester: Optional[str] = None,
+        year: Optional[int] = None,
+        batch_size: int = 1000
+    ) -> Iterator[Dict]:
+        """
+        Streaming version của query_complete_enrollment_info()
+        
+        GIẢI THÍCH:
+        - Cùng SQL và filters, nhưng dùng db.stream_query() thay vì fetchall()
+        - Memory cố định dù bảng enrollments có hàng triệu rows
+        
+        USE CASE: CSV export, transcript generation, analytics
+        """
+        sql, params = QueryModels._build_complete_enrollment_query(
+            student_id, subject_code, lecturer_id, semester, year
+        )
+        return db.stream_query(sql, params, batch_size=batch_size)
+    
+    @staticmethod
+    def _build_complete_enrollment_query(student_id, subject_code, lecturer_id, semester, year):
+        """Build SQL + params cho Query 3 (dùng chung cho list và stream)"""
         sql = """
             SELECT 
                 -- Student info
@@ -266,16 +421,15 @@ class QueryModels:
         
         sql += " ORDER BY c.Year DESC, c.Semester, sub.SubjectName, s.LastName"
         
-        results = db.execute_query(sql, tuple(params))
-        logger.info(f"Query 3 (Multi-table JOIN) returned {len(results)} rows")
-        return results
+        return sql, tuple(params)
     
     # ============================================================
     # QUERY 4: Above Global Average
     # ============================================================
     
     @staticmethod
-    def query_students_above_average(min_classes: int = 3) -> List[Dict]:
+    def query_students_above_average(min_classes: int = 3, timeout_ms: Optional[int] = None,
+                                     cancel=None) -> List[Dict]:
         """
         Complex query: Students với average grade > global average
         
@@ -292,6 +446,8 @@ class QueryModels:
         
         Args:
             min_classes: Minimum số classes để qualify (default: 3)
+            timeout_ms: Override QUERY_BUDGETS_MS (0 = không giới hạn)
+            cancel: CancelHandle (query_cancel.py) để cancel từ GUI
         
         Returns:
             List of dicts với columns:
@@ -332,8 +488,9 @@ class QueryModels:
             ORDER BY StudentAvg DESC, TotalClasses DESC
         """
         
-        results = db.execute_query(sql, (min_classes,))
-        logger.info(f"Query 4 (Above Average) returned {len(results)} rows")
+        results = db.execute_query(sql, (min_classes,), cancel=cancel,
+                                   timeout_ms=budget_ms('query_students_above_average', timeout_ms))
+        logger.info(f"Query 4 (Above Average) returned {len(results or [])} rows")
         return results
     
     # ============================================================
@@ -360,26 +517,8 @@ class QueryModels:
         
         USE CASE: Dashboard KPI, leaderboard
         """
-        sql = """
-            SELECT 
-                s.StudentID,
-                s.FirstName,
-                s.LastName,
-                ROUND(AVG(e.Grade), 2) AS AvgGrade,
-                COUNT(*) AS TotalClasses,
-                MIN(e.Grade) AS MinGrade,
-                MAX(e.Grade) AS MaxGrade
-            FROM students s
-            JOIN enrollments e ON s.StudentID = e.StudentID
-            WHERE e.Grade IS NOT NULL
-            GROUP BY s.StudentID
-            HAVING COUNT(*) >= %s
-            ORDER BY AvgGrade DESC
-            LIMIT %s
-        """
-        
         # db.execute_query sẽ thực thi SQL và thay thế %s bằng các tham số
-        return db.execute_query(sql, (min_classes, limit))
+        return db.execute_query(TOP_STUDENTS_SQL, (min_classes, limit))
     
     @staticmethod
     def query_grade_distribution() -> List[Dict]:
@@ -418,7 +557,7 @@ class QueryModels:
         return db.execute_query(sql)
     
     @staticmethod
-    def query_subject_performance() -> List[Dict]:
+    def query_subject_performance(timeout_ms: Optional[int] = None, cancel=None) -> List[Dict]:
         """
         Get average grade per subject
         
@@ -443,10 +582,11 @@ class QueryModels:
             ORDER BY AvgGrade DESC
         """
         
-        return db.execute_query(sql)
+        return db.execute_query(sql, cancel=cancel,
+                                timeout_ms=budget_ms('query_subject_performance', timeout_ms))
     
     @staticmethod
-    def query_lecturer_performance() -> List[Dict]:
+    def query_lecturer_performance(timeout_ms: Optional[int] = None, cancel=None) -> List[Dict]:
         """
         Get lecturer teaching stats
         
@@ -469,7 +609,8 @@ class QueryModels:
             ORDER BY AvgGrade DESC
         """
         
-        return db.execute_query(sql)
+        return db.execute_query(sql, cancel=cancel,
+                                timeout_ms=budget_ms('query_lecturer_performance', timeout_ms))
     
     # ============================================================
     # DASHBOARD KPI QUERIES
@@ -489,22 +630,69 @@ class QueryModels:
             - avg_grade
             - pass_rate
         """
-        sql = """
-            SELECT 
-                (SELECT COUNT(*) FROM students) AS total_students,
-                (SELECT COUNT(*) FROM subjects) AS total_subjects,
-                (SELECT COUNT(*) FROM classes) AS total_classes,
-                (SELECT COUNT(*) FROM enrollments) AS total_enrollments,
-                (SELECT ROUND(AVG(Grade), 2) FROM enrollments WHERE Grade IS NOT NULL) AS avg_grade,
-                (SELECT ROUND(
-                    100.0 * COUNT(CASE WHEN Grade >= 5 THEN 1 END) / COUNT(*), 
-                    2
-                ) FROM enrollments WHERE Grade IS NOT NULL) AS pass_rate
-        """
-        
-        result = db.execute_query(sql, fetch_one=True)
+        result = db.execute_query(DASHBOARD_KPIS_SQL, fetch_one=True, cache=True)
         logger.info("Dashboard KPIs fetched")
         return result if result else {}
+    
+    @staticmethod
+    def get_dashboard_data(top_limit: int = 10, cache: bool = True) -> Dict:
+        """
+        KPIs + grade distribution + top students trong 1 db.execute_batch
+        (MySQL: 1 checkout, 1 round trip, 1 commit thay vì 3)
+        
+        Returns:
+            Dict với keys: kpis (dict), grade_distribution, top_students (list of dicts)
+        """
+        kpi_rows, distribution, top_students = db.execute_batch([
+            (DASHBOARD_KPIS_SQL, None),
+            (GRADE_DISTRIBUTION_SQL, None),
+            (TOP_STUDENTS_SQL, (1, top_limit)),
+        ], cache=cache)
+        logger.info("Dashboard data fetched (batched)")
+        return {
+            'kpis': kpi_rows[0] if kpi_rows else {},
+            'grade_distribution': distribution,
+            'top_students': top_students,
+        }
+
+    @staticmethod
+    async def get_dashboard_data_async(top_limit: int = 10) -> Dict:
+        """
+        Async version của dashboard load: chạy 6 KPI queries, grade distribution
+        và top students đồng thời qua async_db
+
+        GIẢI THÍCH:
+        - Sync path chạy tuần tự nên latency = tổng các query
+        - asyncio.gather trên async pool -> latency ~ query chậm nhất
+
+        Returns:
+            Dict với keys: kpis, grade_distribution, top_students
+
+        Raises:
+            RuntimeError: DB_BACKEND không phải mysql (dùng get_dashboard_data)
+        """
+        import asyncio
+        from async_db_connection import async_db
+
+        await async_db._initialize_pool()  # Fail 1 lần trước khi gather 8 queries
+        kpi_names = list(KPI_QUERIES)
+        results = await asyncio.gather(
+            *(async_db.fetch_one(KPI_QUERIES[name]) for name in kpi_names),
+            async_db.fetch_all(GRADE_DISTRIBUTION_SQL),
+            async_db.fetch_all(TOP_STUDENTS_SQL, (1, top_limit)),
+        )
+
+        kpi_rows = results[:len(kpi_names)]
+        kpis = {
+            name: (row['value'] if row else None)
+            for name, row in zip(kpi_names, kpi_rows)
+        }
+        logger.info("Dashboard data fetched (async)")
+        return {
+            'kpis': kpis,
+            'grade_distribution': results[-2] or [],
+            'top_students': results[-1] or [],
+        }
 
 
 # ============================================================
@@ -541,6 +729,40 @@ def export_query_to_csv(data: List[Dict], filename: str) -> bool:
         return False
 
 
+def export_stream_to_csv(rows: Iterable[Dict], filename: str) -> int:
+    """
+    Export rows từ iterator (vd: db.stream_query) ra CSV với memory cố định
+    
+    Args:
+        rows: Iterable of dicts
+        filename: Output filename
+    
+    Returns:
+        Số rows đã ghi (0 nếu không có data hoặc lỗi)
+    """
+    import csv
+    
+    count = 0
+    try:
+        with open(filename, 'w', newline='', encoding='utf-8') as f:
+            writer = None
+            for row in rows:
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=row.keys())
+                    writer.writeheader()
+                writer.writerow(row)
+                count += 1
+        
+        if count == 0:
+            logger.warning("No data to export")
+        else:
+            logger.info(f"Exported {count} rows to {filename}")
+        return count
+    except Exception as e:
+        logger.error(f"Export failed: {e}")
+        return 0
+
+
 # ============================================================
 # TESTING
 # ============================================================
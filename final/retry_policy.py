@@ -0,0 +1,209 @@
+# retry_policy.py - Retry deadlocks / lock wait timeouts
+"""
+GIẢI THÍCH:
+- Sửa điểm đồng thời (EnrollmentModel.update) và xóa lớp (ClassModel.delete, cascade
+  sang enrollments) có thể gặp:
+  + 1213 ER_LOCK_DEADLOCK: InnoDB chọn 1 transaction làm victim và rollback toàn bộ
+  + 1205 ER_LOCK_WAIT_TIMEOUT: chờ lock quá innodb_lock_wait_timeout
+- Cả hai đều "thử lại là được": transaction bị rollback, chưa có gì được commit
+- RetryPolicy:
+  + Phân loại lỗi retryable theo errno
+  + Exponential backoff với full jitter (tránh 2 thread retry cùng nhịp rồi lại deadlock)
+  + Giới hạn số lần thử, counters theo loại lỗi
+- DatabaseConnection dùng policy cho các statement đơn lẻ (execute_query/update/insert,
+  execute_batched all-or-nothing) và cho block db.run_in_transaction(func)
+- KHÔNG retry từng statement bên trong db.transaction(): deadlock đã rollback cả
+  transaction, chạy lại 1 statement sẽ mất các statement trước -> retry cả block
+
+Deadlock test (2 threads update 2 rows theo thứ tự ngược nhau):
+    python retry_policy.py --deadlock-test            # SQLite in-memory
+    DB_BACKEND=mysql python retry_policy.py --deadlock-test
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+
+from mysql.connector import Error
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_ERRNOS = {
+    1213: 'deadlock',
+    1205: 'lock_wait_timeout',
+}
+
+# Cấu hình mặc định (override bằng environment variables)
+RETRY_CONFIG = {
+    'max_attempts': int(os.getenv('DB_RETRY_ATTEMPTS', '4')),
+    'base_delay': float(os.getenv('DB_RETRY_BASE_DELAY', '0.05')),
+    'max_delay': float(os.getenv('DB_RETRY_MAX_DELAY', '1.0')),
+}
+
+
+class RetryPolicy:
+    """
+    Exponential backoff + full jitter cho lỗi lock (1213/1205)
+
+    Args:
+        max_attempts: Tổng số lần chạy (kể cả lần đầu), 1 = không retry
+        base_delay: Delay trần của lần retry đầu (giây), nhân đôi mỗi lần
+        max_delay: Delay trần tối đa (giây)
+        retryable_errnos: dict errno -> tên (dùng làm key cho counters)
+    """
+
+    def __init__(self, max_attempts=4, base_delay=0.05, max_delay=1.0, retryable_errnos=None):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be >= 1")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retryable_errnos = dict(retryable_errnos or RETRYABLE_ERRNOS)
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.retries = {name: 0 for name in self.retryable_errnos.values()}
+        self.recovered = 0   # Thành công sau >= 1 lần retry
+        self.exhausted = 0   # Hết số lần thử, lỗi được raise cho caller
+
+    def classify(self, exc):
+        """Tên loại lỗi retryable, hoặc None"""
+        if not isinstance(exc, Error):
+            return None
+        return self.retryable_errnos.get(getattr(exc, 'errno', None))
+
+    def backoff(self, attempt):
+        """Delay trước lần thử thứ attempt + 1 (full jitter: uniform(0, cap))"""
+        cap = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, cap)
+
+    def run(self, func, *args, **kwargs):
+        """
+        Gọi func(*args, **kwargs), retry khi gặp lỗi retryable
+
+        Raises:
+            Lỗi cuối cùng nếu hết max_attempts, hoặc ngay lập tức nếu lỗi không retryable
+        """
+        with self._lock:
+            self.calls += 1
+        attempt = 1
+        while True:
+            try:
+                result = func(*args, **kwargs)
+            except Error as e:
+                kind = self.classify(e)
+                if kind is None:
+                    raise
+                if attempt >= self.max_attempts:
+                    with self._lock:
+                        self.exhausted += 1
+                    logger.error(f"Giving up after {attempt} attempts ({kind}): {e}")
+                    raise
+                delay = self.backoff(attempt)
+                with self._lock:
+                    self.retries[kind] += 1
+                logger.warning(f"{kind} (attempt {attempt}/{self.max_attempts}), retrying in {delay * 1000:.0f} ms")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            if attempt > 1:
+                with self._lock:
+                    self.recovered += 1
+            return result
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'max_attempts': self.max_attempts,
+                'calls': self.calls,
+                'retries': dict(self.retries),
+                'recovered': self.recovered,
+                'exhausted': self.exhausted,
+            }
+
+
+# ============================================================
+# DEADLOCK TEST
+# ============================================================
+
+def deadlock_test(rounds=20, barrier_timeout=1.0):
+    """
+    2 threads, mỗi round cùng update 2 rows theo thứ tự ngược nhau trong 1 transaction
+    (A: row 1 rồi row 2, B: row 2 rồi row 1) -> ép deadlock/lock conflict ở lần thử đầu
+
+    Kiểm tra:
+    - Mọi transaction đều thành công nhờ retry (không exception nào lọt ra)
+    - Mỗi row được cộng đúng 2 * rounds (không mất / không lặp update)
+    - Có ít nhất 1 lần retry được ghi nhận
+    """
+    from db_connection import db
+
+    db.execute_update("DROP TABLE IF EXISTS retry_demo")
+    db.execute_update("CREATE TABLE retry_demo (id INT PRIMARY KEY, value INT NOT NULL)")
+    db.execute_many("INSERT INTO retry_demo (id, value) VALUES (%s, %s)", [(1, 0), (2, 0)])
+    before = db.retry_stats()
+
+    failures = []
+
+    def transfer(order, barrier, state):
+        first_attempt, state['first_attempt'] = state['first_attempt'], False
+        try:
+            with db.get_cursor(dictionary=False) as cursor:
+                cursor.execute("UPDATE retry_demo SET value = value + 1 WHERE id = %s", (order[0],))
+                if first_attempt:
+                    # Lần đầu: chờ thread kia giữ lock row còn lại -> chắc chắn xung đột
+                    try:
+                        barrier.wait(barrier_timeout)
+                    except threading.BrokenBarrierError:
+                        pass
+                cursor.execute("UPDATE retry_demo SET value = value + 1 WHERE id = %s", (order[1],))
+        except Error:
+            # Bị chọn làm victim (hoặc lock ngay từ đầu với SQLite) -> không bắt thread kia chờ
+            barrier.abort()
+            raise
+
+    def worker(order, barrier):
+        try:
+            db.run_in_transaction(transfer, order, barrier, {'first_attempt': True})
+        except Error as e:
+            failures.append(e)
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        barrier = threading.Barrier(2)
+        threads = [
+            threading.Thread(target=worker, args=((1, 2), barrier)),
+            threading.Thread(target=worker, args=((2, 1), barrier)),
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    elapsed = time.perf_counter() - started
+
+    values = {row['id']: row['value'] for row in db.execute_query(
+        "SELECT id, value FROM retry_demo", use_primary=True
+    )}
+    after = db.retry_stats()
+    db.execute_update("DROP TABLE retry_demo")
+
+    retried = sum(after['retries'].values()) - sum(before['retries'].values())
+    assert not failures, f"{len(failures)} transactions failed: {failures[0]}"
+    assert values == {1: 2 * rounds, 2: 2 * rounds}, f"Lost/duplicated updates: {values}"
+    assert retried > 0, "No conflict was provoked"
+
+    print(f"✓ {2 * rounds} conflicting transactions committed in {elapsed:.2f}s, "
+          f"{retried} retries, stats={after}")
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if "--deadlock-test" in sys.argv:
+        os.environ.setdefault('DB_BACKEND', 'sqlite')
+        deadlock_test()
+    else:
+        print("Usage: python retry_policy.py --deadlock-test")
@@ -0,0 +1,166 @@
+# row_formats.py - Compact row formats cho execute_query
+"""
+GIẢI THÍCH:
+- cursor(dictionary=True) tạo 1 dict mới cho mỗi row (hash table + keys lặp lại)
+  -> tốn RAM nhất khi load cả bảng enrollments join
+- Các format gọn hơn, đều build từ tuple rows của cursor thường:
+  + 'tuple'      : tuple thuần, tên cột nằm ở ResultRows.columns
+  + 'namedtuple' : namedtuple (truy cập row.Grade hoặc row[6])
+  + 'record'     : class sinh tự động với __slots__ (row.Grade), không có __dict__
+  + 'dict'       : như cũ (mặc định)
+- Class namedtuple/record được cache theo "shape" (tuple tên cột)
+
+Đo memory mỗi row:
+    python row_formats.py
+"""
+
+import keyword
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+ROW_FORMATS = ('dict', 'tuple', 'namedtuple', 'record')
+
+
+class ResultRows(list):
+    """List of rows + tên cột (header) cho các format không phải dict"""
+
+    def __init__(self, rows=(), columns=()):
+        super().__init__(rows)
+        self.columns = tuple(columns)
+
+    def copy(self):
+        return ResultRows(self, self.columns)
+
+
+class RecordBase:
+    """Base cho record classes sinh tự động (__slots__, không có __dict__, read-only)"""
+
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Record rows are read-only")
+
+    def __getitem__(self, index):
+        if isinstance(index, str):
+            return getattr(self, index)
+        return getattr(self, self.__slots__[index])
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and tuple(self) == tuple(other)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+    def _asdict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _field_names(columns):
+    """Tên cột -> identifier hợp lệ, không trùng (vd: 'COUNT(*)' -> 'COUNT___')"""
+    names = []
+    seen = set()
+    for idx, column in enumerate(columns):
+        name = re.sub(r'\W', '_', str(column))
+        if not name or name[0].isdigit() or keyword.iskeyword(name) or name.startswith('_'):
+            name = f"f{idx}_{name}".rstrip('_')
+        while name in seen:
+            name += '_'
+        seen.add(name)
+        names.append(name)
+    return tuple(names)
+
+
+@lru_cache(maxsize=256)
+def namedtuple_class(columns):
+    return namedtuple('Row', _field_names(columns))
+
+
+@lru_cache(maxsize=256)
+def record_class(columns):
+    return type('Record', (RecordBase,), {'__slots__': _field_names(columns)})
+
+
+def row_converter(columns, row_format):
+    """Hàm chuyển 1 tuple row sang row_format (None = giữ nguyên tuple)"""
+    if row_format == 'dict':
+        return lambda row: dict(zip(columns, row))
+    if row_format == 'tuple':
+        return None
+    if row_format == 'namedtuple':
+        return namedtuple_class(columns)._make
+    if row_format == 'record':
+        cls = record_class(columns)
+        return lambda row: cls(*row)
+    raise ValueError(f"Unknown row_format '{row_format}', expected one of {ROW_FORMATS}")
+
+
+def convert_row(row, columns, row_format):
+    if row is None:
+        return None
+    convert = row_converter(tuple(columns), row_format)
+    return convert(row) if convert else tuple(row)
+
+
+def convert_rows(rows, columns, row_format):
+    """tuple rows -> list theo row_format ('dict' trả list thường, còn lại ResultRows)"""
+    columns = tuple(columns)
+    convert = row_converter(columns, row_format)
+    if row_format == 'dict':
+        return [convert(row) for row in rows]
+    converted = [convert(row) for row in rows] if convert else [tuple(row) for row in rows]
+    return ResultRows(converted, columns)
+
+
+def measure_memory_per_row(n=20000):
+    """
+    Đo bytes/row cho từng format với rows giống Query 3 (enrollment join, 21 cột)
+
+    Returns:
+        dict: row_format -> bytes per row
+    """
+    import tracemalloc
+    from decimal import Decimal
+
+    columns = (
+        'StudentID', 'StudentFirstName', 'StudentLastName', 'StudentEmail', 'Major',
+        'SubjectCode', 'SubjectName', 'Credits', 'ClassID', 'ClassName', 'Semester', 'Year',
+        'LecturerID', 'LecturerFirstName', 'LecturerLastName', 'LecturerName', 'Office',
+        'Grade', 'GradeLetter', 'Note', 'TotalEnrollments',
+    )
+    # Rows thô (list, chia sẻ giá trị) -> chỉ đo phần container mỗi format tạo ra
+    raw = [
+        [i, 'Van', 'Nguyen', f's{i}@neu.edu.vn', 'CS', 'CS101', 'Intro CS', 3, i % 50,
+         'CS101-01', 'HK1', 2024, 1, 'Tran', 'Hung', 'Tran Hung', 'A1', Decimal('8.50'),
+         'B', None, 4]
+        for i in range(n)
+    ]
+
+    results = {}
+    for row_format in ROW_FORMATS:
+        convert_rows(raw[:1], columns, row_format)  # Warm class cache
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        rows = convert_rows(raw, columns, row_format)
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+        results[row_format] = round(allocated / n, 1)
+        del rows
+    return results
+
+
+if __name__ == "__main__":
+    for fmt, size in measure_memory_per_row().items():
+        print(f"{fmt:>10}: {size} bytes/row")
@@ -0,0 +1,221 @@
+# search_index.py - Full-text (n-gram) index cho StudentModel.search
+"""
+GIẢI THÍCH:
+- StudentModel.search cũ: FirstName LIKE '%kw%' OR LastName LIKE ... OR Email LIKE ...
+  -> wildcard ở đầu nên không dùng được B-tree index, full scan students mỗi lần gõ phím
+- Index full-text trên (FirstName, LastName, Email):
+  + MySQL: FULLTEXT ... WITH PARSER ngram (ngram_token_size = 2 mặc định)
+    -> tách chuỗi thành bigrams, không cần khoảng trắng/từ điển, dùng được cho tên
+       tiếng Việt có dấu; query dạng phrase "kw" trong BOOLEAN MODE = match substring
+    -> tạo index với innodb_ft_enable_stopword = OFF (stopwords như 'an', 'en'
+       sẽ làm mất bigrams của tên)
+  + SQLite: FTS5 trigram (sqlite_backend.SEARCH_INDEX_SQL), giữ đồng bộ bằng triggers
+- Relevance: MATCH ... AGAINST (MySQL) / bm25 (SQLite), xếp giảm dần rồi StudentID
+- Fallback về LIKE khi:
+  + Database chưa có index (chưa chạy migration) - kiểm tra 1 lần mỗi pool
+  + Keyword ngắn hơn 1 token (MySQL < 2 ký tự, SQLite < 3 ký tự)
+  + search() được gọi với fields khác (FirstName, LastName, Email)
+
+Migration cho database đã có (idempotent):
+    python search_index.py migrate
+Benchmark LIKE vs index (students phải trống, vd DB_BACKEND=sqlite):
+    python search_index.py bench --students 100000 1000000
+"""
+
+import logging
+import threading
+
+import db_connection
+from db_connection import db
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ('FirstName', 'LastName', 'Email')
+
+MYSQL_INDEX_NAME = 'ft_students_search'
+MYSQL_MIGRATION_SQL = (
+    f"ALTER TABLE students ADD FULLTEXT INDEX {MYSQL_INDEX_NAME} "
+    f"(FirstName, LastName, Email) WITH PARSER ngram"
+)
+
+# Độ dài keyword tối thiểu để index match được (ngram_token_size / trigram)
+MIN_KEYWORD_LENGTH = {'mysql': 2, 'sqlite': 3}
+
+_MATCH = "MATCH (FirstName, LastName, Email) AGAINST (%s IN BOOLEAN MODE)"
+
+_state_lock = threading.Lock()
+_index_state = {}  # id(pool) -> bool (pool mới sau use_backend -> kiểm tra lại)
+
+
+def has_search_index():
+    """Database hiện tại có full-text index chưa (cache theo pool)"""
+    db._ensure_pool()
+    key = id(db._pool)
+    available = _index_state.get(key)
+    if available is None:
+        available = _detect_index()
+        if available is None:
+            return False  # Lỗi tạm thời -> LIKE lần này, không cache (kiểm tra lại lần sau)
+        with _state_lock:
+            _index_state[key] = available
+    return available
+
+
+def _detect_index():
+    """True / False, hoặc None nếu không kiểm tra được (execute_query lỗi trả về None)"""
+    try:
+        if db_connection.DB_BACKEND == 'sqlite':
+            row = db.execute_query(
+                "SELECT COUNT(*) AS n FROM sqlite_master WHERE type = 'table' AND name = 'students_fts'",
+                fetch_one=True
+            )
+        else:
+            row = db.execute_query(
+                "SELECT COUNT(*) AS n FROM information_schema.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'students' AND INDEX_NAME = %s",
+                (MYSQL_INDEX_NAME,), fetch_one=True
+            )
+    except Exception as e:
+        logger.warning(f"Cannot check full-text index, search uses LIKE: {e}")
+        return None
+    if row is None:
+        logger.warning("Cannot check full-text index, search uses LIKE")
+        return None
+    if not row['n']:
+        logger.info("Full-text index missing, search uses LIKE (run: python search_index.py migrate)")
+    return bool(row['n'])
+
+
+def search_query(keyword):
+    """
+    SQL dùng full-text index cho keyword
+
+    Returns:
+        (sql, params), hoặc None nếu phải dùng LIKE (không có index / keyword quá ngắn)
+    """
+    keyword = keyword.strip().replace('"', ' ')
+    if len(keyword) < MIN_KEYWORD_LENGTH.get(db_connection.DB_BACKEND, 2) or not has_search_index():
+        return None
+    phrase = f'"{keyword}"'
+    if db_connection.DB_BACKEND == 'sqlite':
+        sql = """
+            SELECT s.*, -bm25(students_fts) AS Relevance
+            FROM students_fts
+            JOIN students s ON s.StudentID = students_fts.rowid
+            WHERE students_fts MATCH %s
+            ORDER BY Relevance DESC, s.StudentID
+        """
+        return sql, (phrase,)
+    sql = f"""
+        SELECT *, {_MATCH} AS Relevance
+        FROM students
+        WHERE {_MATCH}
+        ORDER BY Relevance DESC, StudentID
+    """
+    return sql, (phrase, phrase)
+
+
+def migrate():
+    """
+    Tạo full-text index nếu chưa có (build từ dữ liệu hiện có)
+
+    Returns:
+        bool: True nếu vừa tạo, False nếu đã có
+    """
+    if has_search_index():
+        return False
+    if db_connection.DB_BACKEND == 'sqlite':
+        from sqlite_backend import create_search_index
+
+        with db.get_connection() as conn:
+            created = create_search_index(conn)
+    else:
+        with db.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                # Chỉ tắt stopwords trong lúc build index; connection trả về pool phải
+                # giữ nguyên session mặc định
+                cursor.execute("SET SESSION innodb_ft_enable_stopword = OFF")
+                try:
+                    cursor.execute(MYSQL_MIGRATION_SQL)
+                finally:
+                    cursor.execute("SET SESSION innodb_ft_enable_stopword = DEFAULT")
+            finally:
+                cursor.close()
+        created = True
+    with _state_lock:
+        _index_state.clear()
+    logger.info("✓ Full-text search index created")
+    return created
+
+
+# ============================================================
+# BENCHMARK
+# ============================================================
+
+_LAST_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng',
+               'Bùi', 'Đỗ', 'Hồ', 'Ngô', 'Dương', 'Lý']
+_FIRST_NAMES = ['An', 'Bình', 'Châu', 'Dũng', 'Giang', 'Hà', 'Hải', 'Hạnh', 'Hiếu', 'Hoa', 'Hùng',
+                'Khánh', 'Linh', 'Long', 'Minh', 'Nam', 'Ngọc', 'Phúc', 'Quân', 'Sơn', 'Thảo',
+                'Trang', 'Tú', 'Tuấn', 'Vy', 'Yến']
+
+
+def benchmark_search(sizes=(100_000, 1_000_000), keywords=('sv123456', 'Khánh', 'xyzq'), repeat=5):
+    """
+    ms / search: LIKE (full scan) vs full-text index, ở từng số lượng students
+
+    Bảng students phải trống; rows được thêm dần tới từng size
+
+    Returns:
+        dict: "<size> '<keyword>'" -> {'matches', 'like_ms', 'index_ms'}
+    """
+    import time
+
+    from models import StudentModel
+
+    if StudentModel.count():
+        raise RuntimeError("benchmark_search needs an empty students table")
+    migrate()
+
+    def timed(func):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = func()
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return len(rows), round(best, 2)
+
+    results = {}
+    inserted = 0
+    for size in sizes:
+        for start in range(inserted, size, 50_000):
+            db.execute_many(
+                "INSERT INTO students (FirstName, LastName, DOB, Gender, Email, EnrollmentYear) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [(_FIRST_NAMES[i % len(_FIRST_NAMES)], _LAST_NAMES[i * 7 % len(_LAST_NAMES)],
+                  f"{1995 + i % 10}-01-{1 + i % 28:02d}", 'MFO'[i % 3], f"sv{i}@student.edu.vn",
+                  2015 + i % 10) for i in range(start, min(start + 50_000, size))]
+            )
+        inserted = size
+        for keyword in keywords:
+            matches, like_ms = timed(lambda: StudentModel.search_like(keyword))
+            _, index_ms = timed(lambda: StudentModel.search(keyword))
+            results[f"{size} '{keyword}'"] = {'matches': matches, 'like_ms': like_ms, 'index_ms': index_ms}
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Full-text search index for students")
+    parser.add_argument("command", choices=("migrate", "bench"))
+    parser.add_argument("--students", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.command == "migrate":
+        print("Created full-text index" if migrate() else "Full-text index already exists")
+    else:
+        for name, timings in benchmark_search(sizes=args.students).items():
+            print(f"{name:>22}: {timings}")
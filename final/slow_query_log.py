@@ -0,0 +1,238 @@
+# slow_query_log.py - Slow query log (JSONL) với EXPLAIN tự động
+"""
+GIẢI THÍCH:
+- Hiện tại chỉ biết query chậm khi user phàn nàn
+- SlowQueryLog (bật bằng db.enable_slow_query_log() hoặc env DB_SLOW_QUERY_MS):
+  + execute_query / execute_update / execute_insert chạy lâu hơn threshold_ms -> 1 record:
+    sql (gộp whitespace), params fingerprint (hash, không ghi giá trị thật), duration,
+    rows, caller (vd: query_models:QueryModels.query_complete_enrollment_info), error
+  + SELECT: capture plan trên connection riêng
+      MySQL : EXPLAIN FORMAT=JSON
+      SQLite: EXPLAIN QUERY PLAN
+  + EXPLAIN + ghi file chạy trên background thread -> caller không bị chậm thêm;
+    queue đầy thì bỏ record (không bao giờ block query)
+  + File JSONL xoay vòng (RotatingFileHandler): slow_queries.jsonl, .1, .2 ...
+
+Report (xếp hạng statement theo tổng thời gian):
+    python slow_query_log.py report [slow_queries.jsonl] [--top 20]
+"""
+
+import hashlib
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_CONFIG = {
+    'threshold_ms': float(os.getenv('DB_SLOW_QUERY_MS', '0')),  # 0 = tắt
+    'path': os.getenv('DB_SLOW_QUERY_LOG', 'slow_queries.jsonl'),
+    'max_bytes': int(os.getenv('DB_SLOW_QUERY_LOG_MAX_BYTES', str(10 * 1024 * 1024))),
+    'backup_count': int(os.getenv('DB_SLOW_QUERY_LOG_BACKUPS', '5')),
+}
+
+# Frames thuộc data layer -> bỏ qua khi tìm caller
+_INTERNAL_MODULES = {'db_connection', 'retry_policy', 'contextlib', 'slow_query_log', 'batch_writer'}
+
+
+def params_fingerprint(params):
+    """Hash ngắn của params (so sánh được giữa các record, không lộ dữ liệu)"""
+    if not params:
+        return None
+    return hashlib.sha1(repr(tuple(params)).encode('utf-8')).hexdigest()[:12]
+
+
+def find_caller(depth_limit=25):
+    """'module:QualName' của frame đầu tiên ngoài data layer (vd: query_models:QueryModels.query_top_students)"""
+    frame = sys._getframe(1)
+    for _ in range(depth_limit):
+        if frame is None:
+            break
+        module = frame.f_globals.get('__name__', '?')
+        if module not in _INTERNAL_MODULES:
+            code = frame.f_code
+            return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+        frame = frame.f_back
+    return None
+
+
+class SlowQueryLog:
+    """
+    Ghi slow queries ra JSONL xoay vòng, EXPLAIN trên background thread
+
+    Args:
+        explain: callable(query, params) -> plan (dict/list) hoặc None; chạy trên
+            connection riêng (do DatabaseConnection cung cấp)
+        threshold_ms: Ghi lại statement chạy lâu hơn threshold
+        path / max_bytes / backup_count: File log và rotation
+        queue_size: Số record tối đa chờ ghi (đầy -> bỏ record)
+    """
+
+    def __init__(self, explain=None, threshold_ms=500.0, path='slow_queries.jsonl',
+                 max_bytes=10 * 1024 * 1024, backup_count=5, queue_size=256):
+        self.threshold_ms = threshold_ms
+        self.path = path
+        self._explain = explain
+        self._queue = queue.Queue(maxsize=queue_size)
+        self.recorded = 0
+        self.dropped = 0
+
+        self._handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                            encoding='utf-8')
+        self._handler.setFormatter(logging.Formatter('%(message)s'))
+        self._writer = threading.Thread(target=self._run, name="slow-query-log", daemon=True)
+        self._writer.start()
+
+    def observe(self, kind, query, params, duration_ms, rows=None, error=None):
+        """Gọi sau mỗi statement; chỉ làm việc khi duration_ms >= threshold"""
+        if duration_ms < self.threshold_ms:
+            return
+        record = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'kind': kind,
+            'sql': " ".join(query.split()),
+            'params_fingerprint': params_fingerprint(params),
+            'param_count': len(params) if params else 0,
+            'duration_ms': round(duration_ms, 2),
+            'rows': rows,
+            'caller': find_caller(),
+            'error': str(error) if error else None,
+        }
+        try:
+            self._queue.put_nowait((record, query, params))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            record, query, params = item
+            if self._explain is not None and record['kind'] == 'query' and not record['error']:
+                try:
+                    record['plan'] = self._explain(query, params)
+                except Exception as e:
+                    record['plan_error'] = str(e)
+            self._handler.emit(logging.makeLogRecord({'msg': json.dumps(record, default=str)}))
+            self.recorded += 1
+            self._queue.task_done()
+
+    def flush(self, timeout=5.0):
+        """Chờ các record đang xếp hàng được ghi xong"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._writer.join(timeout=5.0)
+        self._handler.close()
+
+    def stats(self):
+        return {
+            'threshold_ms': self.threshold_ms,
+            'path': self.path,
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'pending': self._queue.qsize(),
+        }
+
+
+# ============================================================
+# REPORT
+# ============================================================
+
+def read_records(path):
+    """Đọc file log + các file đã rotate (cũ nhất trước)"""
+    files = [f"{path}.{i}" for i in range(50, 0, -1) if os.path.exists(f"{path}.{i}")]
+    if os.path.exists(path):
+        files.append(path)
+    for name in files:
+        with open(name, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        continue
+
+
+def _plan_flags(plan):
+    """Dấu hiệu plan xấu: full scan / filesort / temporary"""
+    text = json.dumps(plan).lower() if plan else ""
+    flags = []
+    if '"access_type": "all"' in text or '"scan ' in text:
+        flags.append('full-scan')
+    if 'using_filesort": true' in text or 'use temp b-tree' in text:
+        flags.append('filesort')
+    if 'using_temporary_table": true' in text:
+        flags.append('temporary')
+    return flags
+
+
+def build_report(records, top=20):
+    """
+    Gom records theo SQL, xếp theo tổng thời gian giảm dần
+
+    Returns:
+        list of dict: sql, count, total_ms, avg_ms, max_ms, rows_avg, callers, flags
+    """
+    groups = {}
+    for record in records:
+        group = groups.setdefault(record['sql'], {
+            'sql': record['sql'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'rows_total': 0, 'callers': set(), 'flags': set(), 'errors': 0,
+        })
+        group['count'] += 1
+        group['total_ms'] += record['duration_ms']
+        group['max_ms'] = max(group['max_ms'], record['duration_ms'])
+        group['rows_total'] += record.get('rows') or 0
+        if record.get('caller'):
+            group['callers'].add(record['caller'])
+        if record.get('error'):
+            group['errors'] += 1
+        group['flags'].update(_plan_flags(record.get('plan')))
+
+    ranked = sorted(groups.values(), key=lambda g: g['total_ms'], reverse=True)[:top]
+    for group in ranked:
+        group['avg_ms'] = round(group['total_ms'] / group['count'], 2)
+        group['total_ms'] = round(group['total_ms'], 2)
+        group['rows_avg'] = round(group.pop('rows_total') / group['count'], 1)
+        group['callers'] = sorted(group['callers'])
+        group['flags'] = sorted(group['flags'])
+    return ranked
+
+
+def print_report(path, top=20):
+    ranked = build_report(read_records(path), top=top)
+    if not ranked:
+        print(f"No slow queries recorded in {path}")
+        return
+    print(f"{'#':>3} {'total ms':>10} {'count':>6} {'avg ms':>9} {'max ms':>9} {'rows':>8}  statement")
+    for i, group in enumerate(ranked, start=1):
+        print(f"{i:>3} {group['total_ms']:>10.1f} {group['count']:>6} {group['avg_ms']:>9.1f} "
+              f"{group['max_ms']:>9.1f} {group['rows_avg']:>8.1f}  {group['sql'][:90]}")
+        for caller in group['callers']:
+            print(f"{'':>49}<- {caller}")
+        if group['flags']:
+            print(f"{'':>49}plan: {', '.join(group['flags'])}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Slow query log report")
+    parser.add_argument("command", choices=("report",))
+    parser.add_argument("path", nargs="?", default=SLOW_QUERY_CONFIG['path'])
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    print_report(args.path, top=args.top)
@@ -0,0 +1,368 @@
+# sqlite_backend.py - Embedded SQLite backend cho DatabaseConnection
+"""
+GIẢI THÍCH:
+- Model layer (models.py, query_models.py, validators.py) viết cho MySQL
+  -> muốn chạy/benchmark phải có MySQL server + credentials
+- Backend này cho DatabaseConnection chạy trên SQLite (file hoặc :memory:):
+  + Connection/cursor wrapper có cùng interface với mysql.connector
+    (cursor(dictionary=...), fetchmany, rowcount, lastrowid, in_transaction...)
+  + Dịch placeholder %s -> ? (bỏ qua string literals)
+  + CONCAT() đăng ký như SQL function (NULL nếu có tham số NULL, giống MySQL)
+  + Window functions / CTE (QueryModels) chạy native trên SQLite >= 3.25
+  + Lỗi sqlite3 được map sang mysql.connector.errors để error handling giữ nguyên
+  + Bootstrap schema 5 bảng (students, lecturers, subjects, classes, enrollments)
+    + FTS5 trigram index students_fts cho StudentModel.search (nếu SQLite hỗ trợ)
+
+Usage:
+    DB_BACKEND=sqlite DB_SQLITE_PATH=:memory: python models.py
+    # hoặc trong code:
+    db.use_backend('sqlite', path=':memory:')
+"""
+
+import itertools
+import logging
+import sqlite3
+
+from mysql.connector import errors
+
+from connection_pool import ElasticConnectionPool
+
+logger = logging.getLogger(__name__)
+
+MIN_SQLITE_VERSION = (3, 25, 0)  # Window functions
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS students (
+    StudentID INTEGER PRIMARY KEY AUTOINCREMENT,
+    FirstName VARCHAR(100) NOT NULL,
+    LastName VARCHAR(100) NOT NULL,
+    DOB DATE NOT NULL,
+    Gender TEXT NOT NULL CHECK (Gender IN ('M', 'F', 'O')),
+    Address VARCHAR(255),
+    Phone VARCHAR(20),
+    Email VARCHAR(100) UNIQUE,
+    EnrollmentYear INT NOT NULL,
+    Major VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS lecturers (
+    LecturerID INTEGER PRIMARY KEY AUTOINCREMENT,
+    LecturerFirstName VARCHAR(100) NOT NULL,
+    LecturerLastName VARCHAR(100) NOT NULL,
+    LecturerEmail VARCHAR(100) UNIQUE,
+    Office VARCHAR(50)
+);
+
+CREATE TABLE IF NOT EXISTS subjects (
+    SubjectCode VARCHAR(20) PRIMARY KEY,
+    SubjectName VARCHAR(255) NOT NULL,
+    Credits INT NOT NULL CHECK (Credits > 0)
+);
+
+CREATE TABLE IF NOT EXISTS classes (
+    ClassID INTEGER PRIMARY KEY AUTOINCREMENT,
+    SubjectCode VARCHAR(20) NOT NULL
+        REFERENCES subjects(SubjectCode) ON DELETE RESTRICT ON UPDATE CASCADE,
+    LecturerID INT
+        REFERENCES lecturers(LecturerID) ON DELETE SET NULL ON UPDATE CASCADE,
+    ClassName VARCHAR(100),
+    Semester VARCHAR(10) NOT NULL,
+    Year INT NOT NULL,
+    MaxCapacity INT DEFAULT 60
+);
+
+CREATE TABLE IF NOT EXISTS enrollments (
+    StudentID INT NOT NULL
+        REFERENCES students(StudentID) ON DELETE CASCADE ON UPDATE CASCADE,
+    ClassID INT NOT NULL
+        REFERENCES classes(ClassID) ON DELETE CASCADE ON UPDATE CASCADE,
+    Grade DECIMAL(4,2) CHECK (Grade >= 0 AND Grade <= 10),
+    GradeLetter VARCHAR(5),
+    Note VARCHAR(255),
+    PRIMARY KEY (StudentID, ClassID)
+);
+
+CREATE INDEX IF NOT EXISTS idx_students_enrollment_year ON students (EnrollmentYear);
+CREATE INDEX IF NOT EXISTS idx_students_lastname ON students (LastName);
+CREATE INDEX IF NOT EXISTS idx_students_firstname ON students (FirstName);
+CREATE INDEX IF NOT EXISTS idx_students_dob ON students (DOB);
+CREATE INDEX IF NOT EXISTS idx_classes_subjectcode ON classes (SubjectCode);
+CREATE INDEX IF NOT EXISTS idx_enrollments_class ON enrollments (ClassID);
+"""
+
+# Full-text index cho StudentModel.search (tương đương FULLTEXT ngram của MySQL):
+# FTS5 external-content (không copy dữ liệu), tokenizer trigram -> match substring
+# như LIKE '%kw%' (SQLite >= 3.34); triggers giữ index đồng bộ với students
+SEARCH_INDEX_SQL = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+        FirstName, LastName, Email,
+        content='students', content_rowid='StudentID', tokenize='trigram'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_ai AFTER INSERT ON students BEGIN
+        INSERT INTO students_fts (rowid, FirstName, LastName, Email)
+        VALUES (new.StudentID, new.FirstName, new.LastName, new.Email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_ad AFTER DELETE ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, FirstName, LastName, Email)
+        VALUES ('delete', old.StudentID, old.FirstName, old.LastName, old.Email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_au AFTER UPDATE OF FirstName, LastName, Email ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, FirstName, LastName, Email)
+        VALUES ('delete', old.StudentID, old.FirstName, old.LastName, old.Email);
+        INSERT INTO students_fts (rowid, FirstName, LastName, Email)
+        VALUES (new.StudentID, new.FirstName, new.LastName, new.Email);
+    END""",
+    # Build index cho rows đã có (migration trên database cũ)
+    "INSERT INTO students_fts (students_fts) VALUES ('rebuild')",
+)
+
+_memory_ids = itertools.count(1)
+
+
+# ============================================================
+# SQL TRANSLATION
+# ============================================================
+
+def translate_placeholders(query):
+    """Đổi %s -> ? và %% -> %, bỏ qua phần nằm trong string literals"""
+    parts = query.split("'")
+    # Phần index chẵn nằm ngoài quotes
+    for i in range(0, len(parts), 2):
+        parts[i] = parts[i].replace('%s', '?').replace('%%', '%')
+    return "'".join(parts)
+
+
+def _concat(*args):
+    """CONCAT() kiểu MySQL: NULL nếu bất kỳ tham số nào NULL"""
+    if any(arg is None for arg in args):
+        return None
+    return "".join(str(arg) for arg in args)
+
+
+def _map_error(exc):
+    """sqlite3 exception -> mysql.connector.errors tương ứng"""
+    if isinstance(exc, sqlite3.IntegrityError):
+        return errors.IntegrityError(msg=str(exc))
+    if isinstance(exc, sqlite3.OperationalError):
+        # "database is locked" / "database table is locked" ~ lock wait timeout (1205)
+        # -> RetryPolicy xử lý giống MySQL
+        errno = 1205 if 'locked' in str(exc) else None
+        if str(exc) == 'interrupted':
+            errno = 1317  # connection.interrupt() ~ KILL QUERY
+        return errors.OperationalError(msg=str(exc), errno=errno)
+    if isinstance(exc, sqlite3.ProgrammingError):
+        return errors.ProgrammingError(msg=str(exc))
+    return errors.DatabaseError(msg=str(exc))
+
+
+# ============================================================
+# CONNECTION / CURSOR WRAPPERS
+# ============================================================
+
+class SQLiteCursor:
+    """Cursor với interface giống MySQLCursor / MySQLCursorDict"""
+
+    def __init__(self, raw_cursor, dictionary=False):
+        self._cursor = raw_cursor
+        self._dictionary = dictionary
+        self.column_names = ()
+        self.rowcount = -1
+        self.lastrowid = None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query, params=None):
+        try:
+            self._cursor.execute(translate_placeholders(query), tuple(params or ()))
+        except sqlite3.Error as e:
+            raise _map_error(e) from e
+        self._after_execute()
+
+    def executemany(self, query, params_list):
+        try:
+            self._cursor.executemany(translate_placeholders(query), [tuple(p) for p in params_list])
+        except sqlite3.Error as e:
+            raise _map_error(e) from e
+        self._after_execute()
+
+    def _after_execute(self):
+        description = self._cursor.description
+        self.column_names = tuple(col[0] for col in description) if description else ()
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+
+    def _convert(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def fetchone(self):
+        return self._convert(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._convert(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._convert(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Connection với interface đủ dùng cho DatabaseConnection + ElasticConnectionPool"""
+
+    unread_result = False  # sqlite3 không có khái niệm unread result
+
+    def __init__(self, database, uri=False, timeout=5.0):
+        self._cnx = sqlite3.connect(database, uri=uri, timeout=timeout, check_same_thread=False)
+        self._cnx.execute("PRAGMA foreign_keys = ON")
+        self._cnx.create_function("CONCAT", -1, _concat, deterministic=True)
+        self.connection_id = id(self._cnx)
+
+    def cursor(self, dictionary=False, buffered=None, prepared=False, **kwargs):
+        # sqlite3 tự cache compiled statements -> bỏ qua `prepared`
+        return SQLiteCursor(self._cnx.cursor(), dictionary=dictionary)
+
+    @property
+    def in_transaction(self):
+        return self._cnx.in_transaction
+
+    def start_transaction(self):
+        self._cnx.execute("BEGIN")
+
+    def commit(self):
+        self._cnx.commit()
+
+    def rollback(self):
+        self._cnx.rollback()
+
+    def interrupt(self):
+        """Dừng query đang chạy (gọi được từ thread khác)"""
+        self._cnx.interrupt()
+
+    def is_connected(self):
+        try:
+            self._cnx.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def consume_results(self):
+        pass
+
+    def close(self):
+        self._cnx.close()
+
+    def executescript(self, script):
+        self._cnx.executescript(script)
+
+
+# ============================================================
+# BACKEND FACTORY
+# ============================================================
+
+def bootstrap_schema(conn):
+    """Tạo 5 bảng + indexes nếu chưa có"""
+    conn.executescript(SCHEMA_SQL)
+    conn.commit()
+    try:
+        create_search_index(conn)
+    except sqlite3.OperationalError as e:  # SQLite < 3.34 / không có FTS5
+        logger.warning(f"Full-text search index unavailable, search uses LIKE: {e}")
+
+
+def create_search_index(conn):
+    """
+    Tạo students_fts + triggers nếu chưa có, build từ rows hiện có
+
+    Returns:
+        bool: True nếu vừa tạo, False nếu đã có
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'students_fts'")
+    exists = cursor.fetchone() is not None
+    cursor.close()
+    if exists:
+        return False
+    conn.executescript(";\n".join(SEARCH_INDEX_SQL) + ";")
+    conn.commit()
+    return True
+
+
+def create_sqlite_pool(path=":memory:", bootstrap=True, name="student_sqlite_pool", **pool_config):
+    """
+    Tạo pool cho SQLite backend
+
+    - File database: mỗi pooled connection là 1 sqlite3 connection tới file
+    - ":memory:": dùng shared-cache in-memory URI để mọi connection cùng thấy
+      1 database; giữ 1 anchor connection để database không bị xóa khi pool
+      đóng hết connections
+
+    Returns:
+        ElasticConnectionPool
+    """
+    if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        raise RuntimeError(
+            f"SQLite {sqlite3.sqlite_version} is too old (need >= 3.25 for window functions)"
+        )
+
+    if path == ":memory:":
+        database = f"file:student_mem_{next(_memory_ids)}?mode=memory&cache=shared"
+        uri = True
+    else:
+        database, uri = path, False
+
+    anchor = SQLiteConnection(database, uri=uri)
+    if bootstrap:
+        bootstrap_schema(anchor)
+
+    pool = ElasticConnectionPool(lambda: SQLiteConnection(database, uri=uri), name=name, **pool_config)
+    pool.anchor = anchor if uri else None
+    if not uri:
+        anchor.close()
+    logger.info(f"✓ SQLite backend ready ({path})")
+    return pool
+
+
+if __name__ == "__main__":
+    # Chạy toàn bộ model layer trên SQLite in-memory
+    import os
+    import time
+
+    os.environ.setdefault('DB_BACKEND', 'sqlite')
+
+    from db_connection import db
+    from query_models import QueryModels
+
+    started = time.perf_counter()
+    db.execute_update("INSERT INTO subjects VALUES (%s, %s, %s)", ("CS101", "Intro CS", 3))
+    lecturer_id = db.execute_insert(
+        "INSERT INTO lecturers (LecturerFirstName, LecturerLastName) VALUES (%s, %s)", ("Tran", "Hung")
+    )
+    class_id = db.execute_insert(
+        "INSERT INTO classes (SubjectCode, LecturerID, ClassName, Semester, Year) VALUES (%s, %s, %s, %s, %s)",
+        ("CS101", lecturer_id, "CS101-01", "HK1", 2024)
+    )
+    for i in range(50):
+        student_id = db.execute_insert(
+            "INSERT INTO students (FirstName, LastName, DOB, Gender, Email, EnrollmentYear) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            (f"First{i}", f"Last{i}", "2003-01-01", "M", f"s{i}@example.com", 2022)
+        )
+        db.execute_update(
+            "INSERT INTO enrollments (StudentID, ClassID, Grade) VALUES (%s, %s, %s)",
+            (student_id, class_id, i % 11)
+        )
+
+    print(f"KPIs: {QueryModels.get_dashboard_kpis()}")
+    print(f"Q2 rows: {len(QueryModels.query_all_students_with_grades())}")
+    print(f"Q3 rows: {len(QueryModels.query_complete_enrollment_info())}")
+    print(f"Q4 rows: {len(QueryModels.query_students_above_average(min_classes=1))}")
+    print(f"Done in {(time.perf_counter() - started) * 1000:.1f} ms")
@@ -0,0 +1,263 @@
+# statement_stats.py - Statement fingerprints + latency histograms
+"""
+GIẢI THÍCH:
+- Slow query log chỉ thấy statements vượt threshold; cần số liệu liên tục cho MỌI
+  statement để so sánh giữa các releases
+- Fingerprint: SQL bỏ literals / comments, gộp whitespace, lowercase
+    "SELECT * FROM students WHERE StudentID = 42"      -> "select * from students where studentid = ?"
+    "... WHERE ClassID IN (1, 2, 3)" / "IN (%s, %s)"   -> "... where classid in (?+)"
+    "INSERT ... VALUES (%s, %s), (%s, %s)"             -> "insert ... values (?+)"
+  (cache theo SQL text: QueryModels dùng SQL hằng -> mỗi text chỉ normalize 1 lần)
+- StatementRegistry ("lock-free-ish"):
+  + Mỗi thread ghi vào shard riêng (threading.local) -> hot path không lấy lock
+  + Lock chỉ dùng khi thread đăng ký shard lần đầu, khi thread kết thúc và khi snapshot/reset
+  + Thread kết thúc (vd QueryWorker mỗi lần load page) -> shard được gộp vào 1 aggregate
+    chung rồi bỏ khỏi danh sách -> số shards = số threads còn sống, không tăng mãi
+  + snapshot() gộp các shards (có thể trễ vài statement đang ghi dở, chấp nhận được)
+- Mỗi fingerprint: calls, errors, rows, total/max ms, histogram latency dạng log
+  (bucket rộng ~10%) -> p50/p95/p99 sai số <= 10%
+
+So sánh 2 releases (file dump từ main.py, DB_STATEMENT_STATS_FILE):
+    python statement_stats.py compare before.json after.json
+"""
+
+import bisect
+import json
+import math
+import re
+import threading
+import time
+import weakref
+from functools import lru_cache
+
+# Bucket biên trên (ms): 0.01 ms -> ~10 phút, mỗi bucket rộng hơn bucket trước 10%
+_BUCKET_RATIO = 1.1
+BUCKET_BOUNDS_MS = tuple(0.01 * _BUCKET_RATIO ** i for i in range(int(math.log(6e7, _BUCKET_RATIO)) + 1))
+
+# 1 lượt quét trái -> phải: string literal khớp trước thì '#', '--', '/*' bên trong
+# string không bị coi là comment (và ngược lại)
+_STRING_OR_COMMENT_RE = re.compile(
+    r"(?P<string>'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\")"
+    r"|/\*.*?\*/|--[^\n]*|#[^\n]*",
+    re.DOTALL
+)
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+_PLACEHOLDER_RE = re.compile(r"%s|%\(\w+\)s|\?")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_VALUES_ROWS_RE = re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(query):
+    """SQL -> fingerprint (literals/placeholders -> ?, lists -> (?+), lowercase)"""
+    sql = _STRING_OR_COMMENT_RE.sub(lambda m: "?" if m.group('string') else " ", query)
+    sql = _PLACEHOLDER_RE.sub("?", sql)
+    sql = _NUMBER_RE.sub("?", sql)
+    sql = " ".join(sql.split()).lower()
+    sql = _IN_LIST_RE.sub("(?+)", sql)
+    return _VALUES_ROWS_RE.sub("(?+)", sql)
+
+
+class StatementMetrics:
+    """Counters + latency histogram của 1 fingerprint (chỉ thread sở hữu shard được ghi)"""
+
+    __slots__ = ('calls', 'errors', 'rows', 'total_ms', 'max_ms', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = {}  # bucket index -> count (sparse)
+
+    def record(self, duration_ms, rows, error):
+        self.calls += 1
+        if error:
+            self.errors += 1
+        if rows and rows > 0:  # DDL: rowcount = -1
+            self.rows += rows
+        self.total_ms += duration_ms
+        if duration_ms > self.max_ms:
+            self.max_ms = duration_ms
+        index = bisect.bisect_left(BUCKET_BOUNDS_MS, duration_ms)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.errors += other.errors
+        self.rows += other.rows
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        for index, count in list(other.buckets.items()):
+            self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def percentile(self, p):
+        """Biên trên của bucket chứa percentile p (0-100), không vượt max_ms"""
+        if not self.calls:
+            return 0.0
+        target = math.ceil(self.calls * p / 100)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                bound = BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else self.max_ms
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+
+class _ShardOwner:
+    """Giữ shard trong threading.local; bị thu hồi khi thread kết thúc (-> _retire)"""
+
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+class StatementRegistry:
+    """Registry fingerprint -> StatementMetrics, sharded theo thread"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._shards = {}   # id(shard) -> shard của các threads còn sống
+        self._retired = {}  # fingerprint -> StatementMetrics gộp từ threads đã kết thúc
+        self._samples = {}  # fingerprint -> SQL gốc đầu tiên (để đọc report)
+        self.started_at = time.time()
+
+    def _shard(self):
+        owner = getattr(self._local, 'owner', None)
+        if owner is None:
+            shard = {}
+            owner = self._local.owner = _ShardOwner(shard)
+            finalizer = weakref.finalize(owner, self._retire, shard)
+            finalizer.atexit = False
+            with self._lock:
+                self._shards[id(shard)] = shard
+        return owner.shard
+
+    def _retire(self, shard):
+        """Thread sở hữu shard đã kết thúc -> gộp vào _retired, bỏ khỏi _shards"""
+        with self._lock:
+            if self._shards.pop(id(shard), None) is None:
+                return
+            for key, metrics in shard.items():
+                self._retired.setdefault(key, StatementMetrics()).merge(metrics)
+
+    def record(self, query, duration_ms, rows=None, error=None):
+        key = fingerprint(query)
+        shard = self._shard()
+        metrics = shard.get(key)
+        if metrics is None:
+            metrics = shard[key] = StatementMetrics()
+            self._samples.setdefault(key, " ".join(query.split())[:300])
+        metrics.record(duration_ms, rows, error)
+
+    def snapshot(self, top=None):
+        """
+        Gộp các shards
+
+        Returns:
+            list of dict (xếp theo total_ms giảm dần): fingerprint, sample, calls, errors,
+            rows, total_ms, avg_ms, p50_ms, p95_ms, p99_ms, max_ms
+        """
+        merged = {}
+        with self._lock:
+            shards = list(self._shards.values())
+            for key, metrics in self._retired.items():
+                merged.setdefault(key, StatementMetrics()).merge(metrics)
+        for shard in shards:
+            for key, metrics in list(shard.items()):
+                merged.setdefault(key, StatementMetrics()).merge(metrics)
+
+        stats = []
+        for key, metrics in merged.items():
+            stats.append({
+                'fingerprint': key,
+                'sample': self._samples.get(key),
+                'calls': metrics.calls,
+                'errors': metrics.errors,
+                'rows': metrics.rows,
+                'total_ms': round(metrics.total_ms, 3),
+                'avg_ms': round(metrics.total_ms / metrics.calls, 3),
+                'p50_ms': round(metrics.percentile(50), 3),
+                'p95_ms': round(metrics.percentile(95), 3),
+                'p99_ms': round(metrics.percentile(99), 3),
+                'max_ms': round(metrics.max_ms, 3),
+            })
+        stats.sort(key=lambda s: s['total_ms'], reverse=True)
+        return stats[:top] if top else stats
+
+    def reset(self):
+        """Xóa số liệu của mọi shard (bắt đầu kỳ đo mới)"""
+        with self._lock:
+            for shard in self._shards.values():
+                shard.clear()
+            self._retired.clear()
+            self._samples.clear()
+            self.started_at = time.time()
+
+    def dump(self, path, label=None):
+        """Ghi snapshot ra JSON (label: vd version/commit để so sánh releases)"""
+        data = {
+            'label': label,
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            'dumped_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'statements': self.snapshot(),
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        return path
+
+
+# ============================================================
+# COMPARE
+# ============================================================
+
+def compare(before_path, after_path, top=20):
+    """
+    So sánh 2 dumps theo fingerprint
+
+    Returns:
+        list of dict: fingerprint, calls/p95 trước và sau, p95 thay đổi (%),
+        xếp theo total_ms của bản sau
+    """
+    with open(before_path, encoding='utf-8') as f:
+        before = {s['fingerprint']: s for s in json.load(f)['statements']}
+    with open(after_path, encoding='utf-8') as f:
+        after = json.load(f)['statements']
+
+    rows = []
+    for stat in after[:top]:
+        old = before.get(stat['fingerprint'])
+        change = None
+        if old and old['p95_ms']:
+            change = round((stat['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100, 1)
+        rows.append({
+            'fingerprint': stat['fingerprint'],
+            'calls_before': old['calls'] if old else 0,
+            'calls_after': stat['calls'],
+            'p95_before': old['p95_ms'] if old else None,
+            'p95_after': stat['p95_ms'],
+            'p95_change_pct': change,
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare statement stats dumps")
+    parser.add_argument("command", choices=("compare",))
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'calls':>15} {'p95 ms':>19} {'change':>8}  statement")
+    for row in compare(args.before, args.after, top=args.top):
+        p95_before = f"{row['p95_before']:.2f}" if row['p95_before'] is not None else "-"
+        change = f"{row['p95_change_pct']:+.1f}%" if row['p95_change_pct'] is not None else "new"
+        print(f"{row['calls_before']:>7}->{row['calls_after']:<7} {p95_before:>9}->{row['p95_after']:<9.2f} "
+              f"{change:>8}  {row['fingerprint'][:90]}")
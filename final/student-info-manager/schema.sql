@@ -94,5 +94,13 @@ CREATE TABLE enrollments (
 -- Indexes (performance)
 -- ============================================================
 CREATE INDEX idx_students_enrollment_year ON students (EnrollmentYear);
+CREATE INDEX idx_students_lastname ON students (LastName);
+CREATE INDEX idx_students_firstname ON students (FirstName);
+CREATE INDEX idx_students_dob ON students (DOB);
 CREATE INDEX idx_classes_subjectcode ON classes (SubjectCode);
 CREATE INDEX idx_enrollments_class ON enrollments (ClassID);
+
+-- Full-text search (StudentModel.search): ngram parser -> substring match cho tên có dấu
+-- Stopwords tắt để không mất bigrams như 'an', 'en' (database cũ: python search_index.py migrate)
+SET SESSION innodb_ft_enable_stopword = OFF;
+CREATE FULLTEXT INDEX ft_students_search ON students (FirstName, LastName, Email) WITH PARSER ngram;
@@ -126,6 +126,7 @@ class StudentDialog(QtWidgets.QDialog):
             
             self.cursor.execute(sql, values)
             self.conn.commit()
+            self.student_id = self.cursor.lastrowid  # StudentsPage cập nhật prefix index theo ID này
             
             QtWidgets.QMessageBox.information(self, "Success", 
                 f"Student '{full_name}' added successfully!")
@@ -35,7 +35,8 @@ class Validators:
             query += f" AND {id_col} != %s"
             params.append(current_id)
             
-        exists = db.execute_query(query, params, fetch_one=True)
+        # use_primary: kiểm tra UNIQUE phải đọc dữ liệu mới nhất, không đọc replica
+        exists = db.execute_query(query, params, fetch_one=True, use_primary=True)
         
         if exists:
             raise ValidationError(f"{column} '{value}' đã tồn tại trong hệ thống. Vui lòng nhập giá trị khác.")
@@ -56,16 +57,17 @@ class Validators:
         return first_name, last_name
 
     @staticmethod
-    def validate_email(email: str, table: str, current_id: int = None) -> str:
-        """Kiểm tra định dạng Email và UNIQUE."""
+    def validate_email(email: str, table: str, current_id: int = None, check_unique: bool = True) -> str:
+        """Kiểm tra định dạng Email và UNIQUE (check_unique=False: chỉ kiểm tra định dạng)."""
         Validators.is_empty(email, "Email") # Email là UNIQUE và NOT NULL (chúng ta giả định NOT NULL ở đây)
         pattern = r'^[\w\.-]+@[\w\.-]+\.\w+$'
         if not re.match(pattern, email):
             raise ValidationError("Invalid email format")
             
         # Kiểm tra UNIQUE trong CSDL
-        id_col = "StudentID" if table == 'students' else "LecturerID"
-        Validators.check_unique(table, 'Email', email, current_id, id_col)
+        if check_unique:
+            id_col = "StudentID" if table == 'students' else "LecturerID"
+            Validators.check_unique(table, 'Email', email, current_id, id_col)
         return email
 
     @staticmethod
@@ -145,9 +147,12 @@ class Validators:
     # --------------------------------------------------------------------------------
 
     @staticmethod # <--- ĐÃ THÊM: STATICMETHOD
-    def validate_student_data(data: dict, student_id: int = None) -> dict:
+    def validate_student_data(data: dict, student_id: int = None, check_unique: bool = True) -> dict:
         v = Validators
 
+        # check_unique=False: bulk loader (bulk_loader.py) kiểm tra trùng Email theo cả batch
+        # bằng 1 query thay vì 1 query mỗi row
+
         # Về mặt GUI, bạn nên tách FirstName và LastName ngay trong Form
         # nhưng nếu Form yêu cầu Full Name, sử dụng hàm tách
         # Tuy nhiên, CSDL của bạn có FirstName và LastName riêng biệt
@@ -160,7 +165,7 @@ class Validators:
         v.is_empty(data.get("FirstName"), "First Name")
         v.is_empty(data.get("LastName"), "Last Name")
         
-        email = v.validate_email(data["Email"], 'students', student_id)
+        email = v.validate_email(data["Email"], 'students', student_id, check_unique)
         dob = v.validate_dob(data["DOB"])
         gender = v.validate_gender(data["Gender"])
         enrollment_year = v.validate_year(data["EnrollmentYear"])
@@ -223,7 +228,7 @@ class Validators:
         # Kiểm tra Composite PK UNIQUE (Chỉ cần khi thêm mới)
         if is_new:
             check_query = "SELECT 1 FROM enrollments WHERE StudentID=%s AND ClassID=%s"
-            exists = db.execute_query(check_query, (student_id, class_id), fetch_one=True)
+            exists = db.execute_query(check_query, (student_id, class_id), fetch_one=True, use_primary=True)
             if exists:
                 raise ValidationError("Sinh viên đã đăng ký vào lớp học này!")
 